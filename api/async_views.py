@@ -0,0 +1,136 @@
+"""
+    Async versions of read-heavy endpoints for ASGI server (config/asgi.py).
+
+    DRF views are synchronous, so these are Django async views that reuse DRF view classes
+    for building querysets and representation, and fetch data with async versions of their helpers
+    (async ORM and async cache). Only DRF authentication, which may query database, is run in thread.
+    Responses are rendered to JSON only.
+"""
+import functools
+
+from asgiref.sync import sync_to_async
+from django.http import Http404, HttpResponse
+from rest_framework import exceptions
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.views import exception_handler
+
+from users.history import history_recorder
+from users.models import BookStoreUser
+from .conditional import make_etag, not_modified_response, set_validators
+from .permissions import IsBuyer
+from .serializers import BookSerializer
+from .views import BookViewSet, FavouritesView, HistoryView
+
+
+def json_response(data, status=200):
+    return HttpResponse(JSONRenderer().render(data), status=status, content_type='application/json')
+
+
+def async_api_view(permission_classes=()):
+    """
+        Decorator of async view. Authenticates request as DRF does, checks permissions
+        and converts API exceptions to JSON responses. View receives DRF Request.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            request = Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+            try:
+                await sync_to_async(check_permissions)(request, permission_classes)
+                return await view(request, *args, **kwargs)
+            except (exceptions.APIException, Http404) as exc:
+                return handle_exception(request, exc)
+        return wrapper
+    return decorator
+
+
+def check_permissions(request, permission_classes):
+    """
+        Authenticates request and checks permissions. Both may query database, so it is run in thread.
+    """
+    request.user  # the same as APIView.perform_authentication does
+    for permission_class in permission_classes:
+        if not permission_class().has_permission(request, None):
+            if not request.successful_authenticator and request.user.is_anonymous:
+                raise exceptions.NotAuthenticated
+            raise exceptions.PermissionDenied
+
+
+def handle_exception(request, exc):
+    if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+        # the same as APIView.handle_exception does
+        authenticate_header = request.authenticators[0].authenticate_header(request)
+        if authenticate_header:
+            exc.auth_header = authenticate_header
+        else:
+            exc.status_code = 403
+    response = exception_handler(exc, {'request': request})
+    return json_response(response.data, status=response.status_code)
+
+
+def init_view(view_class, request, action=None):
+    """
+        Returns instance of DRF view class to build querysets of the request.
+    """
+    view = view_class(request=request, args=(), kwargs={}, format_kwarg=None)
+    view.action = action
+    return view
+
+
+@async_api_view()
+async def book_list(request):
+    """
+        Async version of BookViewSet.list.
+    """
+    view = init_view(BookViewSet, request, 'list')
+    version, last_modified, data = await view.aget_list_data()
+    etag = make_etag(version, JSONRenderer.media_type)
+    return not_modified_response(request, etag, last_modified) or set_validators(
+        json_response(data), etag, last_modified
+    )
+
+
+@async_api_view()
+async def book_detail(request, article_number):
+    """
+        Async version of BookViewSet.retrieve. Book is added to buyer's history without waiting for database.
+    """
+    view = init_view(BookViewSet, request, 'retrieve')
+    data, book_id, last_modified = await view.aget_book_version(article_number)
+    if isinstance(request.user, BookStoreUser) and request.user.is_buyer:
+        await history_recorder.arecord(request.user, book_id)
+    etag = BookViewSet.get_book_etag(article_number, last_modified, JSONRenderer.media_type)
+    not_modified = not_modified_response(request, etag, last_modified)
+    if not_modified is not None:
+        return not_modified
+    if data is None:
+        data, last_modified = await view.aget_book_data(article_number, book_id)
+        etag = BookViewSet.get_book_etag(article_number, last_modified, JSONRenderer.media_type)
+    return set_validators(json_response(data), etag, last_modified)
+
+
+async def user_books_list(request, view_class, empty_message):
+    view = init_view(view_class, request)
+    entries = await view.paginator.apaginate_queryset(view.get_queryset(), request, view)
+    if not entries and not request.query_params.get(view.paginator.cursor_query_param):
+        return json_response({"msg": empty_message})
+    serializer = BookSerializer([entry.book for entry in entries], many=True)
+    return json_response(view.get_paginated_response(serializer.data).data)
+
+
+@async_api_view(permission_classes=(IsBuyer,))
+async def favourites(request):
+    """
+        Async version of FavouritesView.
+    """
+    return await user_books_list(request, FavouritesView, "You have no favourites books yet")
+
+
+@async_api_view(permission_classes=(IsBuyer,))
+async def history(request):
+    """
+        Async version of HistoryView.
+    """
+    return await user_books_list(request, HistoryView, "You have no books in history yet")
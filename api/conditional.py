@@ -0,0 +1,39 @@
+"""
+    Helpers for conditional GET (ETag, Last-Modified) of book endpoints.
+"""
+import hashlib
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+def make_etag(*parts):
+    """
+        Returns strong ETag built from parts that define representation.
+    """
+    digest = hashlib.md5('|'.join(str(part) for part in parts).encode()).hexdigest()
+    return quote_etag(digest)
+
+
+def set_validators(response, etag, last_modified=None):
+    """
+        Sets ETag and Last-Modified headers. last_modified is datetime or None.
+    """
+    response.headers['ETag'] = etag
+    if last_modified is not None:
+        response.headers['Last-Modified'] = http_date(last_modified.timestamp())
+    return response
+
+
+def not_modified_response(request, etag, last_modified=None):
+    """
+        Returns 304 response if request validators match, otherwise None.
+    """
+    response = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=int(last_modified.timestamp()) if last_modified is not None else None,
+    )
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
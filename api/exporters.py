@@ -0,0 +1,94 @@
+"""
+    Streaming export of books to CSV, JSONL and XLS.
+
+    Books are read from database by QuerySet.iterator in chunks and written row by row,
+    so CSV and JSONL exports use constant memory regardless of catalogue size.
+    xlwt can't write workbook incrementally, so XLS export holds the workbook in memory
+    and is split into sheets of XLS_SHEET_ROWS rows because of XLS format limit.
+"""
+import csv
+import io
+import json
+from decimal import Decimal
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from books.models import BOOK_CONTENT_FIELDS
+
+FORMATS = ('csv', 'jsonl', 'xls')
+CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+    'xls': 'application/vnd.ms-excel',
+}
+# Exported file can be imported back by api.importers
+EXPORT_FIELDS = ('article_number',) + BOOK_CONTENT_FIELDS + ('rating', 'seller')
+CHUNK_SIZE = 2000
+XLS_SHEET_ROWS = 65535  # 65536 rows per sheet minus header
+
+
+class Echo:
+    """
+        File-like object that returns written value instead of storing it.
+    """
+    def write(self, value):
+        return value
+
+
+def xls_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+def iterate_rows(queryset):
+    return queryset.order_by('article_number').values_list(*EXPORT_FIELDS).iterator(chunk_size=CHUNK_SIZE)
+
+
+def export_csv(queryset):
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in iterate_rows(queryset):
+        yield writer.writerow(row)
+
+
+def export_jsonl(queryset):
+    for row in iterate_rows(queryset):
+        yield json.dumps(dict(zip(EXPORT_FIELDS, row)), cls=DjangoJSONEncoder) + '\n'
+
+
+def export_xls(queryset):
+    import xlwt
+
+    workbook = xlwt.Workbook()
+    sheet = None
+    for row_number, row in enumerate(iterate_rows(queryset)):
+        sheet_row = row_number % XLS_SHEET_ROWS + 1
+        if sheet_row == 1:
+            sheet = workbook.add_sheet(f'books {row_number // XLS_SHEET_ROWS + 1}')
+            for column, field in enumerate(EXPORT_FIELDS):
+                sheet.write(0, column, field)
+        for column, value in enumerate(row):
+            sheet.write(sheet_row, column, xls_value(value))
+    if sheet is None:
+        sheet = workbook.add_sheet('books 1')
+        for column, field in enumerate(EXPORT_FIELDS):
+            sheet.write(0, column, field)
+    output = io.BytesIO()
+    workbook.save(output)
+    output.seek(0)
+    yield from iter(lambda: output.read(64 * 1024), b'')
+
+
+def export_books(queryset, file_format):
+    """
+        Returns iterator of str (csv, jsonl) or bytes (xls) chunks of exported books.
+    """
+    exporters = {
+        'csv': export_csv,
+        'jsonl': export_jsonl,
+        'xls': export_xls,
+    }
+    return exporters[file_format](queryset)
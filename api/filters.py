@@ -0,0 +1,59 @@
+from rest_framework import filters, serializers
+
+
+class BookFilterSerializer(serializers.Serializer):
+    """
+        Validates query parameters of book catalogue.
+    """
+    genre = serializers.CharField(required=False, max_length=100)
+    author = serializers.CharField(required=False, max_length=100)
+    language = serializers.CharField(required=False, max_length=100)
+    publisher = serializers.CharField(required=False, max_length=100)
+    cost_min = serializers.DecimalField(required=False, max_digits=8, decimal_places=2, min_value=0)
+    cost_max = serializers.DecimalField(required=False, max_digits=8, decimal_places=2, min_value=0)
+    rating_min = serializers.DecimalField(required=False, max_digits=3, decimal_places=2, min_value=0, max_value=5)
+    rating_max = serializers.DecimalField(required=False, max_digits=3, decimal_places=2, min_value=0, max_value=5)
+
+
+class BookFilterBackend(filters.BaseFilterBackend):
+    """
+        Filters books by query parameters:
+            genre, author, language, publisher - exact match.
+            cost_min, cost_max - cost range.
+            rating_min, rating_max - rating range.
+        Every filter is served by one of Book partial indexes (see books.models.Book.Meta).
+    """
+    lookups = {
+        'genre': 'genre',
+        'author': 'author',
+        'language': 'language',
+        'publisher': 'publisher',
+        'cost_min': 'cost__gte',
+        'cost_max': 'cost__lte',
+        'rating_min': 'rating__gte',
+        'rating_max': 'rating__lte',
+    }
+
+    def filter_queryset(self, request, queryset, view):
+        serializer = BookFilterSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        conditions = {
+            self.lookups[param]: value for param, value in serializer.validated_data.items()
+        }
+        if conditions:
+            queryset = queryset.filter(**conditions)
+        return queryset
+
+
+class BookOrderingFilter(filters.OrderingFilter):
+    """
+        Orders books by cost or rating.
+        Only the first requested field is used, and article_number in the same direction is appended to it,
+        so ordering is unique for keyset pagination (see api.pagination.BookCursorPagination)
+        and is served by one of Book partial indexes.
+    """
+    def get_ordering(self, request, queryset, view):
+        field = tuple(super().get_ordering(request, queryset, view))[0]
+        if field.lstrip('-') == 'article_number':
+            return (field,)
+        return field, ('-' if field.startswith('-') else '') + 'article_number'
@@ -0,0 +1,212 @@
+"""
+    Streaming import of books from CSV or JSONL files.
+
+    File is read row by row. Rows are validated in chunks by BookImportSerializer
+    (same rules as BookCreationSerializer), and every chunk is written by one bulk_create
+    and one bulk_update in its own transaction. Existing books of the chunk are fetched
+    by one query, unchanged books are detected by content hash and are not written at all.
+"""
+import csv
+import io
+import json
+import time
+
+from django.db import DatabaseError, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from books.models import BOOK_CONTENT_FIELDS, Book, make_book_content_hash
+from books.signals import books_bulk_saved
+from books.stock import change_stock
+from .serializers import BookCreationSerializer
+
+FORMATS = ('csv', 'jsonl')
+MODES = ('create', 'upsert')
+MAX_REPORTED_ERRORS = 1000
+
+
+class BookImportSerializer(BookCreationSerializer):
+    """
+        Validates one imported row. Seller is set by importer.
+        Uniqueness of article number is checked by importer for the whole chunk.
+    """
+    class Meta(BookCreationSerializer.Meta):
+        exclude = BookCreationSerializer.Meta.exclude + ('seller',)
+        extra_kwargs = {'article_number': {'validators': []}}
+
+
+def read_csv_rows(file):
+    reader = csv.DictReader(io.TextIOWrapper(file, encoding='utf-8', newline=''))
+    for row in reader:
+        # empty cell means missing value
+        yield {key: value if value != '' else None for key, value in row.items()}
+
+
+def read_jsonl_rows(file):
+    for line in io.TextIOWrapper(file, encoding='utf-8'):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield row if isinstance(row, dict) else None
+
+
+def get_file_format(file_name, file_format=None):
+    """
+        Returns format passed explicitly or guessed by file extension.
+    """
+    if file_format:
+        return file_format
+    extension = file_name.rsplit('.', 1)[-1].lower() if file_name and '.' in file_name else ''
+    if extension in FORMATS:
+        return extension
+    raise ValueError(f'Cannot detect file format, use one of: {", ".join(FORMATS)}')
+
+
+class BookImporter:
+    """
+        Imports books of the seller from file object opened in binary mode.
+        Modes:
+            create - every row creates a book, rows with existing article numbers are rejected.
+            upsert - rows with new article numbers create books, rows of seller's existing books
+                update them only if content hash differs from stored one.
+    """
+
+    def __init__(self, seller, chunk_size=1000, mode='create'):
+        if mode not in MODES:
+            raise ValueError(f'Unknown import mode {mode}, use one of: {", ".join(MODES)}')
+        self.seller = seller
+        self.chunk_size = chunk_size
+        self.mode = mode
+        self.rows = 0
+        self.created = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.errors = []
+        self.errors_count = 0
+        self._seen_article_numbers = set()
+        # one serializer validates all rows, so its fields are built only once
+        self._serializer = BookImportSerializer()
+
+    def add_error(self, row_number, errors):
+        self.errors_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': row_number, 'errors': errors})
+
+    def import_file(self, file, file_format):
+        started_at = time.monotonic()
+        rows = read_csv_rows(file) if file_format == 'csv' else read_jsonl_rows(file)
+        chunk = []
+        for row_number, row in enumerate(rows, start=1):
+            self.rows += 1
+            chunk.append((row_number, row))
+            if len(chunk) >= self.chunk_size:
+                self.import_chunk(chunk)
+                chunk = []
+        if chunk:
+            self.import_chunk(chunk)
+        return self.report(time.monotonic() - started_at)
+
+    def validate_chunk(self, chunk):
+        """
+            Returns list of (row number, validated data) of valid rows.
+        """
+        valid_rows = []
+        for row_number, row in chunk:
+            if row is None:
+                self.add_error(row_number, {'non_field_errors': ['Row is not a valid JSON object.']})
+                continue
+            try:
+                valid_rows.append((row_number, self._serializer.run_validation(row)))
+            except ValidationError as error:
+                self.add_error(row_number, error.detail)
+        return valid_rows
+
+    def split_chunk(self, valid_rows):
+        """
+            Returns books to create, books to update and stock changes of sharded books to update by their ids.
+            Rejects rows with article numbers repeated in the file and rows of existing books
+            unless they belong to the seller in upsert mode.
+        """
+        existing = {
+            article_number: (book_id, seller_id, content_hash, seller_count, stock_shards)
+            for book_id, article_number, seller_id, content_hash, seller_count, stock_shards in Book.objects.filter(
+                article_number__in=[data['article_number'] for _, data in valid_rows]
+            ).values_list('id', 'article_number', 'seller_id', 'content_hash', 'seller_count', 'stock_shards')
+        }
+        books_to_create = []
+        books_to_update = []
+        stock_deltas = {}
+        now = timezone.now()
+        for row_number, data in valid_rows:
+            article_number = data['article_number']
+            if article_number in self._seen_article_numbers:
+                self.add_error(row_number, {'article_number': ['article number is repeated in the file.']})
+                continue
+            self._seen_article_numbers.add(article_number)
+            content_hash = make_book_content_hash(data)
+            if article_number not in existing:
+                books_to_create.append(
+                    Book(seller=self.seller, seller_count=data['count'], content_hash=content_hash, **data)
+                )
+                continue
+            book_id, seller_id, stored_content_hash, seller_count, stock_shards = existing[article_number]
+            if self.mode == 'create' or seller_id != self.seller.pk:
+                self.add_error(row_number, {'article_number': ['book with this article number already exists.']})
+            elif content_hash == stored_content_hash:
+                self.unchanged += 1
+            else:
+                book = Book(
+                    pk=book_id, seller=self.seller, seller_count=data['count'], content_hash=content_hash,
+                    updated_at=now, stock_shards=stock_shards, **data,
+                )
+                # stock is changed by difference from count that seller set last time,
+                # so books reserved since then stay reserved (see books.stock)
+                delta = data['count'] - seller_count
+                if stock_shards:
+                    # counters of sharded book are changed after bulk_update, which keeps its count
+                    stock_deltas[book_id] = delta
+                    book.count = F('count')
+                else:
+                    book.count = Greatest(F('count') + delta, 0)
+                books_to_update.append(book)
+        return books_to_create, books_to_update, stock_deltas
+
+    def import_chunk(self, chunk):
+        books_to_create, books_to_update, stock_deltas = self.split_chunk(self.validate_chunk(chunk))
+        if not books_to_create and not books_to_update:
+            return
+        try:
+            with transaction.atomic():
+                Book.objects.bulk_create(books_to_create)
+                # bulk_update doesn't set auto_now fields, updated_at is set by split_chunk
+                Book.objects.bulk_update(
+                    books_to_update, BOOK_CONTENT_FIELDS + ('seller_count', 'content_hash', 'updated_at'),
+                )
+                for book in books_to_update:
+                    if book.pk in stock_deltas:
+                        book.count = change_stock(book, stock_deltas[book.pk])
+        except DatabaseError as error:
+            self.errors_count += len(books_to_create) + len(books_to_update)
+            self.errors.append({'row': None, 'errors': {'non_field_errors': [str(error)]}})
+            return
+        self.created += len(books_to_create)
+        self.updated += len(books_to_update)
+        books_bulk_saved.send(sender=Book, books=books_to_create + books_to_update)
+
+    def report(self, seconds):
+        return {
+            'rows': self.rows,
+            'created': self.created,
+            'updated': self.updated,
+            'unchanged': self.unchanged,
+            'errors_count': self.errors_count,
+            'errors': self.errors,
+            'seconds': round(seconds, 3),
+            'rows_per_second': round(self.rows / seconds) if seconds else self.rows,
+        }
@@ -0,0 +1,139 @@
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import BooleanField, F, Func, Value
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination
+
+
+class RowComparison(Func):
+    """
+        Compares row of fields with row of values: (cost, article_number) > (10.00, 25).
+        Served by index on the same fields.
+    """
+    output_field = BooleanField()
+
+    def __init__(self, fields, values, operator):
+        super().__init__(*(F(field) for field in fields), *values)
+        self.operator = operator
+
+    def as_sql(self, compiler, connection, **extra_context):
+        sqls, params = [], []
+        for expression in self.get_source_expressions():
+            sql, expression_params = compiler.compile(expression)
+            sqls.append(sql)
+            params.extend(expression_params)
+        middle = len(sqls) // 2
+        return f'({", ".join(sqls[:middle])}) {self.operator} ({", ".join(sqls[middle:])})', params
+
+
+class KeysetCursorPagination(CursorPagination):
+    """
+        Cursor pagination that fetches the next page after values of all ordering fields of the last entry
+        with row comparison, so every page costs the same regardless of how deep the client has scrolled.
+        Ordering must end with unique field. Page can be fetched with async ORM by apaginate_queryset.
+    """
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self.get_page_queryset(queryset, request, view)
+        if queryset is None:
+            return None
+        return self.set_page(list(queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        queryset = self.get_page_queryset(queryset, request, view)
+        if queryset is None:
+            return None
+        return self.set_page([entry async for entry in queryset])
+
+    def get_page_queryset(self, queryset, request, view=None):
+        """
+            Decodes cursor and returns queryset of the page with one extra entry, None if pagination is off.
+        """
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.fields = tuple(field.lstrip('-') for field in self.ordering)
+        self.cursor = self.decode_cursor(request)
+        self.reverse = self.cursor is not None and self.cursor.reverse
+        descending = self.ordering[0].startswith('-')
+
+        if self.cursor is not None and self.cursor.position is not None:
+            values = self.decode_position(queryset.model, self.cursor.position)
+            queryset = queryset.filter(RowComparison(self.fields, values, '<' if descending != self.reverse else '>'))
+        if self.reverse:
+            descending = not descending
+        queryset = queryset.order_by(*(f'-{field}' if descending else field for field in self.fields))
+        # an extra entry tells whether the next page exists
+        return queryset[:self.page_size + 1]
+
+    def set_page(self, results):
+        self.page = results[:self.page_size]
+        has_more = len(results) > self.page_size
+        if self.reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.cursor is not None
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=self.encode_position(self.page[-1])))
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=self.encode_position(self.page[0])))
+
+    def encode_position(self, entry):
+        if isinstance(entry, dict):
+            return json.dumps([str(entry[field]) for field in self.fields])
+        return json.dumps([str(getattr(entry, field)) for field in self.fields])
+
+    def decode_position(self, model, position):
+        """
+            Returns values of ordering fields from cursor position as expressions typed by model fields.
+        """
+        try:
+            values = json.loads(position)
+            if not isinstance(values, list) or len(values) != len(self.fields):
+                raise ValueError
+            model_fields = [model._meta.get_field(field) for field in self.fields]
+            return [
+                Value(model_field.to_python(value), output_field=model_field)
+                for model_field, value in zip(model_fields, values)
+            ]
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+
+class BookCursorPagination(KeysetCursorPagination):
+    """
+        Keyset pagination for the book catalogue.
+        Ordering always ends with unique article_number (see api.filters.BookOrderingFilter),
+        so books with equal cost or rating are not skipped.
+        Page size can be changed by client with 'page_size' query parameter.
+    """
+    ordering = 'article_number'
+    page_size = getattr(settings, 'BOOKS_PAGE_SIZE', 50)
+    page_size_query_param = 'page_size'
+    max_page_size = getattr(settings, 'BOOKS_MAX_PAGE_SIZE', 500)
+
+
+class UserBooksCursorPagination(KeysetCursorPagination):
+    """
+        Keyset pagination for user's favourites and history.
+        Most recently added entries go first.
+    """
+    ordering = '-id'
+    page_size = getattr(settings, 'BOOKS_PAGE_SIZE', 50)
+    page_size_query_param = 'page_size'
+    max_page_size = getattr(settings, 'BOOKS_MAX_PAGE_SIZE', 500)
@@ -13,16 +13,31 @@ class IsSelfOrAdmin(permissions.BasePermission):
         return obj == request.user
 
 
+def get_request_seller(request):
+    """
+        Returns seller of the request user or None.
+        Seller is loaded with the user by authentication, so no query is done.
+    """
+    return getattr(request.user, 'seller', None)
+
+
 class IsSellerUser(permissions.BasePermission):
     def has_permission(self, request, view):
-        if hasattr(request.user, 'seller'):
+        if get_request_seller(request) is not None:
             return True
         return False
 
 
+class IsSellerOrStaff(permissions.BasePermission):
+    def has_permission(self, request, view):
+        return request.user.is_staff or get_request_seller(request) is not None
+
+
 class IsSellerOwner(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
-        if request.user.seller == obj.seller:
+        # compare ids to not load seller of the object
+        seller = get_request_seller(request)
+        if seller is not None and seller.pk == obj.seller_id:
             return True
         return False
 
@@ -4,6 +4,9 @@ from rest_framework import serializers
 from users.models import (
     Seller,
     ShoppingCart,
+    Order,
+    OrderLine,
+    Review,
     Favourites,
     History,
     BookStoreUser,
@@ -33,6 +36,13 @@ class BookStoreUserLoginSerializer(LoginSerializer):
     username = None
 
 
+class TokenRefreshSerializer(serializers.Serializer):
+    """
+        Validates refresh token to exchange for a new pair of signed tokens.
+    """
+    refresh = serializers.CharField()
+
+
 class BookStoreUserUpdateSerializer(serializers.ModelSerializer):
     class Meta:
         model = BookStoreUser
@@ -52,7 +62,9 @@ class BookStoreUserSerializer(serializers.ModelSerializer):
 class BookCreationSerializer(serializers.ModelSerializer):
     class Meta:
         model = Book
-        exclude = ('rating',)
+        exclude = (
+            'rating', 'updated_at', 'seller_count', 'content_hash', 'stock_shards', 'rating_sum', 'rating_count',
+        )
 
     def validate_isbn(self, value):
         if len(str(value)) != 13:
@@ -63,7 +75,10 @@ class BookCreationSerializer(serializers.ModelSerializer):
 class BookEditSerializer(serializers.ModelSerializer):
     class Meta:
         model = Book
-        exclude = ('seller', 'rating', 'article_number')
+        exclude = (
+            'seller', 'rating', 'article_number', 'updated_at', 'seller_count', 'content_hash', 'stock_shards',
+            'rating_sum', 'rating_count',
+        )
 
     def validate_isbn(self, value):
         if len(str(value)) != 13:
@@ -71,13 +86,101 @@ class BookEditSerializer(serializers.ModelSerializer):
         return value
 
 
-class BookSerializer(serializers.ModelSerializer):
+class BookImportRequestSerializer(serializers.Serializer):
+    """
+        Validates upload of books file. Format is guessed by file extension if not passed.
+        Mode 'create' rejects existing books, mode 'upsert' updates changed books of the seller.
+    """
+    file = serializers.FileField()
+    format = serializers.ChoiceField(choices=('csv', 'jsonl'), required=False)
+    mode = serializers.ChoiceField(choices=('create', 'upsert'), default='create')
+    chunk_size = serializers.IntegerField(min_value=1, max_value=10000, default=1000)
+
+
+class BookExportRequestSerializer(serializers.Serializer):
+    """
+        Validates query parameters of books export.
+        Seller is id of seller whose books are exported, only staff can set it.
+    """
+    file_format = serializers.ChoiceField(choices=('csv', 'jsonl', 'xls'), default='csv')
+    seller = serializers.IntegerField(min_value=1, required=False)
+
+
+class DynamicFieldsModelSerializer(serializers.ModelSerializer):
+    """
+        ModelSerializer that takes additional 'fields' argument
+        which defines what fields should be represented.
+    """
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for field_name in set(self.fields) - set(fields):
+                self.fields.pop(field_name)
+
+
+class BookSerializer(DynamicFieldsModelSerializer):
     """
         Serializer that represents information about book.
     """
     class Meta:
         model = Book
-        fields = '__all__'
+        exclude = ('seller_count', 'content_hash', 'stock_shards', 'rating_sum')
+
+
+# Names of fields that BookSerializer can represent
+BOOK_FIELDS = tuple(
+    field.name for field in Book._meta.concrete_fields if field.name not in BookSerializer.Meta.exclude
+)
+
+
+class BookValuesSerializer:
+    """
+        Read-only serializer that represents books fetched with .values() exactly as BookSerializer does.
+        Fields of BookSerializer are built once and representation function is chosen for each of them,
+        so rows are represented without model instances and serializer introspection.
+        Values of integer, char and boolean fields and id of seller are represented as they are.
+    """
+    # DRF fields whose to_representation doesn't change values loaded from database
+    plain_fields = (
+        serializers.IntegerField,
+        serializers.CharField,
+        serializers.BooleanField,
+        serializers.PrimaryKeyRelatedField,
+    )
+
+    def __init__(self, fields=BOOK_FIELDS):
+        self.converters = tuple(
+            (name, None if isinstance(field, self.plain_fields) else field.to_representation)
+            for name, field in BookSerializer(fields=fields).fields.items()
+        )
+        self.fields = tuple(name for name, _ in self.converters)
+
+    def to_representation(self, row):
+        data = {}
+        for name, convert in self.converters:
+            value = row[name]
+            data[name] = value if convert is None or value is None else convert(value)
+        return data
+
+    def represent(self, rows):
+        return [self.to_representation(row) for row in rows]
+
+
+class BookSearchSerializer(serializers.Serializer):
+    """
+        Validates query parameters of book search.
+    """
+    q = serializers.CharField(max_length=200)
+    limit = serializers.IntegerField(min_value=1, max_value=100, default=20)
+
+
+class BookAutocompleteSerializer(serializers.Serializer):
+    """
+        Validates query parameters of book autocomplete.
+    """
+    q = serializers.CharField(max_length=100)
+    limit = serializers.IntegerField(min_value=1, max_value=50, default=10)
 
 
 class BookAddToFavouritesSerializer(serializers.ModelSerializer):
@@ -87,6 +190,90 @@ class BookAddToFavouritesSerializer(serializers.ModelSerializer):
         fields = ('article_number', )
 
 
+class BooksFavouritesBatchSerializer(serializers.Serializer):
+    """
+        Validates list of article numbers to add to or remove from favourites.
+    """
+    article_numbers = serializers.ListField(
+        child=serializers.IntegerField(min_value=0),
+        allow_empty=False,
+        max_length=500,
+    )
+
+
+class CartLineSerializer(serializers.Serializer):
+    """
+        Validates book, its type and count of books to add to cart.
+    """
+    article_number = serializers.IntegerField(min_value=0)
+    type = serializers.ChoiceField(choices=ShoppingCart.BOOK_TYPE_CHOICES, default='S')
+    book_count = serializers.IntegerField(min_value=1, max_value=1000, default=1)
+
+
+class CartLineUpdateSerializer(CartLineSerializer):
+    """
+        Validates new count of books in cart line. Line is removed if count is 0.
+    """
+    book_count = serializers.IntegerField(min_value=0, max_value=1000)
+
+
+class ShoppingCartSerializer(serializers.ModelSerializer):
+    article_number = serializers.IntegerField(source='book.article_number', read_only=True)
+    title = serializers.CharField(source='book.title', read_only=True)
+    cost = serializers.DecimalField(source='book.cost', max_digits=8, decimal_places=2, read_only=True)
+
+    class Meta:
+        model = ShoppingCart
+        fields = ('article_number', 'title', 'cost', 'type', 'book_count')
+
+
+class OrderLineSerializer(serializers.ModelSerializer):
+    article_number = serializers.IntegerField(source='book.article_number', read_only=True, allow_null=True)
+    title = serializers.CharField(source='book.title', read_only=True, allow_null=True)
+
+    class Meta:
+        model = OrderLine
+        fields = ('article_number', 'title', 'type', 'book_count', 'cost')
+
+
+class OrderSerializer(serializers.ModelSerializer):
+    lines = OrderLineSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Order
+        fields = ('id', 'total_cost', 'created_at', 'lines')
+
+
+class ReviewWriteSerializer(serializers.Serializer):
+    """
+        Validates book, rating and text of buyer's review.
+    """
+    article_number = serializers.IntegerField(min_value=0)
+    rating = serializers.IntegerField(min_value=1, max_value=5)
+    text = serializers.CharField(max_length=1500, allow_blank=True, default='')
+
+
+class ReviewRemoveSerializer(serializers.Serializer):
+    article_number = serializers.IntegerField(min_value=0)
+
+
+class ReviewSerializer(serializers.ModelSerializer):
+    article_number = serializers.IntegerField(source='book.article_number', read_only=True)
+    username = serializers.CharField(source='user.username', read_only=True)
+
+    class Meta:
+        model = Review
+        fields = ('id', 'article_number', 'username', 'rating', 'text', 'created_at', 'updated_at')
+
+
+class HistoryFilterSerializer(serializers.Serializer):
+    """
+        Validates date_of_view range of history.
+    """
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+
+
 class BookFromFavouritesSerializer(serializers.ModelSerializer):
     class Meta:
         model = Favourites
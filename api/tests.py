@@ -1,8 +1,37 @@
-from django.test import TestCase
-from django.test import Client
+from django.test import SimpleTestCase, TestCase
+from django.test import AsyncClient, Client
+from django.test import RequestFactory, override_settings
+from django.http import HttpResponse
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError, connection, transaction
+from django.test.utils import CaptureQueriesContext
+import base64
+import csv
+import datetime
+import io
+import json
 import random
-from books.models import Book
-from users.models import BookStoreUser
+import jwt
+from unittest import mock
+from decimal import Decimal
+from urllib.parse import parse_qs, urlparse
+from rest_framework.renderers import JSONRenderer
+from api.views import BookViewSet
+from api.serializers import BOOK_FIELDS, BookSerializer, BookValuesSerializer
+from books.models import Book, StockShard
+from config.db_routers import ReplicaRouter, replica_health
+from config.middleware import PrimaryPinningMiddleware
+from books.autocomplete import book_autocomplete
+from books.cache import book_cache
+from books.search import get_book_search
+from books.stock import reserve_stock, shard_stock
+from users.authentication import token_user_cache
+from users.cart import checkout
+from users.history import history_recorder
+from users.reviews import add_review
+from users.models import BookStoreUser, Favourites, History, Order, Review, RevokedToken, ShoppingCart
+from users.tokens import revocation_list
 from users.shortcuts import get_user_books_history, get_user_today_history
 
 """
@@ -674,7 +703,7 @@ class TestBuyerFavourites(TestCase, GenerateUserDataMixin, GenerateBookDataMixin
         self.assertEqual(login_response.status_code, 200)
 
         favorites_response = self.buyer_client.get('http://127.0.0.1:8000/bs_v1/favourites')
-        self.assertEqual(self.book.article_number, favorites_response.data[0]['article_number'])
+        self.assertEqual(self.book.article_number, favorites_response.data['results'][0]['article_number'])
 
 
 class TestBuyerRemoveBookFromFavourites(TestCase):
@@ -701,10 +730,1336 @@ class TestBuyerRemoveBookFromFavourites(TestCase):
         self.assertEqual(login_response.status_code, 200)
 
         favorites_response = self.buyer_client.get('http://127.0.0.1:8000/bs_v1/favourites')
-        self.assertEqual(self.book.article_number, favorites_response.data[0]['article_number'])
+        self.assertEqual(self.book.article_number, favorites_response.data['results'][0]['article_number'])
 
         remove_from_favourites_response = self.buyer_client.post(
             'http://127.0.0.1:8000/bs_v1/remove_book_from_favourites',
             data={'article_number': self.book.article_number}
         )
         self.assertEqual(remove_from_favourites_response.status_code, 200)
+
+
+class BookListPaginationTests(TestCase, GenerateUserDataMixin, GenerateBookDataMixin):
+    """
+        Checks that book catalogue is paginated by cursor ordered by article_number.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls._seller = cls.create_user_via_model(seller=True)
+        cls.books = [cls.create_book_via_model(seller=cls._seller.seller) for _ in range(3)]
+        cls.article_numbers = sorted(book.article_number for book in cls.books)
+
+    def test_first_page_has_next_cursor(self):
+        c = Client()
+        response = c.get('http://127.0.0.1:8000/bs_v1/books/', {'page_size': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [book['article_number'] for book in response.data['results']],
+            self.article_numbers[:2]
+        )
+        self.assertIsNotNone(response.data['next'])
+
+    def test_next_cursor_returns_rest_of_catalogue(self):
+        c = Client()
+        first_page = c.get('http://127.0.0.1:8000/bs_v1/books/', {'page_size': 2})
+        second_page = c.get(first_page.data['next'])
+        self.assertEqual(second_page.status_code, 200)
+        self.assertEqual(
+            [book['article_number'] for book in second_page.data['results']],
+            self.article_numbers[2:]
+        )
+        self.assertIsNone(second_page.data['next'])
+
+    def walk_catalogue(self, url, params=None, link='next'):
+        c = Client()
+        response = c.get(url, params)
+        pages = [[book['article_number'] for book in response.data['results']]]
+        while response.data[link]:
+            response = c.get(response.data[link])
+            pages.append([book['article_number'] for book in response.data['results']])
+        return pages, response
+
+    def test_books_with_equal_cost_are_paginated_by_keyset(self):
+        Book.objects.filter(pk__in=[book.pk for book in self.books]).update(cost=10)
+        for ordering, article_numbers in (('cost', self.article_numbers), ('-cost', self.article_numbers[::-1])):
+            pages, last_page = self.walk_catalogue(
+                'http://127.0.0.1:8000/bs_v1/books/', {'page_size': 1, 'ordering': ordering}
+            )
+            self.assertEqual(pages, [[article_number] for article_number in article_numbers])
+            # cursor has position of the book instead of offset
+            cursor = base64.b64decode(parse_qs(urlparse(last_page.data['previous']).query)['cursor'][0]).decode()
+            self.assertEqual(parse_qs(cursor)['p'], [json.dumps(['10.00', str(article_numbers[-1])])])
+            self.assertNotIn('o', parse_qs(cursor))
+            previous_pages, _ = self.walk_catalogue(last_page.data['previous'], link='previous')
+            self.assertEqual(previous_pages, pages[-2::-1])
+
+    def test_invalid_cursor(self):
+        response = Client().get('http://127.0.0.1:8000/bs_v1/books/', {'cursor': base64.b64encode(b'p=[1, 2]').decode()})
+        self.assertEqual(response.status_code, 404)
+
+
+class BookListFilteringTests(TestCase, GenerateUserDataMixin, GenerateBookDataMixin):
+    """
+        Checks filtering and ordering of book catalogue by query parameters.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls._seller = cls.create_user_via_model(seller=True)
+        cls.cheap_book = cls.create_book_via_model(seller=cls._seller.seller)
+        cls.expensive_book = cls.create_book_via_model(seller=cls._seller.seller)
+        Book.objects.filter(pk=cls.cheap_book.pk).update(cost=10, genre='Fantasy')
+        Book.objects.filter(pk=cls.expensive_book.pk).update(cost=90, genre='Drama')
+
+    def test_filter_by_genre(self):
+        c = Client()
+        response = c.get('http://127.0.0.1:8000/bs_v1/books/', {'genre': 'Fantasy'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [book['article_number'] for book in response.data['results']],
+            [self.cheap_book.article_number]
+        )
+
+    def test_filter_by_cost_range(self):
+        c = Client()
+        response = c.get('http://127.0.0.1:8000/bs_v1/books/', {'cost_min': 50, 'cost_max': 100})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [book['article_number'] for book in response.data['results']],
+            [self.expensive_book.article_number]
+        )
+
+    def test_ordering_by_cost_descending(self):
+        c = Client()
+        response = c.get('http://127.0.0.1:8000/bs_v1/books/', {'ordering': '-cost'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [book['article_number'] for book in response.data['results']],
+            [self.expensive_book.article_number, self.cheap_book.article_number]
+        )
+
+    def test_invalid_filter_value(self):
+        c = Client()
+        response = c.get('http://127.0.0.1:8000/bs_v1/books/', {'cost_min': 'cheap'})
+        self.assertEqual(response.status_code, 400)
+
+
+class BookSearchTests(TestCase, GenerateUserDataMixin, GenerateBookDataMixin):
+    """
+        Checks book search endpoint.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls._seller = cls.create_user_via_model(seller=True)
+        cls.book = cls.create_book_via_model(seller=cls._seller.seller)
+        cls.book.title = 'Unique searchable title'
+        cls.book.save()
+
+    def setUp(self):
+        get_book_search().clear()
+
+    def test_search_finds_book_by_title(self):
+        c = Client()
+        response = c.get('http://127.0.0.1:8000/bs_v1/books/search/', {'q': 'searchable'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([book['article_number'] for book in response.data], [self.book.article_number])
+
+    def test_search_finds_edited_book(self):
+        c = Client()
+        c.get('http://127.0.0.1:8000/bs_v1/books/search/', {'q': 'searchable'})  # build index
+        self.book.title = 'Renamed'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.book.save()
+        response = c.get('http://127.0.0.1:8000/bs_v1/books/search/', {'q': 'renamed'})
+        self.assertEqual([book['article_number'] for book in response.data], [self.book.article_number])
+
+    def test_search_ignores_rolled_back_edit(self):
+        c = Client()
+        c.get('http://127.0.0.1:8000/bs_v1/books/search/', {'q': 'searchable'})  # build index
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                self.book.title = 'Renamed'
+                self.book.save()
+                transaction.set_rollback(True)
+        response = c.get('http://127.0.0.1:8000/bs_v1/books/search/', {'q': 'renamed'})
+        self.assertEqual(response.data, [])
+
+    def test_search_without_query(self):
+        c = Client()
+        response = c.get('http://127.0.0.1:8000/bs_v1/books/search/')
+        self.assertEqual(response.status_code, 400)
+
+
+class BookAutocompleteTests(TestCase, GenerateUserDataMixin, GenerateBookDataMixin):
+    """
+        Checks book autocomplete endpoint.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls._seller = cls.create_user_via_model(seller=True)
+        cls.book = cls.create_book_via_model(seller=cls._seller.seller)
+
+    def setUp(self):
+        book_autocomplete.clear()
+
+    def test_autocomplete_suggests_title(self):
+        c = Client()
+        response = c.get('http://127.0.0.1:8000/bs_v1/books/autocomplete/', {'q': 'test ti'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0]['article_number'], self.book.article_number)
+
+    def test_autocomplete_without_query(self):
+        c = Client()
+        response = c.get('http://127.0.0.1:8000/bs_v1/books/autocomplete/')
+        self.assertEqual(response.status_code, 400)
+
+
+class BookCacheTests(TestCase, GenerateUserDataMixin, GenerateBookDataMixin):
+    """
+        Checks book detail and catalogue responses are cached and invalidated on book write.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls._seller = cls.create_user_via_model(seller=True)
+        cls.book = cls.create_book_via_model(seller=cls._seller.seller)
+
+    def setUp(self):
+        cache.clear()
+        book_cache.reset_stats()
+
+    def test_book_detail_served_from_cache(self):
+        c = Client()
+        c.get('http://127.0.0.1:8000/bs_v1/books/' + str(self.book.article_number) + '/')
+        with self.assertNumQueries(0):
+            response = c.get('http://127.0.0.1:8000/bs_v1/books/' + str(self.book.article_number) + '/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(book_cache.stats()['detail_hits'], 1)
+        self.assertEqual(book_cache.stats()['detail_misses'], 1)
+
+    def test_book_detail_invalidated_after_edit(self):
+        c = Client()
+        c.get('http://127.0.0.1:8000/bs_v1/books/' + str(self.book.article_number) + '/')
+        self.book.title = 'Title has been changed'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.book.save()
+            # cached book is dropped after commit
+            self.assertIsNotNone(book_cache.get_detail(self.book.article_number))
+        response = c.get('http://127.0.0.1:8000/bs_v1/books/' + str(self.book.article_number) + '/')
+        self.assertEqual(response.data['title'], 'Title has been changed')
+
+    def test_catalogue_invalidated_after_book_is_taken_off_sale(self):
+        c = Client()
+        response = c.get('http://127.0.0.1:8000/bs_v1/books/')
+        self.assertEqual(len(response.data['results']), 1)
+        self.book.is_on_sale = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.book.save()
+        response = c.get('http://127.0.0.1:8000/bs_v1/books/')
+        self.assertEqual(len(response.data['results']), 0)
+        self.assertEqual(book_cache.stats()['list_misses'], 2)
+
+    def test_stock_change_drops_book_detail_and_pages_with_stock_after_commit(self):
+        c = Client()
+        c.get('http://127.0.0.1:8000/bs_v1/books/' + str(self.book.article_number) + '/')
+        c.get('http://127.0.0.1:8000/bs_v1/books/')
+        with_stock_url = 'http://testserver/bs_v1/books/?fields=title%2Ccount'
+        etag = c.get(with_stock_url).headers['ETag']
+        with self.captureOnCommitCallbacks() as callbacks:
+            reserve_stock(self.book, 1)
+        self.assertIsNotNone(book_cache.get_detail(self.book.article_number))
+        for callback in callbacks:
+            callback()
+        self.assertIsNone(book_cache.get_detail(self.book.article_number))
+        self.assertIsNotNone(book_cache.get_list('http://testserver/bs_v1/books/'))
+        self.assertIsNone(book_cache.get_list(with_stock_url, with_stock=True))
+        response = c.get(with_stock_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'][0]['count'], self.book.count - 1)
+
+
+class BookConditionalGetTests(TestCase, GenerateUserDataMixin, GenerateBookDataMixin):
+    """
+        Checks book endpoints answer conditional requests with 304.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls._seller = cls.create_user_via_model(seller=True)
+        cls.book = cls.create_book_via_model(seller=cls._seller.seller)
+        cls.book_url = 'http://127.0.0.1:8000/bs_v1/books/' + str(cls.book.article_number) + '/'
+
+    def setUp(self):
+        cache.clear()
+
+    def test_book_detail_not_modified(self):
+        c = Client()
+        response = c.get(self.book_url)
+        self.assertIn('Last-Modified', response.headers)
+        not_modified_response = c.get(self.book_url, HTTP_IF_NONE_MATCH=response.headers['ETag'])
+        self.assertEqual(not_modified_response.status_code, 304)
+        self.assertEqual(not_modified_response.headers['ETag'], response.headers['ETag'])
+
+    def test_book_detail_not_modified_without_cache(self):
+        c = Client()
+        etag = c.get(self.book_url).headers['ETag']
+        cache.clear()
+        with self.assertNumQueries(1):
+            not_modified_response = c.get(self.book_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(not_modified_response.status_code, 304)
+
+    def test_book_detail_modified_after_edit(self):
+        c = Client()
+        etag = c.get(self.book_url).headers['ETag']
+        self.book.cost = 1
+        with self.captureOnCommitCallbacks(execute=True):
+            self.book.save()
+        response = c.get(self.book_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], etag)
+
+    def test_etag_depends_on_format(self):
+        c = Client()
+        for url in (self.book_url, 'http://127.0.0.1:8000/bs_v1/books/'):
+            etag = c.get(url).headers['ETag']
+            response = c.get(url, {'format': 'api'}, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response.headers['ETag'], etag)
+            response = c.get(url, HTTP_ACCEPT='text/html', HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+
+    def test_catalogue_not_modified(self):
+        c = Client()
+        etag = c.get('http://127.0.0.1:8000/bs_v1/books/').headers['ETag']
+        response = c.get('http://127.0.0.1:8000/bs_v1/books/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        cache.clear()
+        response = c.get('http://127.0.0.1:8000/bs_v1/books/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_catalogue_version_is_built_from_page(self):
+        c = Client()
+        with CaptureQueriesContext(connection) as queries:
+            etag = c.get('http://127.0.0.1:8000/bs_v1/books/').headers['ETag']
+        # only the page is fetched, catalogue isn't aggregated
+        self.assertFalse([query['sql'] for query in queries if 'MAX(' in query['sql'] or 'COUNT(' in query['sql']])
+        Book.objects.filter(pk=self.book.pk).update(cost=1, updated_at=self.book.updated_at + datetime.timedelta(1))
+        cache.clear()
+        response = c.get('http://127.0.0.1:8000/bs_v1/books/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], etag)
+
+
+class FavouritesMembershipTests(TestCase, GenerateUserDataMixin, GenerateBookDataMixin):
+    """
+        Checks favourites of one buyer don't affect favourites of another buyer.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.buyer = cls.create_user_via_model(buyer=True, postfix='1')
+        cls.buyer_login = cls.generate_user_login_data(buyer=True, postfix='1')
+        cls.other_buyer = cls.create_user_via_model(buyer=True, postfix='2')
+
+        cls._seller = cls.create_user_via_model(seller=True)
+        cls.book = cls.create_book_via_model(seller=cls._seller.seller)
+        Favourites.objects.create(user=cls.other_buyer, book=cls.book)
+
+    def setUp(self):
+        cache.clear()
+        self.buyer_client = Client()
+        self.buyer_client.post('http://127.0.0.1:8000/bs_v1/login', data=self.buyer_login)
+
+    def test_book_favourited_by_other_buyer_can_be_added(self):
+        response = self.buyer_client.post(
+            'http://127.0.0.1:8000/bs_v1/add_book_to_favourites',
+            data={'article_number': self.book.article_number}
+        )
+        self.assertEqual(response.data['msg'], 'Book has been added')
+        response = self.buyer_client.post(
+            'http://127.0.0.1:8000/bs_v1/add_book_to_favourites',
+            data={'article_number': self.book.article_number}
+        )
+        self.assertEqual(response.data['msg'], 'Book has already been added')
+
+    def test_removing_book_keeps_other_buyer_favourites(self):
+        self.buyer_client.post(
+            'http://127.0.0.1:8000/bs_v1/add_book_to_favourites',
+            data={'article_number': self.book.article_number}
+        )
+        response = self.buyer_client.post(
+            'http://127.0.0.1:8000/bs_v1/remove_book_from_favourites',
+            data={'article_number': self.book.article_number}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Favourites.objects.filter(user=self.buyer).exists())
+        self.assertTrue(Favourites.objects.filter(user=self.other_buyer).exists())
+
+
+class FavouritesBatchTests(TestCase, GenerateUserDataMixin, GenerateBookDataMixin):
+    """
+        Checks adding and removing several books to favourites in one request.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.buyer = cls.create_user_via_model(buyer=True)
+        cls.buyer_login = cls.generate_user_login_data(buyer=True)
+
+        cls._seller = cls.create_user_via_model(seller=True)
+        cls.book = cls.create_book_via_model(seller=cls._seller.seller)
+        cls.favourite_book = cls.create_book_via_model(seller=cls._seller.seller)
+        Favourites.objects.create(user=cls.buyer, book=cls.favourite_book)
+        cls.missing_article_number = 0
+
+    def setUp(self):
+        cache.clear()
+        self.buyer_client = Client()
+        self.buyer_client.post('http://127.0.0.1:8000/bs_v1/login', data=self.buyer_login)
+
+    def test_add_books_to_favourites(self):
+        response = self.buyer_client.post(
+            'http://127.0.0.1:8000/bs_v1/add_books_to_favourites',
+            data={'article_numbers': [
+                self.book.article_number, self.favourite_book.article_number, self.missing_article_number
+            ]},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'], [
+            {'article_number': self.book.article_number, 'status': 'added'},
+            {'article_number': self.favourite_book.article_number, 'status': 'already_added'},
+            {'article_number': self.missing_article_number, 'status': 'not_found'},
+        ])
+        self.assertEqual(Favourites.objects.filter(user=self.buyer).count(), 2)
+
+    def test_remove_books_from_favourites(self):
+        response = self.buyer_client.post(
+            'http://127.0.0.1:8000/bs_v1/remove_books_from_favourites',
+            data={'article_numbers': [self.book.article_number, self.favourite_book.article_number]},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'], [
+            {'article_number': self.book.article_number, 'status': 'not_in_favourites'},
+            {'article_number': self.favourite_book.article_number, 'status': 'removed'},
+        ])
+        self.assertFalse(Favourites.objects.filter(user=self.buyer).exists())
+
+    def test_empty_list_is_rejected(self):
+        response = self.buyer_client.post(
+            'http://127.0.0.1:8000/bs_v1/add_books_to_favourites',
+            data={'article_numbers': []},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class HistoryListTests(TestCase, GenerateUserDataMixin, GenerateBookDataMixin):
+    """
+        Checks buyer's history is paginated, filtered by date and fetched with constant number of queries.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.buyer = cls.create_user_via_model(buyer=True)
+        cls.buyer_login = cls.generate_user_login_data(buyer=True)
+
+        cls._seller = cls.create_user_via_model(seller=True)
+        cls.books = [cls.create_book_via_model(seller=cls._seller.seller) for _ in range(3)]
+        for book in cls.books:
+            History.objects.create(user=cls.buyer, book=book)
+        History.objects.filter(book=cls.books[0]).update(date_of_view=datetime.date(2022, 1, 1))
+
+    def setUp(self):
+        self.buyer_client = Client()
+        self.buyer_client.post('http://127.0.0.1:8000/bs_v1/login', data=self.buyer_login)
+
+    def test_history_recently_viewed_first(self):
+        response = self.buyer_client.get('http://127.0.0.1:8000/bs_v1/history', {'page_size': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [book['article_number'] for book in response.data['results']],
+            [self.books[2].article_number, self.books[1].article_number]
+        )
+        next_response = self.buyer_client.get(response.data['next'])
+        self.assertEqual(
+            [book['article_number'] for book in next_response.data['results']],
+            [self.books[0].article_number]
+        )
+
+    def test_history_filtered_by_date(self):
+        response = self.buyer_client.get('http://127.0.0.1:8000/bs_v1/history', {'date_to': '2022-12-31'})
+        self.assertEqual(
+            [book['article_number'] for book in response.data['results']],
+            [self.books[0].article_number]
+        )
+
+    def test_query_count_does_not_depend_on_history_length(self):
+        self.buyer_client.get('http://127.0.0.1:8000/bs_v1/history')  # warm up session
+        with CaptureQueriesContext(connection) as short_history_queries:
+            self.buyer_client.get('http://127.0.0.1:8000/bs_v1/history', {'page_size': 1})
+        with CaptureQueriesContext(connection) as long_history_queries:
+            self.buyer_client.get('http://127.0.0.1:8000/bs_v1/history', {'page_size': 3})
+        self.assertEqual(len(short_history_queries), len(long_history_queries))
+
+
+class BookImportTests(TestCase, GenerateUserDataMixin, GenerateBookDataMixin):
+    """
+        Checks seller can import books from CSV and JSONL files.
+    """
+    csv_header = 'title,author,translator,publisher,genre,cost,article_number,isbn,pages,language,description,count\n'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller_user = cls.create_user_via_model(seller=True)
+        cls.seller_login_data = cls.generate_user_login_data(seller=True)
+        cls.existing_book = cls.create_book_via_model(seller=cls.seller_user.seller)
+
+    def setUp(self):
+        self.seller_client = Client()
+        self.seller_client.post('http://127.0.0.1:8000/bs_v1/login', data=self.seller_login_data)
+
+    def csv_row(self, article_number, isbn=1111111111111):
+        return f'Title,Author,,Publisher,Genre,10.50,{article_number},{isbn},100,English,Description,5\n'
+
+    def test_import_csv(self):
+        content = (
+            self.csv_header
+            + self.csv_row(200001)
+            + self.csv_row(200002)
+            + self.csv_row(200003, isbn=111)  # invalid isbn
+            + self.csv_row(200001)  # duplicate in file
+            + self.csv_row(self.existing_book.article_number)  # already exists
+        )
+        response = self.seller_client.post(
+            'http://127.0.0.1:8000/bs_v1/import_books',
+            data={'file': SimpleUploadedFile('books.csv', content.encode()), 'chunk_size': 2},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['rows'], 5)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual([error['row'] for error in response.data['errors']], [3, 4, 5])
+        self.assertIn('isbn', response.data['errors'][0]['errors'])
+        book = Book.objects.get(article_number=200001)
+        self.assertEqual(book.seller, self.seller_user.seller)
+        self.assertIsNone(book.translator)
+
+    def test_import_jsonl(self):
+        book_data = self.generate_book_creation_data()
+        book_data.pop('seller')
+        content = json.dumps(book_data) + '\nnot json\n'
+        response = self.seller_client.post(
+            'http://127.0.0.1:8000/bs_v1/import_books',
+            data={'file': SimpleUploadedFile('books.jsonl', content.encode())},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual(response.data['errors_count'], 1)
+
+    def test_unknown_format(self):
+        response = self.seller_client.post(
+            'http://127.0.0.1:8000/bs_v1/import_books',
+            data={'file': SimpleUploadedFile('books.txt', b'')},
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class BookUpsertImportTests(TestCase, GenerateUserDataMixin, GenerateBookDataMixin):
+    """
+        Checks re-import in upsert mode updates only changed books of the seller.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller_user = cls.create_user_via_model(seller=True, postfix='1')
+        cls.seller_login_data = cls.generate_user_login_data(seller=True, postfix='1')
+        cls.other_seller_user = cls.create_user_via_model(seller=True, postfix='2')
+        cls.unchanged_book = cls.create_book_via_model(seller=cls.seller_user.seller)
+        cls.changed_book = cls.create_book_via_model(seller=cls.seller_user.seller)
+        cls.other_seller_book = cls.create_book_via_model(seller=cls.other_seller_user.seller)
+
+    def setUp(self):
+        self.seller_client = Client()
+        self.seller_client.post('http://127.0.0.1:8000/bs_v1/login', data=self.seller_login_data)
+
+    @staticmethod
+    def book_row(book, **changes):
+        row = {field: getattr(book, field) for field in (
+            'title', 'author', 'translator', 'publisher', 'genre', 'article_number',
+            'isbn', 'pages', 'language', 'description', 'is_on_sale', 'count',
+        )}
+        row['cost'] = str(book.cost)
+        row.update(changes)
+        return json.dumps(row) + '\n'
+
+    def test_upsert_import(self):
+        new_book_data = self.generate_book_creation_data()
+        new_book_data.pop('seller')
+        new_book_data['article_number'] = 200001
+        content = (
+            self.book_row(self.unchanged_book)
+            + self.book_row(self.changed_book, count=1)
+            + self.book_row(self.other_seller_book, count=1)
+            + json.dumps(new_book_data) + '\n'
+        )
+        unchanged_updated_at = self.unchanged_book.updated_at
+        response = self.seller_client.post(
+            'http://127.0.0.1:8000/bs_v1/import_books',
+            data={'file': SimpleUploadedFile('books.jsonl', content.encode()), 'mode': 'upsert'},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            (response.data['created'], response.data['updated'], response.data['unchanged']),
+            (1, 1, 1)
+        )
+        self.assertEqual([error['row'] for error in response.data['errors']], [3])
+        self.assertEqual(Book.objects.get(pk=self.changed_book.pk).count, 1)
+        self.assertEqual(Book.objects.get(pk=self.unchanged_book.pk).updated_at, unchanged_updated_at)
+        self.assertNotEqual(Book.objects.get(pk=self.other_seller_book.pk).count, 1)
+
+    def test_updated_book_is_unchanged_on_next_import(self):
+        content = self.book_row(self.changed_book, count=1)
+        for _ in range(2):
+            response = self.seller_client.post(
+                'http://127.0.0.1:8000/bs_v1/import_books',
+                data={'file': SimpleUploadedFile('books.jsonl', content.encode()), 'mode': 'upsert'},
+            )
+        self.assertEqual((response.data['updated'], response.data['unchanged']), (0, 1))
+
+    def test_reimport_keeps_reserved_books(self):
+        book = Book.objects.get(pk=self.changed_book.pk)
+        content = self.book_row(book)
+        reserve_stock(book, 3)
+        response = self.seller_client.post(
+            'http://127.0.0.1:8000/bs_v1/import_books',
+            data={'file': SimpleUploadedFile('books.jsonl', content.encode()), 'mode': 'upsert'},
+        )
+        self.assertEqual((response.data['updated'], response.data['unchanged']), (0, 1))
+        self.assertEqual(Book.objects.get(pk=book.pk).count, book.count - 3)
+        content = self.book_row(book, count=book.count + 1)
+        self.seller_client.post(
+            'http://127.0.0.1:8000/bs_v1/import_books',
+            data={'file': SimpleUploadedFile('books.jsonl', content.encode()), 'mode': 'upsert'},
+        )
+        self.assertEqual(Book.objects.get(pk=book.pk).count, book.count - 2)
+
+    def test_import_changes_sharded_stock_by_difference(self):
+        book = Book.objects.get(pk=self.changed_book.pk)
+        shard_stock(book, 2)
+        book.refresh_from_db()
+        reserve_stock(book, 2)
+        content = self.book_row(book, count=book.count + 4)
+        response = self.seller_client.post(
+            'http://127.0.0.1:8000/bs_v1/import_books',
+            data={'file': SimpleUploadedFile('books.jsonl', content.encode()), 'mode': 'upsert'},
+        )
+        self.assertEqual(response.data['updated'], 1)
+        self.assertEqual(Book.objects.get(pk=book.pk).count, book.count + 2)
+        self.assertEqual(sum(StockShard.objects.filter(book=book).values_list('count', flat=True)), book.count + 2)
+
+
+class BookExportTests(TestCase, GenerateUserDataMixin, GenerateBookDataMixin):
+    """
+        Checks books export in every format and export access.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller_user = cls.create_user_via_model(seller=True, postfix='1')
+        cls.seller_login_data = cls.generate_user_login_data(seller=True, postfix='1')
+        cls.other_seller_user = cls.create_user_via_model(seller=True, postfix='2')
+        cls.admin = cls.create_user_via_model(admin=True)
+        cls.admin_login_data = cls.generate_user_login_data(admin=True)
+        cls.buyer = cls.create_user_via_model(buyer=True)
+        cls.buyer_login_data = cls.generate_user_login_data(buyer=True)
+
+        cls.book = cls.create_book_via_model(seller=cls.seller_user.seller)
+        cls.other_seller_book = cls.create_book_via_model(seller=cls.other_seller_user.seller)
+
+    def export(self, login_data, params):
+        c = Client()
+        c.post('http://127.0.0.1:8000/bs_v1/login', data=login_data)
+        return c.get('http://127.0.0.1:8000/bs_v1/export_books', params)
+
+    def test_seller_exports_own_books_to_csv(self):
+        response = self.export(self.seller_login_data, {'file_format': 'csv'})
+        self.assertEqual(response.status_code, 200)
+        rows = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual([int(row['article_number']) for row in rows], [self.book.article_number])
+
+    def test_staff_exports_seller_books_to_jsonl(self):
+        response = self.export(self.admin_login_data, {
+            'file_format': 'jsonl',
+            'seller': self.other_seller_user.seller.pk,
+        })
+        self.assertEqual(response.status_code, 200)
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([row['article_number'] for row in rows], [self.other_seller_book.article_number])
+
+    def test_export_to_xls(self):
+        response = self.export(self.admin_login_data, {'file_format': 'xls'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['Content-Type'], 'application/vnd.ms-excel')
+        self.assertTrue(b''.join(response.streaming_content))
+
+    def test_buyer_cannot_export(self):
+        response = self.export(self.buyer_login_data, {'file_format': 'csv'})
+        self.assertEqual(response.status_code, 403)
+
+
+class BookListFieldsTests(TestCase, GenerateUserDataMixin, GenerateBookDataMixin):
+    """
+        Checks compact catalogue representation and sparse fieldsets.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls._seller = cls.create_user_via_model(seller=True)
+        cls.book = cls.create_book_via_model(seller=cls._seller.seller)
+
+    def test_catalogue_has_compact_representation(self):
+        c = Client()
+        response = c.get('http://127.0.0.1:8000/bs_v1/books/')
+        self.assertEqual(
+            set(response.data['results'][0]),
+            {'id', 'article_number', 'title', 'author', 'cost', 'rating'}
+        )
+
+    def test_catalogue_returns_requested_fields(self):
+        c = Client()
+        with CaptureQueriesContext(connection) as queries:
+            response = c.get('http://127.0.0.1:8000/bs_v1/books/', {'fields': 'title,description'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.data['results'][0],
+            {'title': self.book.title, 'description': self.book.description}
+        )
+        self.assertNotIn('"isbn"', queries[-1]['sql'])
+
+    def test_unknown_field(self):
+        c = Client()
+        response = c.get('http://127.0.0.1:8000/bs_v1/books/', {'fields': 'title,content_hash'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_book_detail_has_full_representation(self):
+        c = Client()
+        response = c.get('http://127.0.0.1:8000/bs_v1/books/' + str(self.book.article_number) + '/')
+        self.assertIn('description', response.data)
+
+
+class BookValuesSerializerTests(TestCase, GenerateUserDataMixin, GenerateBookDataMixin):
+    """
+        Checks that BookValuesSerializer renders the same JSON as BookSerializer.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls._seller = cls.create_user_via_model(seller=True)
+        for cost in ('10', '10.5', '0.01', '123456.78'):
+            book = cls.create_book_via_model(seller=cls._seller.seller)
+            Book.objects.filter(pk=book.pk).update(cost=Decimal(cost), translator=None)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_same_json_as_book_serializer(self):
+        books = Book.objects.order_by('id')
+        renderer = JSONRenderer()
+        self.assertEqual(
+            renderer.render(BookValuesSerializer().represent(books.values(*BOOK_FIELDS))),
+            renderer.render(BookSerializer(books, many=True).data),
+        )
+
+    def test_catalogue_is_represented_as_book_serializer_does(self):
+        c = Client()
+        response = c.get('http://127.0.0.1:8000/bs_v1/books/', {'fields': ','.join(BOOK_FIELDS)})
+        self.assertEqual(
+            json.loads(response.content)['results'],
+            json.loads(JSONRenderer().render(BookSerializer(Book.objects.order_by('article_number'), many=True).data)),
+        )
+
+
+class SellerRequestQueriesTests(TestCase, GenerateUserDataMixin, GenerateBookDataMixin):
+    """
+        Checks that seller is loaded with the user and isn't looked up by permission checks.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller_owner = cls.create_user_via_model(seller=True)
+        cls.seller_owner_login_data = cls.generate_user_login_data(seller=True)
+        cls.book = cls.create_book_via_model(seller=cls.seller_owner.seller)
+        cls._data_to_edit_book = cls.data_to_edit_book()
+
+    def edit_book(self, c, **extra):
+        with CaptureQueriesContext(connection) as queries:
+            response = c.patch(
+                'http://127.0.0.1:8000/bs_v1/edit_book/' + str(self.book.article_number),
+                data=self._data_to_edit_book,
+                content_type='application/json',
+                **extra
+            )
+        self.assertEqual(response.status_code, 200)
+        seller_queries = [query['sql'] for query in queries if 'FROM "users_seller"' in query['sql']]
+        self.assertEqual(seller_queries, [])
+
+    def test_session_user_is_loaded_with_seller(self):
+        c = Client()
+        c.post('http://127.0.0.1:8000/bs_v1/login', data=self.seller_owner_login_data)
+        self.edit_book(c)
+
+    def test_session_made_by_previous_backend_is_kept(self):
+        c = Client()
+        c.force_login(self.seller_owner, backend='django.contrib.auth.backends.ModelBackend')
+        response = c.get('http://127.0.0.1:8000/bs_v1/profile')
+        self.assertEqual(response.status_code, 200)
+
+    def test_token_user_is_loaded_with_seller(self):
+        key = Client().post('http://127.0.0.1:8000/bs_v1/login', data=self.seller_owner_login_data).data['key']
+        self.edit_book(Client(), HTTP_AUTHORIZATION='Token ' + key)
+
+
+class CachedTokenAuthenticationTests(TestCase, GenerateUserDataMixin):
+    """
+        Checks that users of tokens are cached and cache is invalidated on logout and user changes.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.buyer = cls.create_user_via_model(buyer=True)
+        cls.buyer_login_data = cls.generate_user_login_data(buyer=True)
+
+    def setUp(self):
+        token_user_cache.clear()
+        key = Client().post('http://127.0.0.1:8000/bs_v1/login', data=self.buyer_login_data).data['key']
+        self.c = Client(HTTP_AUTHORIZATION='Token ' + key)
+
+    def get_profile(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.c.get('http://127.0.0.1:8000/bs_v1/profile')
+        auth_queries = [
+            query['sql'] for query in queries
+            if 'FROM "authtoken_token"' in query['sql'] or 'FROM "users_bookstoreuser"' in query['sql']
+        ]
+        return response, auth_queries
+
+    def test_repeat_request_does_not_query_auth_tables(self):
+        response, auth_queries = self.get_profile()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(auth_queries), 1)
+        response, auth_queries = self.get_profile()
+        self.assertEqual(response.data['email'], self.buyer.email)
+        self.assertEqual(auth_queries, [])
+        self.assertEqual(token_user_cache.stats()['hits'], 1)
+
+    def test_logout_invalidates_token(self):
+        self.get_profile()
+        self.c.post('http://127.0.0.1:8000/bs_v1/logout')
+        response, _ = self.get_profile()
+        self.assertEqual(response.status_code, 403)
+
+    def test_deactivation_invalidates_token(self):
+        self.get_profile()
+        self.buyer.is_active = False
+        self.buyer.save()
+        response, _ = self.get_profile()
+        self.assertEqual(response.status_code, 403)
+
+    def test_password_change_invalidates_token_user(self):
+        self.get_profile()
+        self.buyer.set_password('new-password-1234')
+        self.buyer.save()
+        self.assertEqual(token_user_cache.stats()['size'], 0)
+        _, auth_queries = self.get_profile()
+        self.assertEqual(len(auth_queries), 1)
+
+
+@override_settings(BOOKSTORE_JWT={'ENABLED': True, 'ACCESS_LIFETIME': 300, 'REFRESH_LIFETIME': 3600})
+class JWTAuthenticationTests(TestCase, GenerateUserDataMixin, GenerateBookDataMixin):
+    """
+        Checks issue, refresh and revocation of signed tokens and authentication by them.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller_user = cls.create_user_via_model(seller=True)
+        cls.seller_login_data = cls.generate_user_login_data(seller=True)
+        cls.book = cls.create_book_via_model(seller=cls.seller_user.seller)
+
+    def setUp(self):
+        revocation_list.clear()
+        self.tokens = Client().post('http://127.0.0.1:8000/bs_v1/login', data=self.seller_login_data).data
+
+    def bearer_client(self, access):
+        return Client(HTTP_AUTHORIZATION='Bearer ' + access)
+
+    def test_login_returns_signed_tokens(self):
+        self.assertIn('key', self.tokens)
+        self.assertIn('access', self.tokens)
+        self.assertIn('refresh', self.tokens)
+
+    @override_settings(BOOKSTORE_JWT={'ENABLED': False})
+    def test_login_without_signed_tokens(self):
+        tokens = Client().post('http://127.0.0.1:8000/bs_v1/login', data=self.seller_login_data).data
+        self.assertNotIn('access', tokens)
+
+    def test_safe_request_is_authenticated_without_queries(self):
+        c = self.bearer_client(self.tokens['access'])
+        c.get('http://127.0.0.1:8000/bs_v1/profile')
+        with self.assertNumQueries(0):
+            response = c.get('http://127.0.0.1:8000/bs_v1/profile')
+        self.assertEqual(response.data['email'], self.seller_user.email)
+
+    def test_seller_edits_book_with_access_token(self):
+        c = self.bearer_client(self.tokens['access'])
+        response = c.patch(
+            'http://127.0.0.1:8000/bs_v1/edit_book/' + str(self.book.article_number),
+            data={'title': 'Edited title'},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_refresh_token_is_used_once(self):
+        c = Client()
+        response = c.post('http://127.0.0.1:8000/bs_v1/refresh_token', data={'refresh': self.tokens['refresh']})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.bearer_client(response.data['access']).get(
+            'http://127.0.0.1:8000/bs_v1/profile'
+        ).status_code, 200)
+        response = c.post('http://127.0.0.1:8000/bs_v1/refresh_token', data={'refresh': self.tokens['refresh']})
+        self.assertEqual(response.status_code, 401)
+
+    def test_refresh_token_used_by_concurrent_request(self):
+        # other worker has used the token after revoked tokens were loaded here
+        claims = jwt.decode(self.tokens['refresh'], options={'verify_signature': False})
+        revocation_list.load()
+        RevokedToken.objects.create(
+            jti=claims['jti'],
+            expires_at=datetime.datetime.fromtimestamp(claims['exp'], tz=datetime.timezone.utc),
+        )
+        response = Client().post('http://127.0.0.1:8000/bs_v1/refresh_token', data={'refresh': self.tokens['refresh']})
+        self.assertEqual(response.status_code, 401)
+
+    def test_access_token_is_not_refresh_token(self):
+        response = Client().post('http://127.0.0.1:8000/bs_v1/refresh_token', data={'refresh': self.tokens['access']})
+        self.assertEqual(response.status_code, 401)
+
+    def test_logout_revokes_tokens(self):
+        c = self.bearer_client(self.tokens['access'])
+        c.post('http://127.0.0.1:8000/bs_v1/logout', data={'refresh': self.tokens['refresh']})
+        self.assertEqual(c.get('http://127.0.0.1:8000/bs_v1/profile').status_code, 403)
+        revocation_list.clear()  # revoked tokens are loaded from database
+        response = Client().post('http://127.0.0.1:8000/bs_v1/refresh_token', data={'refresh': self.tokens['refresh']})
+        self.assertEqual(response.status_code, 401)
+
+    @override_settings(BOOKSTORE_JWT={'ENABLED': True, 'ACCESS_LIFETIME': -1})
+    def test_expired_access_token(self):
+        tokens = Client().post('http://127.0.0.1:8000/bs_v1/login', data=self.seller_login_data).data
+        response = self.bearer_client(tokens['access']).get('http://127.0.0.1:8000/bs_v1/profile')
+        self.assertEqual(response.status_code, 403)
+
+
+@override_settings(REPLICA_ROUTING={'REPLICAS': ['replica_1'], 'PIN_SECONDS': 5, 'HEALTH_CHECK_INTERVAL': 10})
+class ReplicaRoutingTests(SimpleTestCase):
+    """
+        Checks that only reads of safe requests not pinned to primary go to replica.
+    """
+
+    def setUp(self):
+        replica_health.clear()
+        replica_health.record('replica_1', True)
+
+    def route(self, method, cookies=None):
+        request = RequestFactory().generic(method, '/bs_v1/books/')
+        request.COOKIES.update(cookies or {})
+        routed = {}
+
+        def get_response(request):
+            routed['read'] = ReplicaRouter().db_for_read(Book)
+            routed['write'] = ReplicaRouter().db_for_write(Book)
+            routed['cached'] = BookViewSet(action='retrieve').get_primary_queryset().db
+            return HttpResponse()
+
+        response = PrimaryPinningMiddleware(get_response)(request)
+        return routed, response
+
+    def test_safe_request_reads_from_replica(self):
+        routed, response = self.route('GET')
+        self.assertEqual(routed, {'read': 'replica_1', 'write': 'default', 'cached': 'default'})
+        self.assertNotIn(PrimaryPinningMiddleware.cookie_name, response.cookies)
+
+    def test_unsafe_request_pins_client_to_primary(self):
+        routed, response = self.route('POST')
+        self.assertEqual(routed['read'], 'default')
+        self.assertEqual(response.cookies[PrimaryPinningMiddleware.cookie_name]['max-age'], 5)
+        routed, _ = self.route('GET', {PrimaryPinningMiddleware.cookie_name: '1'})
+        self.assertEqual(routed['read'], 'default')
+
+    def test_unhealthy_replica_is_not_used(self):
+        replica_health.record('replica_1', False)
+        routed, _ = self.route('GET')
+        self.assertEqual(routed['read'], 'default')
+
+    def test_reads_outside_request_go_to_primary(self):
+        self.assertEqual(ReplicaRouter().db_for_read(Book), 'default')
+
+
+class AsyncViewsTests(TestCase, GenerateUserDataMixin, GenerateBookDataMixin):
+    """
+        Checks async endpoints return the same data as sync ones.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.buyer = cls.create_user_via_model(buyer=True)
+        cls.buyer_login = cls.generate_user_login_data(buyer=True)
+        cls._seller = cls.create_user_via_model(seller=True)
+        cls.books = [cls.create_book_via_model(seller=cls._seller.seller) for _ in range(3)]
+        Favourites.objects.create(user=cls.buyer, book=cls.books[0])
+
+    def setUp(self):
+        cache.clear()
+        self.buyer_client = Client()
+        self.buyer_client.post('http://127.0.0.1:8000/bs_v1/login', data=self.buyer_login)
+
+    def test_async_catalogue_equals_sync_catalogue(self):
+        params = {'page_size': 2, 'ordering': '-cost'}
+        response = self.client.get('/bs_v1/async/books/', params)
+        self.assertEqual(response.status_code, 200)
+        async_data = json.loads(response.content)
+        cache.clear()
+        sync_data = json.loads(self.client.get('/bs_v1/books/', params).content)
+        self.assertEqual(async_data['results'], sync_data['results'])
+        self.assertEqual(async_data['next'].replace('/async', ''), sync_data['next'])
+
+    def test_async_catalogue_conditional_get(self):
+        response = self.client.get('/bs_v1/async/books/')
+        response = self.client.get('/bs_v1/async/books/', HTTP_IF_NONE_MATCH=response.headers['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    async def test_async_catalogue_invalid_filter(self):
+        response = await AsyncClient().get('/bs_v1/async/books/', {'rating_min': 10})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('rating_min', json.loads(response.content))
+
+    def test_async_book_detail_is_added_to_history(self):
+        article_number = self.books[1].article_number
+        response = self.buyer_client.get(f'/bs_v1/async/books/{article_number}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)['article_number'], article_number)
+        history_recorder.flush()  # async view queues the view
+        self.assertTrue(History.objects.filter(user=self.buyer, book=self.books[1]).exists())
+        response = self.buyer_client.get('/bs_v1/async/history')
+        self.assertEqual([book['article_number'] for book in json.loads(response.content)['results']], [article_number])
+
+    async def test_async_book_not_found(self):
+        response = await AsyncClient().get('/bs_v1/async/books/1/')
+        self.assertEqual(response.status_code, 404)
+
+    def test_async_favourites(self):
+        response = self.buyer_client.get('/bs_v1/async/favourites')
+        self.assertEqual(
+            json.loads(response.content)['results'],
+            json.loads(self.buyer_client.get('/bs_v1/favourites').content)['results'],
+        )
+
+    def test_async_history_pages_equal_sync_pages(self):
+        for book in self.books:
+            History.objects.create(user=self.buyer, book=book)
+        response = self.buyer_client.get('/bs_v1/async/history', {'page_size': 2})
+        async_data = json.loads(response.content)
+        sync_data = json.loads(self.buyer_client.get('/bs_v1/history', {'page_size': 2}).content)
+        self.assertEqual(async_data['results'], sync_data['results'])
+        async_next = json.loads(self.buyer_client.get(async_data['next']).content)
+        self.assertEqual(async_next['results'], json.loads(self.buyer_client.get(sync_data['next']).content)['results'])
+
+    def test_async_catalogue_uses_async_orm(self):
+        with mock.patch('api.views.BookViewSet.paginate_queryset') as paginate_queryset:
+            response = self.client.get('/bs_v1/async/books/')
+        self.assertEqual(response.status_code, 200)
+        paginate_queryset.assert_not_called()
+
+    async def test_anonymous_cannot_get_async_favourites(self):
+        response = await AsyncClient().get('/bs_v1/async/favourites')
+        self.assertEqual(response.status_code, 403)
+
+
+class ShoppingCartTests(TestCase, GenerateUserDataMixin, GenerateBookDataMixin):
+    """
+        Checks that books in cart are reserved in stock and never exceed it.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.buyer = cls.create_user_via_model(buyer=True)
+        cls.buyer_login = cls.generate_user_login_data(buyer=True)
+        cls._seller = cls.create_user_via_model(seller=True)
+        cls.seller_login = cls.generate_user_login_data(seller=True)
+        cls.book = cls.create_book_via_model(seller=cls._seller.seller)
+        Book.objects.filter(pk=cls.book.pk).update(count=5)
+
+    def setUp(self):
+        self.buyer_client = Client()
+        self.buyer_client.post('http://127.0.0.1:8000/bs_v1/login', data=self.buyer_login)
+
+    def post(self, url, **data):
+        return self.buyer_client.post(
+            'http://127.0.0.1:8000/bs_v1/' + url,
+            data={'article_number': self.book.article_number, **data},
+        )
+
+    def assertStock(self, count, in_cart):
+        self.assertEqual(Book.objects.get(pk=self.book.pk).count, count)
+        self.assertEqual(
+            sum(ShoppingCart.objects.filter(user=self.buyer).values_list('book_count', flat=True)),
+            in_cart
+        )
+
+    def test_add_book_to_cart_reserves_stock(self):
+        response = self.post('add_book_to_cart', book_count=2)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['book_count'], 2)
+        response = self.post('add_book_to_cart', book_count=1)
+        self.assertEqual(response.data['book_count'], 3)
+        self.assertStock(2, 3)
+
+    def test_cannot_add_more_books_than_in_stock(self):
+        self.post('add_book_to_cart', book_count=4)
+        response = self.post('add_book_to_cart', book_count=2)
+        self.assertEqual(response.status_code, 409)
+        self.assertStock(1, 4)
+
+    def test_update_cart_reserves_and_releases_difference(self):
+        self.post('add_book_to_cart', book_count=2)
+        self.assertEqual(self.post('update_cart', book_count=4).data['book_count'], 4)
+        self.assertStock(1, 4)
+        self.assertEqual(self.post('update_cart', book_count=6).status_code, 409)
+        self.post('update_cart', book_count=1)
+        self.assertStock(4, 1)
+        self.post('update_cart', book_count=0)
+        self.assertStock(5, 0)
+        self.assertFalse(ShoppingCart.objects.filter(user=self.buyer).exists())
+
+    def test_seller_edit_keeps_reserved_stock(self):
+        self.post('add_book_to_cart', book_count=3)
+        seller_client = Client()
+        seller_client.post('http://127.0.0.1:8000/bs_v1/login', data=self.seller_login)
+        response = seller_client.patch(
+            'http://127.0.0.1:8000/bs_v1/edit_book/' + str(self.book.article_number),
+            data={'title': 'Edited title'},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertStock(2, 3)
+
+    def test_remove_book_from_cart_releases_stock(self):
+        self.post('add_book_to_cart', book_count=3, type='E')
+        self.assertEqual(self.post('remove_book_from_cart').data['msg'],
+                         'You does not have that book in your cart to delete it')
+        self.post('remove_book_from_cart', type='E')
+        self.assertStock(5, 0)
+
+    def test_cart(self):
+        self.post('add_book_to_cart', book_count=2)
+        self.post('add_book_to_cart', book_count=1, type='A')
+        response = self.buyer_client.get('http://127.0.0.1:8000/bs_v1/cart')
+        self.assertEqual(
+            [(line['article_number'], line['type'], line['book_count']) for line in response.data],
+            [(self.book.article_number, 'S', 2), (self.book.article_number, 'A', 1)]
+        )
+
+    def test_seller_cannot_use_cart(self):
+        c = Client()
+        c.post('http://127.0.0.1:8000/bs_v1/login', data=self.seller_login)
+        response = c.post('http://127.0.0.1:8000/bs_v1/add_book_to_cart', data={'article_number': self.book.article_number})
+        self.assertEqual(response.status_code, 403)
+
+    def test_book_not_on_sale_cannot_be_reserved(self):
+        Book.objects.filter(pk=self.book.pk).update(is_on_sale=False)
+        self.assertEqual(self.post('add_book_to_cart').status_code, 409)
+
+
+class CheckoutTests(TestCase, GenerateUserDataMixin, GenerateBookDataMixin):
+    """
+        Checks that cart is turned into order once and retried checkout returns the same order.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.buyer = cls.create_user_via_model(buyer=True)
+        cls.buyer_login = cls.generate_user_login_data(buyer=True)
+        cls._seller = cls.create_user_via_model(seller=True)
+        cls.books = [cls.create_book_via_model(seller=cls._seller.seller) for _ in range(3)]
+        Book.objects.filter(pk__in=[book.pk for book in cls.books]).update(count=10)
+
+    def setUp(self):
+        self.buyer_client = Client()
+        self.buyer_client.post('http://127.0.0.1:8000/bs_v1/login', data=self.buyer_login)
+        for number, book in enumerate(self.books, start=1):
+            self.buyer_client.post(
+                'http://127.0.0.1:8000/bs_v1/add_book_to_cart',
+                data={'article_number': book.article_number, 'book_count': number}
+            )
+
+    def checkout(self, **extra):
+        return self.buyer_client.post('http://127.0.0.1:8000/bs_v1/checkout', **extra)
+
+    def test_checkout_turns_cart_into_order(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.checkout()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            [(line['article_number'], line['book_count']) for line in response.data['lines']],
+            [(book.article_number, number) for number, book in enumerate(self.books, start=1)]
+        )
+        books = Book.objects.in_bulk([book.pk for book in self.books])
+        self.assertEqual(
+            Decimal(response.data['total_cost']),
+            sum(books[book.pk].cost * number for number, book in enumerate(self.books, start=1))
+        )
+        # stock has been reserved by cart
+        self.assertEqual([books[book.pk].count for book in self.books], [9, 8, 7])
+        self.assertFalse(ShoppingCart.objects.filter(user=self.buyer).exists())
+        book_queries = [query['sql'] for query in queries if query['sql'].startswith('SELECT "books_book"')]
+        self.assertEqual(len(book_queries), 1)
+        self.assertIn('ORDER BY "books_book"."article_number"', book_queries[0])
+
+    def test_retried_checkout_returns_the_same_order(self):
+        response = self.checkout(HTTP_IDEMPOTENCY_KEY='checkout-1')
+        self.assertEqual(response.status_code, 201)
+        retried_response = self.checkout(HTTP_IDEMPOTENCY_KEY='checkout-1')
+        self.assertEqual(retried_response.status_code, 200)
+        self.assertEqual(retried_response.data, response.data)
+        self.assertEqual(Order.objects.filter(user=self.buyer).count(), 1)
+
+    def test_other_integrity_error_is_not_taken_for_retry(self):
+        with mock.patch('users.cart.OrderLine.objects.bulk_create', side_effect=IntegrityError):
+            with self.assertRaises(IntegrityError):
+                checkout(self.buyer, 'checkout-3')
+        self.assertFalse(Order.objects.filter(user=self.buyer).exists())
+
+    def test_empty_cart(self):
+        self.checkout()
+        self.assertEqual(self.checkout().status_code, 400)
+
+    def test_books_not_on_sale(self):
+        Book.objects.filter(pk=self.books[1].pk).update(is_on_sale=False)
+        response = self.checkout(HTTP_IDEMPOTENCY_KEY='checkout-2')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['article_numbers'], [self.books[1].article_number])
+        self.assertEqual(ShoppingCart.objects.filter(user=self.buyer).count(), 3)
+        self.assertFalse(Order.objects.filter(user=self.buyer).exists())
+
+    def test_orders(self):
+        order_id = self.checkout().data['id']
+        response = self.buyer_client.get('http://127.0.0.1:8000/bs_v1/orders')
+        self.assertEqual([order['id'] for order in response.data['results']], [order_id])
+
+
+class ReviewTests(TestCase, GenerateUserDataMixin, GenerateBookDataMixin):
+    """
+        Checks that reviews keep rating sum, count and average of the book and catalogue is sorted by rating.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.buyers = [cls.create_user_via_model(buyer=True, postfix=str(number)) for number in range(2)]
+        cls._seller = cls.create_user_via_model(seller=True)
+        cls.books = [cls.create_book_via_model(seller=cls._seller.seller) for _ in range(2)]
+
+    def setUp(self):
+        self.clients = []
+        for number in range(2):
+            client = Client()
+            client.post(
+                'http://127.0.0.1:8000/bs_v1/login',
+                data=self.generate_user_login_data(buyer=True, postfix=str(number))
+            )
+            self.clients.append(client)
+
+    def review(self, client, url='add_review', book=None, **data):
+        book = book or self.books[0]
+        return client.post(f'http://127.0.0.1:8000/bs_v1/{url}', data={'article_number': book.article_number, **data})
+
+    def assert_book_rating(self, book, rating, rating_sum, rating_count):
+        book = Book.objects.get(pk=book.pk)
+        self.assertEqual((book.rating, book.rating_sum, book.rating_count), (Decimal(rating), rating_sum, rating_count))
+
+    def test_reviews_change_book_rating(self):
+        self.assert_book_rating(self.books[0], '0', 0, 0)
+        response = self.review(self.clients[0], rating=5, text='Great')
+        self.assertEqual(response.status_code, 201)
+        self.review(self.clients[1], rating=2)
+        self.assert_book_rating(self.books[0], '3.5', 7, 2)
+        self.assertEqual(self.review(self.clients[0], url='edit_review', rating=3).status_code, 200)
+        self.assert_book_rating(self.books[0], '2.5', 5, 2)
+        self.assertEqual(self.review(self.clients[1], url='remove_review').status_code, 200)
+        self.assert_book_rating(self.books[0], '3', 3, 1)
+        self.review(self.clients[0], url='remove_review')
+        self.assert_book_rating(self.books[0], '0', 0, 0)
+
+    def test_book_can_be_reviewed_once(self):
+        self.review(self.clients[0], rating=4)
+        self.assertEqual(self.review(self.clients[0], rating=1).status_code, 409)
+        self.assert_book_rating(self.books[0], '4', 4, 1)
+
+    def test_invalid_rating(self):
+        self.assertEqual(self.review(self.clients[0], rating=6).status_code, 400)
+        self.assertEqual(self.review(self.clients[0], url='edit_review', rating=3).status_code, 404)
+        self.assertFalse(Review.objects.exists())
+
+    def test_book_reviews(self):
+        self.review(self.clients[0], rating=5, text='Great')
+        self.review(self.clients[1], rating=2, text='Boring')
+        response = Client().get(f'http://127.0.0.1:8000/bs_v1/reviews/{self.books[0].article_number}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([review['text'] for review in response.data['results']], ['Boring', 'Great'])
+
+    def test_seller_edit_keeps_rating(self):
+        book = Book.objects.get(pk=self.books[0].pk)
+        self.review(self.clients[0], rating=4)
+        book.count = 5
+        book.save()
+        self.assert_book_rating(book, '4', 4, 1)
+
+    def test_catalogue_sorted_by_rating(self):
+        self.review(self.clients[0], book=self.books[0], rating=2)
+        self.review(self.clients[0], book=self.books[1], rating=5)
+        response = Client().get('http://127.0.0.1:8000/bs_v1/books/', {'ordering': '-rating', 'rating_min': '1.5'})
+        self.assertEqual(
+            [book['article_number'] for book in response.data['results']],
+            [self.books[1].article_number, self.books[0].article_number]
+        )
+        self.assertEqual(response.data['results'][0]['rating'], '5.00')
+
+    def test_deleting_user_takes_ratings_of_reviews(self):
+        self.review(self.clients[0], rating=5)
+        self.review(self.clients[1], rating=2)
+        self.review(self.clients[1], book=self.books[1], rating=3)
+        self.buyers[1].delete()
+        self.assert_book_rating(self.books[0], '5', 5, 1)
+        self.assert_book_rating(self.books[1], '0', 0, 0)
+
+    def test_bulk_deleting_reviews_takes_ratings(self):
+        self.review(self.clients[0], rating=5)
+        self.review(self.clients[1], rating=2)
+        Review.objects.filter(rating__lt=3).delete()
+        self.assert_book_rating(self.books[0], '5', 5, 1)
+
+    def test_deleting_book_deletes_reviews(self):
+        self.review(self.clients[0], rating=5)
+        book = Book.objects.get(pk=self.books[0].pk)
+        with CaptureQueriesContext(connection) as queries:
+            book.delete()
+        self.assertFalse(Review.objects.exists())
+        self.assertFalse(any(query['sql'].startswith('UPDATE') for query in queries.captured_queries))
+
+    def test_cached_book_is_dropped_after_commit(self):
+        book = Book.objects.get(pk=self.books[0].pk)
+        with self.captureOnCommitCallbacks() as callbacks:
+            add_review(self.buyers[0], book, 4)
+        self.assertEqual(len(callbacks), 1)
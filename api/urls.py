@@ -1,33 +1,69 @@
 from django.urls import path
 from .views import (
     BookStoreUserRegisterView,
+    BookStoreUserLoginView,
+    BookStoreUserLogoutView,
+    TokenRefreshView,
     BookStoreUserCurrentView,
     BookStoreUserViewSet,
     BookCreateView,
     BookEditView,
+    BookImportView,
+    BookExportView,
     BookViewSet,
     AddBookToFavouritesView,
     FavouritesView,
     HistoryView,
     RemoveBookFromFavouritesView,
+    AddBooksToFavouritesView,
+    RemoveBooksFromFavouritesView,
+    CartView,
+    AddBookToCartView,
+    UpdateCartView,
+    RemoveBookFromCartView,
+    CheckoutView,
+    OrdersView,
+    BookReviewsView,
+    AddReviewView,
+    EditReviewView,
+    RemoveReviewView,
+    StatsView,
 )
-from dj_rest_auth.views import (
-    LoginView,
-    LogoutView,
-)
+from . import async_views
 from rest_framework.routers import DefaultRouter
 router = DefaultRouter()
 router.register(r'users', BookStoreUserViewSet, basename='user')
 router.register(r'books', BookViewSet, basename='book')
 urlpatterns = [
     path('signup', BookStoreUserRegisterView.as_view(), name='signup'),
-    path('login', LoginView.as_view(), name='login'),
-    path('logout', LogoutView.as_view(), name='logout'),
+    path('login', BookStoreUserLoginView.as_view(), name='login'),
+    path('logout', BookStoreUserLogoutView.as_view(), name='logout'),
+    path('refresh_token', TokenRefreshView.as_view(), name='refresh_token'),
     path('profile', BookStoreUserCurrentView.as_view(), name='profile'),
     path('create_book', BookCreateView.as_view(), name='create_book'),
     path('edit_book/<slug:article_number>', BookEditView.as_view(), name='edit_book'),
+    path('import_books', BookImportView.as_view(), name='import_books'),
+    path('export_books', BookExportView.as_view(), name='export_books'),
     path('add_book_to_favourites', AddBookToFavouritesView.as_view(), name='add_book_to_fav'),
     path('favourites', FavouritesView.as_view(), name='favourites'),
     path('remove_book_from_favourites', RemoveBookFromFavouritesView.as_view(), name='remove_book'),
+    path('add_books_to_favourites', AddBooksToFavouritesView.as_view(), name='add_books_to_fav'),
+    path('remove_books_from_favourites', RemoveBooksFromFavouritesView.as_view(), name='remove_books'),
     path('history', HistoryView.as_view(), name='history'),
+    path('cart', CartView.as_view(), name='cart'),
+    path('add_book_to_cart', AddBookToCartView.as_view(), name='add_book_to_cart'),
+    path('update_cart', UpdateCartView.as_view(), name='update_cart'),
+    path('remove_book_from_cart', RemoveBookFromCartView.as_view(), name='remove_book_from_cart'),
+    path('checkout', CheckoutView.as_view(), name='checkout'),
+    path('orders', OrdersView.as_view(), name='orders'),
+    path('reviews/<slug:article_number>', BookReviewsView.as_view(), name='book_reviews'),
+    path('add_review', AddReviewView.as_view(), name='add_review'),
+    path('edit_review', EditReviewView.as_view(), name='edit_review'),
+    path('remove_review', RemoveReviewView.as_view(), name='remove_review'),
+    path('stats', StatsView.as_view(), name='stats'),
+    # async versions of read-heavy endpoints for ASGI server
+    path('async/books/', async_views.book_list, name='async_book_list'),
+    path('async/books/<int:article_number>/', async_views.book_detail, name='async_book_detail'),
+    path('async/favourites', async_views.favourites, name='async_favourites'),
+    path('async/history', async_views.history, name='async_history'),
 ] + router.urls
\ No newline at end of file
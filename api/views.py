@@ -1,33 +1,111 @@
+import jwt
 from dj_rest_auth.registration.views import RegisterView
+from dj_rest_auth.views import LoginView, LogoutView
 from rest_framework.response import Response
 from rest_framework import status
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Prefetch
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.dateparse import parse_datetime
 from users.models import (
     BookStoreUser,
-    Favourites, History,
+    Favourites, History, ShoppingCart, Order, OrderLine, Review,
 )
 from rest_framework.views import APIView
-from .permissions import IsSelfOrAdmin, IsSellerUser, IsSellerOwner, IsBuyer
+from .permissions import IsSelfOrAdmin, IsSellerUser, IsSellerOwner, IsBuyer, IsSellerOrStaff
 from .serializers import (
     BookStoreUserRegisterSerializer,
     BookStoreUserSerializer,
     BookCreationSerializer,
     BookEditSerializer,
-    BookSerializer, BookAddToFavouritesSerializer, BookFromFavouritesSerializer,
+    BookSerializer, BOOK_FIELDS, BookValuesSerializer, BookAddToFavouritesSerializer, BookFromFavouritesSerializer,
+    BookSearchSerializer, BookAutocompleteSerializer, BooksFavouritesBatchSerializer,
+    HistoryFilterSerializer, BookImportRequestSerializer, BookExportRequestSerializer,
+    TokenRefreshSerializer, CartLineSerializer, CartLineUpdateSerializer, ShoppingCartSerializer,
+    OrderSerializer, ReviewSerializer, ReviewWriteSerializer, ReviewRemoveSerializer,
 )
 from rest_framework import generics, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import AuthenticationFailed, NotFound, ValidationError
 from rest_framework.permissions import (
+    AllowAny,
     IsAdminUser,
     IsAuthenticated,
 )
 from books.models import Book
-from users.shortcuts import get_user_books_history, get_user_today_history
+from config.db_routers import replica_health
+from books.autocomplete import book_autocomplete
+from books.cache import book_cache
+from books.search import get_book_search
+from .conditional import make_etag, not_modified_response, set_validators
+from .exporters import CONTENT_TYPES, export_books
+from .importers import BookImporter, get_file_format
+from .filters import BookFilterBackend, BookOrderingFilter
+from .pagination import BookCursorPagination, UserBooksCursorPagination
+from users.cart import (
+    BooksNotOnSale, EmptyCart, NotEnoughStock,
+    add_book_to_cart, checkout, remove_book_from_cart, update_cart_line,
+)
+from users.reviews import ReviewExists, add_review, edit_review, remove_review
+from users.authentication import JWTAuthentication, token_user_cache
+from users.history import history_recorder
+from users.tokens import REFRESH, decode_token, get_jwt_setting, issue_tokens, refresh_tokens, revocation_list
 
 
 class BookStoreUserRegisterView(RegisterView):
     serializer_class = BookStoreUserRegisterSerializer
 
 
+class BookStoreUserLoginView(LoginView):
+    """
+        Logs user in. If BOOKSTORE_JWT is enabled, also returns signed 'access' and 'refresh' tokens.
+    """
+    def get_response(self):
+        response = super().get_response()
+        if get_jwt_setting('ENABLED'):
+            response.data.update(issue_tokens(self.user))
+        return response
+
+
+class BookStoreUserLogoutView(LogoutView):
+    """
+        Logs user out. If BOOKSTORE_JWT is enabled, revokes access token of the request
+        and refresh token passed in 'refresh'.
+    """
+    def logout(self, request):
+        if get_jwt_setting('ENABLED'):
+            if isinstance(request.auth, dict):
+                revocation_list.revoke(request.auth)
+            try:
+                revocation_list.revoke(decode_token(request.data.get('refresh', ''), REFRESH))
+            except jwt.InvalidTokenError:
+                pass
+        return super().logout(request)
+
+
+class TokenRefreshView(generics.GenericAPIView):
+    """
+        Exchanges refresh token for a new pair of signed tokens. Refresh token can be used only once.
+    """
+    permission_classes = (AllowAny,)
+    authentication_classes = ()
+    serializer_class = TokenRefreshSerializer
+
+    def post(self, request):
+        if not get_jwt_setting('ENABLED'):
+            raise NotFound
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            return Response(refresh_tokens(serializer.validated_data['refresh']))
+        except jwt.InvalidTokenError:
+            raise AuthenticationFailed('Invalid refresh token.')
+
+    def get_authenticate_header(self, request):
+        return JWTAuthentication.keyword
+
+
 class BookStoreUserCurrentView(generics.RetrieveUpdateAPIView):
     serializer_class = BookStoreUserSerializer
     permission_classes = (IsSelfOrAdmin, IsAuthenticated)
@@ -66,26 +144,244 @@ class BookEditView(generics.RetrieveUpdateAPIView):
         return Book.objects.all()
 
 
+class BookImportView(generics.GenericAPIView):
+    """
+        Imports seller's books from uploaded CSV or JSONL file.
+        Returns number of created, updated and unchanged books, errors of rejected rows and throughput.
+    """
+    permission_classes = (IsAuthenticated, IsSellerUser)
+    serializer_class = BookImportRequestSerializer
+
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        file = serializer.validated_data['file']
+        try:
+            file_format = get_file_format(file.name, serializer.validated_data.get('format'))
+        except ValueError as error:
+            raise ValidationError({'format': [str(error)]})
+        importer = BookImporter(
+            request.user.seller,
+            serializer.validated_data['chunk_size'],
+            serializer.validated_data['mode'],
+        )
+        return Response(importer.import_file(file.file, file_format))
+
+
+class BookExportView(generics.GenericAPIView):
+    """
+        Streams books as CSV, JSONL or XLS file.
+        Seller exports own books, staff exports whole catalogue or books of the seller passed in 'seller'.
+    """
+    permission_classes = (IsAuthenticated, IsSellerOrStaff)
+    serializer_class = BookExportRequestSerializer
+
+    def get(self, request):
+        serializer = self.get_serializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        file_format = serializer.validated_data['file_format']
+        queryset = Book.objects.all()
+        if not request.user.is_staff:
+            queryset = queryset.filter(seller=request.user.seller)
+        elif 'seller' in serializer.validated_data:
+            queryset = queryset.filter(seller_id=serializer.validated_data['seller'])
+        response = StreamingHttpResponse(export_books(queryset, file_format), content_type=CONTENT_TYPES[file_format])
+        response.headers['Content-Disposition'] = f'attachment; filename="books.{file_format}"'
+        return response
+
+
 class BookViewSet(viewsets.ReadOnlyModelViewSet):
     """
         ViewSet for receiving book information by any user.
     """
     serializer_class = BookSerializer
+    pagination_class = BookCursorPagination
+    filter_backends = (BookFilterBackend, BookOrderingFilter)
+    ordering_fields = ('cost', 'rating', 'article_number')
+    ordering = ('article_number',)
     lookup_field = 'article_number'
+    lookup_value_regex = r'\d+'
+    # compact representation of books in catalogue, other fields can be requested by 'fields' parameter
+    list_fields = ('id', 'article_number', 'title', 'author', 'cost', 'rating')
+
+    def get_list_fields(self):
+        """
+            Returns fields requested by comma separated 'fields' query parameter or compact list fields.
+        """
+        fields = self.request.query_params.get('fields')
+        if not fields:
+            return self.list_fields
+        fields = tuple(dict.fromkeys(field.strip() for field in fields.split(',') if field.strip()))
+        unknown_fields = set(fields) - set(BOOK_FIELDS)
+        if unknown_fields:
+            raise ValidationError({'fields': [f'Unknown fields: {", ".join(sorted(unknown_fields))}']})
+        return fields
 
     def get_queryset(self):
-        return Book.objects.filter(is_on_sale=True)
+        queryset = Book.objects.filter(is_on_sale=True)
+        if self.action == 'list':
+            # fetch only represented fields, fields that cursor pagination orders by
+            # and fields that version of the page is built from
+            ordering = BookOrderingFilter().get_ordering(self.request, queryset, self)
+            queryset = queryset.values(*dict.fromkeys(
+                (*self.get_list_fields(), *(field.lstrip('-') for field in ordering), 'article_number', 'updated_at')
+            ))
+        return queryset
+
+    def get_primary_queryset(self):
+        """
+            Returns queryset of data that is cached. It is read from primary database: after the cache is invalidated,
+            data read from lagging replica would be cached and served even to the writer pinned to primary.
+        """
+        return self.get_queryset().using(DEFAULT_DB_ALIAS)
+
+    def get_list_data(self):
+        """
+            Returns (version, last modified, data) of requested catalogue page, from cache if it is there.
+        """
+        url = self.request.build_absolute_uri()
+        with_stock = 'count' in self.get_list_fields()
+        cached = book_cache.get_list(url, with_stock)
+        if cached is None:
+            cached = self.make_list_data(url, self.paginate_queryset(self.filter_queryset(self.get_primary_queryset())))
+            book_cache.set_list(url, cached, with_stock)
+        return cached
+
+    async def aget_list_data(self):
+        """
+            Async version of get_list_data for api.async_views.book_list. Page is fetched with async ORM.
+        """
+        url = self.request.build_absolute_uri()
+        with_stock = 'count' in self.get_list_fields()
+        cached = await book_cache.aget_list(url, with_stock)
+        if cached is None:
+            page = await self.paginator.apaginate_queryset(
+                self.filter_queryset(self.get_primary_queryset()), self.request, view=self,
+            )
+            cached = self.make_list_data(url, page)
+            await book_cache.aset_list(url, cached, with_stock)
+        return cached
+
+    def make_list_data(self, url, page):
+        """
+            Returns (version, last modified, data) of fetched catalogue page.
+            Version doesn't depend on format of response, ETag is built from it and media type.
+        """
+        data = self.get_paginated_response(BookValuesSerializer(self.get_list_fields()).represent(page)).data
+        # version is built from the fetched page only: url with cursor, books of the page and their versions,
+        # and links to neighbour pages, so whole catalogue isn't scanned
+        last_modified = max((book['updated_at'] for book in page), default=None)
+        version = make_etag(
+            url, data['next'], data['previous'],
+            *(f'{book["article_number"]}:{book["updated_at"].timestamp()}' for book in page),
+        )
+        return version, last_modified, data
+
+    def list(self, request, *args, **kwargs):
+        version, last_modified, data = self.get_list_data()
+        # JSON and browsable API representations of the page must have different ETags
+        etag = make_etag(version, request.accepted_media_type)
+        return not_modified_response(request, etag, last_modified) or set_validators(
+            Response(data), etag, last_modified
+        )
+
+    def get_book_version(self, article_number):
+        """
+            Returns cached data of the book (None if it isn't cached), its id and updated_at.
+            Only version of the book is fetched if it isn't cached, body may be not needed.
+        """
+        data = book_cache.get_detail(article_number)
+        if data is not None:
+            return data, data['id'], parse_datetime(data['updated_at'])
+        version = self.get_version_queryset(article_number).first()
+        if version is None:
+            raise Http404
+        return None, *version
+
+    async def aget_book_version(self, article_number):
+        """
+            Async version of get_book_version.
+        """
+        data = await book_cache.aget_detail(article_number)
+        if data is not None:
+            return data, data['id'], parse_datetime(data['updated_at'])
+        version = await self.get_version_queryset(article_number).afirst()
+        if version is None:
+            raise Http404
+        return None, *version
+
+    def get_version_queryset(self, article_number):
+        return self.get_queryset().filter(article_number=article_number).values_list('id', 'updated_at')
+
+    def get_book_data(self, article_number, book_id):
+        """
+            Returns serialized book and its updated_at, and caches the data.
+        """
+        book = get_object_or_404(self.get_primary_queryset(), pk=book_id)
+        data = BookSerializer(book).data
+        book_cache.set_detail(article_number, data)
+        return data, book.updated_at
+
+    async def aget_book_data(self, article_number, book_id):
+        """
+            Async version of get_book_data.
+        """
+        book = await self.get_primary_queryset().filter(pk=book_id).afirst()
+        if book is None:
+            raise Http404
+        data = BookSerializer(book).data
+        await book_cache.aset_detail(article_number, data)
+        return data, book.updated_at
 
     def retrieve(self, request, article_number=None):
-        queryset = self.get_queryset()
-        book = get_object_or_404(queryset, article_number=article_number)
-        serializer = BookSerializer(book)
+        article_number = int(article_number)
+        data, book_id, last_modified = self.get_book_version(article_number)
         # if user is buyer add the book to the history
         if isinstance(request.user, BookStoreUser) and request.user.is_buyer:
-            # only add book if book is not already in today's history
-            if book not in get_user_today_history(request.user):
-                History.objects.create(user=request.user, book=book)
-        return Response(serializer.data)
+            history_recorder.record(request.user, book_id)
+        etag = self.get_book_etag(article_number, last_modified, request.accepted_media_type)
+        not_modified = not_modified_response(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+        if data is None:
+            data, last_modified = self.get_book_data(article_number, book_id)
+            etag = self.get_book_etag(article_number, last_modified, request.accepted_media_type)
+        return set_validators(Response(data), etag, last_modified)
+
+    @staticmethod
+    def get_book_etag(article_number, updated_at, media_type):
+        """
+            Returns ETag of the book version in format of negotiated media type.
+        """
+        return make_etag(article_number, updated_at.timestamp(), media_type)
+
+    @action(detail=False, url_path='search')
+    def search(self, request):
+        """
+            Returns books ranked by relevance to 'q' query parameter.
+            Searches in title, author and description.
+        """
+        serializer = BookSearchSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        books = get_book_search().search(
+            serializer.validated_data['q'],
+            self.get_queryset(),
+            serializer.validated_data['limit'],
+        )
+        return Response(BookSerializer(books, many=True).data)
+
+    @action(detail=False, url_path='autocomplete')
+    def autocomplete(self, request):
+        """
+            Returns title and author suggestions for 'q' prefix.
+            Served from in-memory index without database queries.
+        """
+        serializer = BookAutocompleteSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        return Response(book_autocomplete.suggest(
+            serializer.validated_data['q'],
+            serializer.validated_data['limit'],
+        ))
 
 
 class AddBookToFavouritesView(generics.GenericAPIView):
@@ -93,43 +389,62 @@ class AddBookToFavouritesView(generics.GenericAPIView):
     serializer_class = BookAddToFavouritesSerializer
 
     def post(self, request):
-        favourite_books = [favourite.book for favourite in Favourites.objects.all()]
         book_to_add = get_object_or_404(Book, article_number=request.data['article_number'])
-        if book_to_add not in favourite_books:
-            Favourites.objects.create(
-                user=request.user,
-                book=book_to_add
-            )
+        # written unconditionally, cached favourites of another worker may be stale
+        _, created = Favourites.objects.get_or_create(
+            user=request.user,
+            book=book_to_add
+        )
+        if created:
             return Response({"msg": "Book has been added"}, status=status.HTTP_200_OK)
         return Response({"msg": "Book has already been added"})
 
 
-class FavouritesView(generics.RetrieveAPIView):
+class FavouritesView(generics.ListAPIView):
+    """
+        Returns buyer's favourite books, recently added first.
+        Books are fetched in the same query as favourites.
+    """
     permission_classes = [IsBuyer, ]
+    serializer_class = BookSerializer
+    pagination_class = UserBooksCursorPagination
 
     def get_queryset(self):
-        pass
+        return Favourites.objects.filter(user=self.request.user).select_related('book')
 
-    def retrieve(self, request, *args, **kwargs):
-        favourite_books = [favourite.book for favourite in Favourites.objects.filter(user=request.user)]
-        if favourite_books:
-            serializer = BookSerializer(favourite_books, many=True)
-            return Response(serializer.data)
-        return Response({"msg": "You have no favourites books yet"})
+    def list(self, request, *args, **kwargs):
+        favourites = self.paginate_queryset(self.get_queryset())
+        if not favourites and not request.query_params.get(self.paginator.cursor_query_param):
+            return Response({"msg": "You have no favourites books yet"})
+        serializer = self.get_serializer([favourite.book for favourite in favourites], many=True)
+        return self.get_paginated_response(serializer.data)
 
 
-class HistoryView(generics.RetrieveAPIView):
+class HistoryView(generics.ListAPIView):
+    """
+        Returns books from buyer's history, recently viewed first.
+        History can be filtered by date_from and date_to query parameters.
+    """
     permission_classes = [IsBuyer, ]
+    serializer_class = BookSerializer
+    pagination_class = UserBooksCursorPagination
 
     def get_queryset(self):
-        pass
-
-    def retrieve(self, request):
-        history_books = request.user.buyer_history
-        if history_books:
-            serializer = BookSerializer(history_books, many=True)
-            return Response(serializer.data)
-        return Response({"msg": "You have no books in history yet"})
+        serializer = HistoryFilterSerializer(data=self.request.query_params)
+        serializer.is_valid(raise_exception=True)
+        queryset = History.objects.filter(user=self.request.user).select_related('book')
+        if 'date_from' in serializer.validated_data:
+            queryset = queryset.filter(date_of_view__gte=serializer.validated_data['date_from'])
+        if 'date_to' in serializer.validated_data:
+            queryset = queryset.filter(date_of_view__lte=serializer.validated_data['date_to'])
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        history = self.paginate_queryset(self.get_queryset())
+        if not history and not request.query_params.get(self.paginator.cursor_query_param):
+            return Response({"msg": "You have no books in history yet"})
+        serializer = self.get_serializer([history_obj.book for history_obj in history], many=True)
+        return self.get_paginated_response(serializer.data)
 
 
 class RemoveBookFromFavouritesView(generics.GenericAPIView):
@@ -139,8 +454,285 @@ class RemoveBookFromFavouritesView(generics.GenericAPIView):
 
     def post(self, request):
         book = get_object_or_404(Book, article_number=request.data['article_number'])
-        favourite_books = request.user.buyer_favourites
-        if book in favourite_books:
-            Favourites.objects.filter(book=book).delete()
+        deleted, _ = Favourites.objects.filter(user=request.user, book=book).delete()
+        if deleted:
             return Response({"msg": "Book has been deleted from your favourites."}, status=status.HTTP_200_OK)
         return Response({"msg": "You does not have that book in your favourites to delete it"})
+
+
+class FavouritesBatchMixin:
+    """
+        Common logic of adding and removing several books from favourites in one request.
+    """
+    permission_classes = [IsBuyer, ]
+    serializer_class = BooksFavouritesBatchSerializer
+
+    def get_article_numbers(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return list(dict.fromkeys(serializer.validated_data['article_numbers']))
+
+    def get_books_and_favourites(self, article_numbers):
+        """
+            Returns dict article_number -> book id for existing books
+            and set of ids of these books that are in user's favourites.
+        """
+        books = dict(
+            Book.objects.filter(article_number__in=article_numbers).values_list('article_number', 'id')
+        )
+        favourite_ids = set(
+            Favourites.objects.filter(
+                user=self.request.user,
+                book_id__in=books.values(),
+            ).values_list('book_id', flat=True)
+        )
+        return books, favourite_ids
+
+    @staticmethod
+    def make_response(statuses):
+        return Response(
+            {"results": [
+                {"article_number": article_number, "status": item_status}
+                for article_number, item_status in statuses.items()
+            ]},
+            status=status.HTTP_200_OK
+        )
+
+
+class AddBooksToFavouritesView(FavouritesBatchMixin, generics.GenericAPIView):
+    """
+        Adds several books to favourites.
+        Status of every article number is one of: added, already_added, not_found.
+    """
+
+    def post(self, request):
+        article_numbers = self.get_article_numbers(request)
+        statuses = {}
+        with transaction.atomic():
+            books, favourite_ids = self.get_books_and_favourites(article_numbers)
+            favourites_to_add = []
+            for article_number in article_numbers:
+                book_id = books.get(article_number)
+                if book_id is None:
+                    statuses[article_number] = 'not_found'
+                elif book_id in favourite_ids:
+                    statuses[article_number] = 'already_added'
+                else:
+                    statuses[article_number] = 'added'
+                    favourites_to_add.append(Favourites(user=request.user, book_id=book_id))
+            Favourites.objects.bulk_create(favourites_to_add, ignore_conflicts=True)
+        return self.make_response(statuses)
+
+
+class RemoveBooksFromFavouritesView(FavouritesBatchMixin, generics.GenericAPIView):
+    """
+        Removes several books from favourites.
+        Status of every article number is one of: removed, not_in_favourites, not_found.
+    """
+
+    def post(self, request):
+        article_numbers = self.get_article_numbers(request)
+        statuses = {}
+        with transaction.atomic():
+            books, favourite_ids = self.get_books_and_favourites(article_numbers)
+            for article_number in article_numbers:
+                book_id = books.get(article_number)
+                if book_id is None:
+                    statuses[article_number] = 'not_found'
+                elif book_id in favourite_ids:
+                    statuses[article_number] = 'removed'
+                else:
+                    statuses[article_number] = 'not_in_favourites'
+            Favourites.objects.filter(user=request.user, book_id__in=favourite_ids).delete()
+        return self.make_response(statuses)
+
+
+class CartView(generics.ListAPIView):
+    """
+        Returns books in buyer's cart.
+    """
+    permission_classes = [IsBuyer, ]
+    serializer_class = ShoppingCartSerializer
+
+    def get_queryset(self):
+        return ShoppingCart.objects.filter(user=self.request.user).select_related('book').order_by('id')
+
+
+class CartLineMixin:
+    """
+        Common logic of changing cart lines. Books in cart are reserved in stock.
+    """
+    permission_classes = [IsBuyer, ]
+
+    def get_line_data(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        book = get_object_or_404(Book, article_number=serializer.validated_data['article_number'])
+        return book, serializer.validated_data
+
+    @staticmethod
+    def not_enough_stock_response():
+        return Response({"msg": "Not enough books in stock"}, status=status.HTTP_409_CONFLICT)
+
+
+class AddBookToCartView(CartLineMixin, generics.GenericAPIView):
+    serializer_class = CartLineSerializer
+
+    def post(self, request):
+        book, data = self.get_line_data(request)
+        try:
+            line = add_book_to_cart(request.user, book, data['type'], data['book_count'])
+        except NotEnoughStock:
+            return self.not_enough_stock_response()
+        return Response(ShoppingCartSerializer(line).data, status=status.HTTP_200_OK)
+
+
+class UpdateCartView(CartLineMixin, generics.GenericAPIView):
+    serializer_class = CartLineUpdateSerializer
+
+    def post(self, request):
+        book, data = self.get_line_data(request)
+        try:
+            line = update_cart_line(request.user, book, data['type'], data['book_count'])
+        except ShoppingCart.DoesNotExist:
+            raise Http404
+        except NotEnoughStock:
+            return self.not_enough_stock_response()
+        if not line.book_count:
+            return Response({"msg": "Book has been deleted from your cart."}, status=status.HTTP_200_OK)
+        return Response(ShoppingCartSerializer(line).data, status=status.HTTP_200_OK)
+
+
+class RemoveBookFromCartView(CartLineMixin, generics.GenericAPIView):
+    serializer_class = CartLineSerializer
+
+    def post(self, request):
+        book, data = self.get_line_data(request)
+        try:
+            remove_book_from_cart(request.user, book, data['type'])
+        except ShoppingCart.DoesNotExist:
+            return Response({"msg": "You does not have that book in your cart to delete it"})
+        return Response({"msg": "Book has been deleted from your cart."}, status=status.HTTP_200_OK)
+
+
+class CheckoutView(APIView):
+    """
+        Makes order from buyer's cart.
+        Retried request with the same 'Idempotency-Key' header returns the order made by the first one.
+    """
+    permission_classes = [IsBuyer, ]
+
+    def post(self, request):
+        idempotency_key = request.headers.get('Idempotency-Key')
+        if idempotency_key is not None and not 0 < len(idempotency_key) <= 100:
+            raise ValidationError({'Idempotency-Key': ['Key must be from 1 to 100 characters long.']})
+        try:
+            order, created = checkout(request.user, idempotency_key)
+        except EmptyCart:
+            return Response({"msg": "Your cart is empty"}, status=status.HTTP_400_BAD_REQUEST)
+        except BooksNotOnSale as error:
+            return Response(
+                {"msg": "Some books are not on sale", "article_numbers": error.article_numbers},
+                status=status.HTTP_409_CONFLICT
+            )
+        order = Order.objects.prefetch_related(
+            Prefetch('lines', OrderLine.objects.select_related('book').order_by('id'))
+        ).get(pk=order.pk)
+        return Response(
+            OrderSerializer(order).data,
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
+        )
+
+
+class OrdersView(generics.ListAPIView):
+    """
+        Returns buyer's orders, recently made first.
+    """
+    permission_classes = [IsBuyer, ]
+    serializer_class = OrderSerializer
+    pagination_class = UserBooksCursorPagination
+
+    def get_queryset(self):
+        return Order.objects.filter(user=self.request.user).prefetch_related(
+            Prefetch('lines', OrderLine.objects.select_related('book').order_by('id'))
+        )
+
+
+class BookReviewsView(generics.ListAPIView):
+    """
+        Returns reviews of a book, recently written first. Average rating and count of ratings are in the book.
+    """
+    permission_classes = (AllowAny,)
+    serializer_class = ReviewSerializer
+    pagination_class = UserBooksCursorPagination
+
+    def get_queryset(self):
+        book = get_object_or_404(Book, article_number=self.kwargs['article_number'])
+        return Review.objects.filter(book=book).select_related('user', 'book')
+
+
+class ReviewMixin:
+    """
+        Common logic of writing buyer's reviews.
+    """
+    permission_classes = [IsBuyer, ]
+
+    def get_review_data(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        book = get_object_or_404(Book, article_number=serializer.validated_data['article_number'])
+        return book, serializer.validated_data
+
+
+class AddReviewView(ReviewMixin, generics.GenericAPIView):
+    serializer_class = ReviewWriteSerializer
+
+    def post(self, request):
+        book, data = self.get_review_data(request)
+        try:
+            review = add_review(request.user, book, data['rating'], data['text'])
+        except ReviewExists:
+            return Response({"msg": "You have already reviewed this book"}, status=status.HTTP_409_CONFLICT)
+        return Response(ReviewSerializer(review).data, status=status.HTTP_201_CREATED)
+
+
+class EditReviewView(ReviewMixin, generics.GenericAPIView):
+    serializer_class = ReviewWriteSerializer
+
+    def post(self, request):
+        book, data = self.get_review_data(request)
+        try:
+            review = edit_review(request.user, book, data['rating'], data['text'])
+        except Review.DoesNotExist:
+            raise Http404
+        return Response(ReviewSerializer(review).data, status=status.HTTP_200_OK)
+
+
+class RemoveReviewView(ReviewMixin, generics.GenericAPIView):
+    serializer_class = ReviewRemoveSerializer
+
+    def post(self, request):
+        book, _ = self.get_review_data(request)
+        try:
+            remove_review(request.user, book)
+        except Review.DoesNotExist:
+            raise Http404
+        return Response({"msg": "Review has been deleted."}, status=status.HTTP_200_OK)
+
+
+class StatsView(APIView):
+    """
+        Shows state of in-process indexes and caches of current worker. Only for staff.
+    """
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        return Response({
+            'search': get_book_search().stats(),
+            'autocomplete': book_autocomplete.stats(),
+            'cache': book_cache.stats(),
+            'history': history_recorder.stats(),
+            'token_auth': token_user_cache.stats(),
+            'jwt_revocation': revocation_list.stats(),
+            'replicas': replica_health.stats(),
+        })
@@ -1,6 +1,16 @@
+import atexit
+
 from django.apps import AppConfig
+from django.core.signals import request_finished
 
 
 class BooksConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'books'
+
+    def ready(self):
+        from books import signals  # noqa: F401
+        from books.stock import sharded_count_sync
+
+        request_finished.connect(sharded_count_sync.flush_if_due, dispatch_uid='sync_sharded_stock')
+        atexit.register(sharded_count_sync.flush)
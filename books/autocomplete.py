@@ -0,0 +1,179 @@
+"""
+    Typeahead suggestions for book titles and authors.
+
+    Suggestions are served from in-process sorted array of keys searched with bisect.
+    Every word of title and author starts a key, so 'ring' suggests 'The Lord of the Rings'.
+    Index is built lazily from books on sale and kept up to date by books.signals.
+"""
+import bisect
+import sys
+import threading
+
+TITLE = 'title'
+AUTHOR = 'author'
+
+
+def normalize(text):
+    return ' '.join(text.lower().split())
+
+
+def word_suffixes(text):
+    """
+        Yields text suffixes starting at every word: 'a b c' -> 'a b c', 'b c', 'c'.
+    """
+    words = text.split(' ')
+    for position in range(len(words)):
+        yield ' '.join(words[position:])
+
+
+class BookAutocompleteIndex:
+    """
+        Entries are tuples (key, kind, book id) kept in one sorted list.
+        Lookup of prefix is a binary search followed by scan of matching range.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = []
+        self._books = {}  # book id -> (article number, title, author)
+        self._built = False
+
+    def _book_entries(self, book_id, title, author):
+        entries = set()
+        for kind, text in ((TITLE, title), (AUTHOR, author)):
+            for key in word_suffixes(normalize(text)):
+                if key:
+                    entries.add((key, kind, book_id))
+        return entries
+
+    def _build(self):
+        from books.models import Book
+
+        entries = []
+        self._books = {}
+        books = Book.objects.filter(is_on_sale=True).values_list('id', 'article_number', 'title', 'author')
+        for book_id, article_number, title, author in books.iterator(chunk_size=2000):
+            self._books[book_id] = (article_number, title, author)
+            entries.extend(self._book_entries(book_id, title, author))
+        entries.sort()
+        self._entries = entries
+        self._built = True
+
+    def _ensure_built(self):
+        if not self._built:
+            with self._lock:
+                if not self._built:
+                    self._build()
+
+    def _remove(self, book_id):
+        book = self._books.pop(book_id, None)
+        if book is None:
+            return
+        _, title, author = book
+        for entry in self._book_entries(book_id, title, author):
+            position = bisect.bisect_left(self._entries, entry)
+            if position < len(self._entries) and self._entries[position] == entry:
+                del self._entries[position]
+
+    def index_book(self, book):
+        """
+            Adds or re-indexes book. If index is not built yet it will include the book when it is built.
+        """
+        if not self._built:
+            return
+        with self._lock:
+            self._remove(book.pk)
+            if book.is_on_sale:
+                self._books[book.pk] = (book.article_number, book.title, book.author)
+                for entry in self._book_entries(book.pk, book.title, book.author):
+                    bisect.insort(self._entries, entry)
+
+    def index_books(self, books):
+        """
+            Adds or re-indexes several books (bulk import). Entries of all books are merged into index
+            with one pass and one sort, instead of an insort per entry.
+        """
+        if not self._built:
+            return
+        new_entries = []
+        new_books = {}
+        for book in books:
+            if book.is_on_sale:
+                new_books[book.pk] = (book.article_number, book.title, book.author)
+                new_entries.extend(self._book_entries(book.pk, book.title, book.author))
+        with self._lock:
+            stale_entries = set()
+            for book in books:
+                indexed = self._books.pop(book.pk, None)
+                if indexed is not None:
+                    stale_entries.update(self._book_entries(book.pk, indexed[1], indexed[2]))
+            entries = [entry for entry in self._entries if entry not in stale_entries] if stale_entries \
+                else self._entries
+            # index is one sorted run and new entries are another, so sort merges them in linear time
+            entries = entries + new_entries
+            entries.sort()
+            self._entries = entries
+            self._books.update(new_books)
+
+    def remove_book(self, book_id):
+        if not self._built:
+            return
+        with self._lock:
+            self._remove(book_id)
+
+    def clear(self):
+        """
+            Drops index. It will be rebuilt from database on next lookup.
+        """
+        with self._lock:
+            self._entries = []
+            self._books = {}
+            self._built = False
+
+    def suggest(self, prefix, limit=10):
+        """
+            Returns up to limit suggestions which have a word starting with prefix.
+            Title suggestions contain article number of the book.
+            Author suggestions are unique by author name.
+        """
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        self._ensure_built()
+        suggestions = []
+        seen = set()
+        with self._lock:
+            position = bisect.bisect_left(self._entries, (prefix,))
+            while position < len(self._entries) and len(suggestions) < limit:
+                key, kind, book_id = self._entries[position]
+                if not key.startswith(prefix):
+                    break
+                position += 1
+                article_number, title, author = self._books[book_id]
+                if kind == TITLE and (TITLE, book_id) not in seen:
+                    seen.add((TITLE, book_id))
+                    suggestions.append({'type': TITLE, 'value': title, 'article_number': article_number})
+                elif kind == AUTHOR and (AUTHOR, author) not in seen:
+                    seen.add((AUTHOR, author))
+                    suggestions.append({'type': AUTHOR, 'value': author})
+        return suggestions
+
+    def stats(self):
+        """
+            Returns size of index. Memory is approximate: list, entry tuples, keys and book tuples.
+        """
+        with self._lock:
+            memory = sys.getsizeof(self._entries) + sys.getsizeof(self._books)
+            for entry in self._entries:
+                memory += sys.getsizeof(entry) + sys.getsizeof(entry[0])
+            for book in self._books.values():
+                memory += sys.getsizeof(book) + sum(sys.getsizeof(value) for value in book)
+            return {
+                'built': self._built,
+                'books': len(self._books),
+                'entries': len(self._entries),
+                'memory_bytes': memory,
+            }
+
+
+book_autocomplete = BookAutocompleteIndex()
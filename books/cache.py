@@ -0,0 +1,155 @@
+"""
+    Cache of serialized book data for book detail and catalogue pages.
+
+    Detail entries are keyed by article number and deleted when the book is saved or deleted,
+    or when its stock is changed.
+    Catalogue pages are keyed by request url and a catalogue generation number.
+    Any book write increments generation, so all cached pages become unreachable at once
+    and expire by timeout. Pages that show stock (count is in requested fields) are also keyed
+    by stock generation, which is incremented when stock of any book is changed.
+    Reads and writes of entries have async versions for async views (api.async_views).
+"""
+import hashlib
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+class BookCache:
+    detail_key = 'books:detail:{article_number}'
+    list_key = 'books:list:{generation}:{url_hash}'
+    stock_list_key = 'books:list:{generation}:{stock_generation}:{url_hash}'
+    generation_key = 'books:list:generation'
+    stock_generation_key = 'books:list:stock_generation'
+
+    def __init__(self, alias='default'):
+        self.alias = alias
+        self._lock = threading.Lock()
+        self._counters = Counter()
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    @property
+    def timeout(self):
+        return getattr(settings, 'BOOKS_CACHE_TIMEOUT', 300)
+
+    def _count(self, kind, value):
+        with self._lock:
+            self._counters[f'{kind}_{"hits" if value is not None else "misses"}'] += 1
+        return value
+
+    def _generation(self, key):
+        generation = self.cache.get(key)
+        if generation is None:
+            self.cache.add(key, 1, timeout=None)
+            generation = self.cache.get(key, 1)
+        return generation
+
+    async def _ageneration(self, key):
+        generation = await self.cache.aget(key)
+        if generation is None:
+            await self.cache.aadd(key, 1, timeout=None)
+            generation = await self.cache.aget(key, 1)
+        return generation
+
+    def _increment_generation(self, key):
+        try:
+            self.cache.incr(key)
+        except ValueError:
+            self.cache.add(key, 1, timeout=None)
+
+    def _list_key(self, url, with_stock):
+        url_hash = hashlib.md5(url.encode()).hexdigest()
+        generation = self._generation(self.generation_key)
+        if with_stock:
+            stock_generation = self._generation(self.stock_generation_key)
+            return self.stock_list_key.format(
+                generation=generation, stock_generation=stock_generation, url_hash=url_hash,
+            )
+        return self.list_key.format(generation=generation, url_hash=url_hash)
+
+    async def _alist_key(self, url, with_stock):
+        url_hash = hashlib.md5(url.encode()).hexdigest()
+        generation = await self._ageneration(self.generation_key)
+        if with_stock:
+            stock_generation = await self._ageneration(self.stock_generation_key)
+            return self.stock_list_key.format(
+                generation=generation, stock_generation=stock_generation, url_hash=url_hash,
+            )
+        return self.list_key.format(generation=generation, url_hash=url_hash)
+
+    def get_detail(self, article_number):
+        return self._count('detail', self.cache.get(self.detail_key.format(article_number=article_number)))
+
+    def set_detail(self, article_number, data):
+        self.cache.set(self.detail_key.format(article_number=article_number), data, self.timeout)
+
+    def get_list(self, url, with_stock=False):
+        return self._count('list', self.cache.get(self._list_key(url, with_stock)))
+
+    def set_list(self, url, data, with_stock=False):
+        self.cache.set(self._list_key(url, with_stock), data, self.timeout)
+
+    async def aget_detail(self, article_number):
+        return self._count('detail', await self.cache.aget(self.detail_key.format(article_number=article_number)))
+
+    async def aset_detail(self, article_number, data):
+        await self.cache.aset(self.detail_key.format(article_number=article_number), data, self.timeout)
+
+    async def aget_list(self, url, with_stock=False):
+        return self._count('list', await self.cache.aget(await self._alist_key(url, with_stock)))
+
+    async def aset_list(self, url, data, with_stock=False):
+        await self.cache.aset(await self._alist_key(url, with_stock), data, self.timeout)
+
+    def invalidate_book(self, article_number):
+        """
+            Drops detail entry of the book and all catalogue pages.
+        """
+        self.invalidate_books([article_number])
+
+    def invalidate_book_stock(self, article_number):
+        """
+            Drops detail entry of the book and catalogue pages that show stock. Used when only stock is changed.
+        """
+        self.invalidate_books_stock([article_number])
+
+    def invalidate_books_stock(self, article_numbers):
+        """
+            Drops detail entries of several books and catalogue pages that show stock.
+        """
+        self.cache.delete_many([
+            self.detail_key.format(article_number=article_number) for article_number in article_numbers
+        ])
+        self._increment_generation(self.stock_generation_key)
+        with self._lock:
+            self._counters['invalidations'] += 1
+
+    def invalidate_books(self, article_numbers):
+        """
+            Drops detail entries of several books and all catalogue pages.
+        """
+        self.cache.delete_many([
+            self.detail_key.format(article_number=article_number) for article_number in article_numbers
+        ])
+        self._increment_generation(self.generation_key)
+        with self._lock:
+            self._counters['invalidations'] += 1
+
+    def reset_stats(self):
+        with self._lock:
+            self._counters.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                key: self._counters[key]
+                for key in ('detail_hits', 'detail_misses', 'list_hits', 'list_misses', 'invalidations')
+            }
+
+
+book_cache = BookCache()
@@ -0,0 +1,73 @@
+import datetime
+import random
+import timeit
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from api.serializers import BOOK_FIELDS, BookSerializer, BookValuesSerializer
+from books.models import Book
+
+
+class Command(BaseCommand):
+    help = 'Compares rendering of books to JSON by BookSerializer and BookValuesSerializer.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000], help='Numbers of books.')
+        parser.add_argument('--repeat', type=int, default=3, help='Best of how many runs is reported.')
+
+    def handle(self, *args, **options):
+        renderer = JSONRenderer()
+        values_serializer = BookValuesSerializer()
+        self.stdout.write(f'{"books":>8} {"BookSerializer":>16} {"values":>10} {"speedup":>8}')
+        for size in options['sizes']:
+            books = self.generate_books(size)
+            # the same rows as .values(*BOOK_FIELDS) returns them
+            rows = [{field: getattr(book, Book._meta.get_field(field).attname) for field in BOOK_FIELDS}
+                    for book in books]
+            model_json = renderer.render(BookSerializer(books, many=True).data)
+            values_json = renderer.render(values_serializer.represent(rows))
+            if model_json != values_json:
+                self.stderr.write(f'Representations of {size} books differ')
+                return
+
+            model_seconds = min(timeit.repeat(
+                lambda: renderer.render(BookSerializer(books, many=True).data),
+                number=1, repeat=options['repeat'],
+            ))
+            values_seconds = min(timeit.repeat(
+                lambda: renderer.render(values_serializer.represent(rows)),
+                number=1, repeat=options['repeat'],
+            ))
+            self.stdout.write(
+                f'{size:>8} {model_seconds * 1000:>14.1f}ms {values_seconds * 1000:>8.1f}ms '
+                f'{model_seconds / values_seconds:>7.1f}x'
+            )
+
+    @staticmethod
+    def generate_books(size):
+        now = timezone.now()
+        return [
+            Book(
+                id=number,
+                seller_id=random.randint(1, 100),
+                title=f'Title {number}',
+                rating=random.randint(0, 5),
+                author=f'Author {number % 500}',
+                translator=None if number % 3 else f'Translator {number}',
+                publisher='Publisher',
+                genre='Genre',
+                cost=Decimal(random.randint(100, 100000)) / 100,
+                article_number=number,
+                isbn=9780000000000 + number,
+                pages=random.randint(10, 1000),
+                language='English',
+                description='Description of book ' * 10,
+                is_on_sale=True,
+                count=random.randint(0, 100),
+                updated_at=now - datetime.timedelta(seconds=number, microseconds=number),
+            )
+            for number in range(1, size + 1)
+        ]
@@ -0,0 +1,55 @@
+import statistics
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        'Measures throughput and latency of running server under concurrent requests. '
+        'Run WSGI server (config.wsgi) and ASGI server (config.asgi) and pass urls of both, e.g. '
+        'http://127.0.0.1:8000/bs_v1/books/ http://127.0.0.1:8001/bs_v1/async/books/'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('urls', nargs='+', help='Urls to request.')
+        parser.add_argument('--concurrency', type=int, default=50, help='Number of concurrent clients.')
+        parser.add_argument('--requests', type=int, default=2000, help='Number of requests per url.')
+        parser.add_argument('--header', action='append', default=[], help='Request header, e.g. "Authorization: Token <key>".')
+
+    def handle(self, *args, **options):
+        headers = dict(header.split(':', 1) for header in options['header'])
+        headers = {name.strip(): value.strip() for name, value in headers.items()}
+        self.stdout.write(f'{"url":<50} {"req/s":>8} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"errors":>7}')
+        for url in options['urls']:
+            self.benchmark(url, headers, options)
+
+    def benchmark(self, url, headers, options):
+        def send(_):
+            started_at = time.perf_counter()
+            try:
+                with urllib.request.urlopen(urllib.request.Request(url, headers=headers)) as response:
+                    response.read()
+                ok = True
+            except (urllib.error.URLError, OSError):
+                ok = False
+            return ok, time.perf_counter() - started_at
+
+        with ThreadPoolExecutor(options['concurrency']) as executor:
+            started_at = time.perf_counter()
+            results = list(executor.map(send, range(options['requests'])))
+            seconds = time.perf_counter() - started_at
+
+        latencies = sorted(latency * 1000 for ok, latency in results if ok)
+        errors = len(results) - len(latencies)
+        if not latencies:
+            self.stdout.write(f'{url:<50} {"-":>8} {"-":>8} {"-":>8} {"-":>8} {errors:>7}')
+            return
+        percentiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+        self.stdout.write(
+            f'{url:<50} {len(latencies) / seconds:>8.0f} {percentiles[49]:>8.1f} '
+            f'{percentiles[94]:>8.1f} {percentiles[98]:>8.1f} {errors:>7}'
+        )
@@ -0,0 +1,80 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection, transaction
+
+from books.models import Book
+from books.stock import reserve_stock, shard_stock, sharded_count_sync
+from users.models import BookStoreUser
+
+
+class Command(BaseCommand):
+    help = (
+        'Compares reservations of one hot book with stock in Book.count and in sharded counters. '
+        'Every reservation is made in transaction that lasts --hold-ms, as adding to cart does. '
+        'Test seller and book are deleted afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=16, help='Number of parallel buyers.')
+        parser.add_argument('--reservations', type=int, default=2000, help='Number of reservations per run.')
+        parser.add_argument('--shards', type=int, nargs='+', default=[0, 4, 16], help='Numbers of shards to compare.')
+        parser.add_argument('--hold-ms', type=float, default=2, help='Duration of reserving transaction.')
+
+    def handle(self, *args, **options):
+        prefix = uuid.uuid4().hex[:8]
+        seller = BookStoreUser.objects.create_user(
+            email=f'{prefix}-seller@bookstore.com', username=f'{prefix}-seller', password=prefix, is_seller=True,
+        )
+        try:
+            self.stdout.write(f'{"shards":>7} {"reservations/s":>15} {"retried":>8} {"left":>6}')
+            for shards in options['shards']:
+                book = Book.objects.create(
+                    seller=seller.seller, title='Contention', author='Contention', publisher='Contention',
+                    genre='Contention', cost=1, article_number=int(time.time() * 1000), isbn=9780000000000,
+                    pages=1, language='English', description='', is_on_sale=True, count=options['reservations'],
+                )
+                shard_stock(book, shards)
+                book.refresh_from_db()
+                self.run(book, options)
+        finally:
+            seller.delete()
+
+    def run(self, book, options):
+        lock = threading.Lock()
+        counters = {'reserved': 0, 'retried': 0}
+        per_worker = options['reservations'] // options['workers']
+
+        def buy(_):
+            try:
+                done = 0
+                while done < per_worker:
+                    try:
+                        with transaction.atomic():
+                            reserved = reserve_stock(book, 1)
+                            time.sleep(options['hold_ms'] / 1000)
+                    except OperationalError:
+                        # database is locked by other writer (SQLite)
+                        with lock:
+                            counters['retried'] += 1
+                        continue
+                    if not reserved:
+                        return
+                    done += 1
+                    with lock:
+                        counters['reserved'] += 1
+            finally:
+                connection.close()
+
+        started_at = time.perf_counter()
+        with ThreadPoolExecutor(options['workers']) as executor:
+            list(executor.map(buy, range(options['workers'])))
+        seconds = time.perf_counter() - started_at
+        sharded_count_sync.flush()
+        book.refresh_from_db()
+        self.stdout.write(
+            f'{book.stock_shards:>7} {counters["reserved"] / seconds:>15.0f} {counters["retried"]:>8} {book.count:>6}'
+        )
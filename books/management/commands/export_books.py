@@ -0,0 +1,36 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.exporters import FORMATS, export_books
+from books.models import Book
+from users.models import Seller
+
+
+class Command(BaseCommand):
+    help = 'Exports books of the whole catalogue or of the seller to CSV, JSONL or XLS file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=FORMATS, default='csv', help='File format.')
+        parser.add_argument('--seller', help='Email of seller user. All books are exported by default.')
+        parser.add_argument('--output', help='Path to output file. Standard output by default.')
+
+    def handle(self, *args, **options):
+        queryset = Book.objects.all()
+        if options['seller']:
+            try:
+                queryset = queryset.filter(seller=Seller.objects.get(user__email=options['seller']))
+            except Seller.DoesNotExist:
+                raise CommandError(f'Seller {options["seller"]} does not exist')
+
+        binary = options['format'] == 'xls'
+        if options['output']:
+            output = open(options['output'], 'wb') if binary else open(options['output'], 'w', newline='')
+        else:
+            output = sys.stdout.buffer if binary else sys.stdout
+        try:
+            for chunk in export_books(queryset, options['format']):
+                output.write(chunk)
+        finally:
+            if options['output']:
+                output.close()
@@ -0,0 +1,42 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.importers import BookImporter, FORMATS, MODES, get_file_format
+from users.models import Seller
+
+
+class Command(BaseCommand):
+    help = 'Imports books of the seller from CSV or JSONL file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Path to CSV or JSONL file.')
+        parser.add_argument('--seller', required=True, help='Email of seller user.')
+        parser.add_argument('--format', choices=FORMATS, help='File format. Guessed by extension by default.')
+        parser.add_argument(
+            '--mode',
+            choices=MODES,
+            default='create',
+            help='create rejects existing books, upsert updates changed books of the seller.',
+        )
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Number of rows inserted at once.')
+
+    def handle(self, *args, **options):
+        try:
+            seller = Seller.objects.get(user__email=options['seller'])
+        except Seller.DoesNotExist:
+            raise CommandError(f'Seller {options["seller"]} does not exist')
+        try:
+            file_format = get_file_format(options['path'], options['format'])
+        except ValueError as error:
+            raise CommandError(str(error))
+
+        with open(options['path'], 'rb') as file:
+            report = BookImporter(seller, options['chunk_size'], options['mode']).import_file(file, file_format)
+
+        self.stdout.write(json.dumps(report, indent=2))
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {report["created"]}, updated {report["updated"]}, '
+            f'unchanged {report["unchanged"]} of {report["rows"]} books '
+            f'in {report["seconds"]}s ({report["rows_per_second"]} rows/s)'
+        ))
@@ -0,0 +1,83 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+
+from books.models import Book
+from users.cart import NotEnoughStock, add_book_to_cart
+from users.models import BookStoreUser, ShoppingCart
+
+
+class Command(BaseCommand):
+    help = (
+        'Buyers add one book to their carts in parallel until stock runs out. '
+        'Checks that reserved books never exceed stock. Test users and book are deleted afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=20, help='Number of parallel buyers.')
+        parser.add_argument('--stock', type=int, default=1000, help='Initial count of the book.')
+        parser.add_argument('--quantity', type=int, default=1, help='Books added to cart at once.')
+
+    def handle(self, *args, **options):
+        prefix = uuid.uuid4().hex[:8]
+        seller = BookStoreUser.objects.create_user(
+            email=f'{prefix}-seller@bookstore.com', username=f'{prefix}-seller', password=prefix, is_seller=True,
+        )
+        buyers = [
+            BookStoreUser.objects.create_user(
+                email=f'{prefix}-buyer{number}@bookstore.com', username=f'{prefix}-buyer{number}', password=prefix,
+            )
+            for number in range(options['workers'])
+        ]
+        book = Book.objects.create(
+            seller=seller.seller, title='Load test', author='Load test', publisher='Load test', genre='Load test',
+            cost=1, article_number=int(time.time() * 1000), isbn=9780000000000, pages=1, language='English',
+            description='', is_on_sale=True, count=options['stock'],
+        )
+        try:
+            self.run_load(book, buyers, options)
+        finally:
+            BookStoreUser.objects.filter(pk__in=[seller.pk, *(buyer.pk for buyer in buyers)]).delete()
+
+    def run_load(self, book, buyers, options):
+        lock = threading.Lock()
+        counters = {'reserved': 0, 'rejected': 0, 'retried': 0}
+
+        def buy(buyer):
+            try:
+                while True:
+                    try:
+                        add_book_to_cart(buyer, book, 'S', options['quantity'])
+                        key = 'reserved'
+                    except NotEnoughStock:
+                        with lock:
+                            counters['rejected'] += 1
+                        return
+                    except OperationalError:
+                        # database is locked by other writer (SQLite)
+                        key = 'retried'
+                    with lock:
+                        counters[key] += 1
+            finally:
+                connection.close()
+
+        started_at = time.perf_counter()
+        with ThreadPoolExecutor(options['workers']) as executor:
+            list(executor.map(buy, buyers))
+        seconds = time.perf_counter() - started_at
+
+        book.refresh_from_db()
+        in_carts = sum(ShoppingCart.objects.filter(book=book).values_list('book_count', flat=True))
+        self.stdout.write(
+            f'reservations: {counters["reserved"]}, rejected: {counters["rejected"]}, '
+            f'retried: {counters["retried"]}, {counters["reserved"] / seconds:.0f} reservations/s\n'
+            f'stock: {options["stock"]}, in carts: {in_carts}, left: {book.count}'
+        )
+        if book.count < 0 or in_carts + book.count != options['stock'] \
+                or in_carts != counters['reserved'] * options['quantity']:
+            raise CommandError('Books are oversold')
+        self.stdout.write(self.style.SUCCESS('No books are oversold'))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from books.models import Book
+from books.stock import shard_stock
+
+
+class Command(BaseCommand):
+    help = 'Splits stock of a hot book into several counters, or merges it back with --shards 0.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('article_number', type=int, help='Article number of the book.')
+        parser.add_argument('--shards', type=int, default=8, help='Number of counters, 0 merges them.')
+
+    def handle(self, *args, **options):
+        if not 0 <= options['shards'] <= 256:
+            raise CommandError('Number of shards must be from 0 to 256')
+        try:
+            book = Book.objects.get(article_number=options['article_number'])
+        except Book.DoesNotExist:
+            raise CommandError(f'Book {options["article_number"]} does not exist')
+        shard_stock(book, options['shards'])
+        book.refresh_from_db()
+        self.stdout.write(f'Stock of {book.count} books is kept in {book.stock_shards or "no"} shards')
@@ -0,0 +1,41 @@
+# Generated by Django 4.1.3 on 2026-10-18 01:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0003_alter_book_article_number_alter_book_title'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(condition=models.Q(('is_on_sale', True)), fields=['article_number'], name='book_on_sale_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(condition=models.Q(('is_on_sale', True)), fields=['genre', 'article_number'], name='book_on_sale_genre_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(condition=models.Q(('is_on_sale', True)), fields=['author', 'article_number'], name='book_on_sale_author_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(condition=models.Q(('is_on_sale', True)), fields=['language', 'article_number'], name='book_on_sale_language_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(condition=models.Q(('is_on_sale', True)), fields=['publisher', 'article_number'], name='book_on_sale_publisher_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(condition=models.Q(('is_on_sale', True)), fields=['cost', 'article_number'], name='book_on_sale_cost_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(condition=models.Q(('is_on_sale', True)), fields=['rating', 'article_number'], name='book_on_sale_rating_idx'),
+        ),
+    ]
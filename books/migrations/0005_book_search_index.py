@@ -0,0 +1,37 @@
+# Generated by Django 4.1.3 on 2026-10-18 02:05
+
+from django.db import migrations
+
+# Copy of books.search.SEARCH_VECTOR_SQL at the time of this migration.
+# If that expression is changed, a new migration must recreate the index.
+SEARCH_VECTOR_SQL = (
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(author, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(description, '')), 'C')"
+)
+
+
+def create_search_index(apps, schema_editor):
+    # Full-text index exists only on postgres, other databases use in-process index.
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS book_search_idx ON books_book USING GIN (({SEARCH_VECTOR_SQL}))'
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS book_search_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0004_book_catalogue_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 4.1.3 on 2026-10-18 05:00
+
+import hashlib
+import json
+from decimal import Decimal
+
+from django.db import migrations, models
+
+# Copies of books.models.BOOK_CONTENT_FIELDS and make_book_content_hash at the time of this migration.
+BOOK_CONTENT_FIELDS = (
+    'title', 'author', 'translator', 'publisher', 'genre', 'cost',
+    'isbn', 'pages', 'language', 'description', 'is_on_sale', 'count',
+)
+
+
+def make_book_content_hash(values):
+    parts = []
+    for field in BOOK_CONTENT_FIELDS:
+        value = values.get(field)
+        if field == 'cost' and value is not None:
+            value = Decimal(str(value)).quantize(Decimal('0.01'))
+        parts.append(None if value is None else str(value))
+    return hashlib.sha1(json.dumps(parts).encode()).hexdigest()
+
+
+def fill_content_hash(apps, schema_editor):
+    Book = apps.get_model('books', 'Book')
+    books = []
+    for values in Book.objects.values('id', *BOOK_CONTENT_FIELDS).iterator(chunk_size=2000):
+        books.append(Book(id=values['id'], content_hash=make_book_content_hash(values)))
+        if len(books) >= 2000:
+            Book.objects.bulk_update(books, ['content_hash'])
+            books = []
+    Book.objects.bulk_update(books, ['content_hash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0006_book_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='content_hash',
+            field=models.CharField(default='', editable=False, max_length=40),
+        ),
+        migrations.RunPython(fill_content_hash, migrations.RunPython.noop),
+    ]
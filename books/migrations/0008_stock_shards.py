@@ -0,0 +1,32 @@
+# Generated by Django 4.1.3 on 2026-10-18 07:15
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0007_book_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='stock_shards',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.CreateModel(
+            name='StockShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveSmallIntegerField()),
+                ('count', models.PositiveIntegerField()),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shards', to='books.book')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='stockshard',
+            constraint=models.UniqueConstraint(fields=('book', 'number'), name='unique_stock_shard_book_number'),
+        ),
+    ]
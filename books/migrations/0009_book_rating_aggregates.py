@@ -0,0 +1,38 @@
+# Generated by Django 4.1.3 on 2026-10-18 08:10
+
+import django.core.validators
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def reset_ratings_without_reviews(apps, schema_editor):
+    # rating was set when book was created, it isn't an average of reviews;
+    # updated_at is changed, so ETags of books with old rating don't validate
+    Book = apps.get_model('books', 'Book')
+    Book.objects.update(rating=0, updated_at=timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0008_stock_shards'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='book',
+            name='rating',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=3, validators=[django.core.validators.MaxValueValidator(5)]),
+        ),
+        migrations.RunPython(reset_ratings_without_reviews, migrations.RunPython.noop),
+    ]
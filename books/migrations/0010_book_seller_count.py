@@ -0,0 +1,26 @@
+# Generated by Django 4.1.3 on 2026-10-18 14:20
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def copy_count_to_seller_count(apps, schema_editor):
+    # books reserved before migration can't be told apart, content hash was made of count
+    Book = apps.get_model('books', 'Book')
+    Book.objects.update(seller_count=F('count'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0009_book_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='seller_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(copy_count_to_seller_count, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,34 @@
-from django.db import models
+import hashlib
+import json
+from decimal import Decimal
+
+from django.db import models, transaction
+from django.db.models import Q
 from django.core.validators import MaxValueValidator
 
+# Fields that seller provides for a book, except article_number that identifies it.
+BOOK_CONTENT_FIELDS = (
+    'title', 'author', 'translator', 'publisher', 'genre', 'cost',
+    'isbn', 'pages', 'language', 'description', 'is_on_sale', 'count',
+)
+
+# Fields that are changed only by UPDATE with F() expressions when reviews are written (see users.reviews).
+BOOK_RATING_FIELDS = ('rating', 'rating_sum', 'rating_count')
+
+
+def make_book_content_hash(values):
+    """
+        Returns sha1 of book content fields taken from 'values' mapping.
+        Cost is normalized to 2 decimal places, so 10, '10.0' and Decimal('10.00') give equal hash.
+    """
+    parts = []
+    for field in BOOK_CONTENT_FIELDS:
+        value = values.get(field)
+        if field == 'cost' and value is not None:
+            value = Decimal(str(value)).quantize(Decimal('0.01'))
+        parts.append(None if value is None else str(value))
+    return hashlib.sha1(json.dumps(parts).encode()).hexdigest()
+
 
 class Book(models.Model):
     """
@@ -8,7 +36,7 @@ class Book(models.Model):
         Consists of the following fields:
             Seller - represents a seller of a book.
             Title - represents a title of a book.j
-            Rating - represents rating in our store
+            Rating - represents average rating of book reviews, 0 if book has no reviews.
             Author - represents author of book.
             Translator - represents translator of book if such exists
             Publisher - represents a publisher of book.
@@ -19,6 +47,12 @@ class Book(models.Model):
             Language - represents a language that used in book.
             Is_on_sale - represents whether a book on sale or not.
             Count - represents the number of books available from the seller
+            Updated_at - represents when a book was changed last time. Used for conditional requests.
+            Seller_count - represents stock as seller set it last time. Reservations don't change it,
+                so content hash and import use it instead of count.
+            Content_hash - represents hash of content fields. Used to skip unchanged books on re-import.
+            Stock_shards - represents number of StockShard counters that hold stock of the book, 0 if stock is in count.
+            Rating_sum, Rating_count - represent sum and number of review ratings. Rating is kept equal to their ratio.
     """
     seller = models.ForeignKey(
         'users.Seller',
@@ -27,11 +61,13 @@ class Book(models.Model):
     title = models.CharField(
         max_length=100,
     )
-    rating = models.PositiveSmallIntegerField(
+    rating = models.DecimalField(
+        max_digits=3,
+        decimal_places=2,
         validators=[
             MaxValueValidator(5)
         ],
-        default=5.0
+        default=0,
     )
     author = models.CharField(max_length=100)
     translator = models.CharField( # May be null
@@ -57,4 +93,140 @@ class Book(models.Model):
         default=True,
     )
     count = models.PositiveIntegerField()
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        db_index=True,
+    )
+    seller_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+    )
+    content_hash = models.CharField(
+        max_length=40,
+        default='',
+        editable=False,
+    )
+    stock_shards = models.PositiveSmallIntegerField(
+        default=0,
+        editable=False,
+    )
+    rating_sum = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+    )
+    rating_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+    )
+
+    class Meta:
+        # Catalogue only shows books on sale, so indexes are partial.
+        # Every index ends with article_number to serve keyset pagination of filtered catalogue.
+        indexes = [
+            models.Index(
+                fields=['article_number'],
+                condition=Q(is_on_sale=True),
+                name='book_on_sale_idx',
+            ),
+            models.Index(
+                fields=['genre', 'article_number'],
+                condition=Q(is_on_sale=True),
+                name='book_on_sale_genre_idx',
+            ),
+            models.Index(
+                fields=['author', 'article_number'],
+                condition=Q(is_on_sale=True),
+                name='book_on_sale_author_idx',
+            ),
+            models.Index(
+                fields=['language', 'article_number'],
+                condition=Q(is_on_sale=True),
+                name='book_on_sale_language_idx',
+            ),
+            models.Index(
+                fields=['publisher', 'article_number'],
+                condition=Q(is_on_sale=True),
+                name='book_on_sale_publisher_idx',
+            ),
+            models.Index(
+                fields=['cost', 'article_number'],
+                condition=Q(is_on_sale=True),
+                name='book_on_sale_cost_idx',
+            ),
+            models.Index(
+                fields=['rating', 'article_number'],
+                condition=Q(is_on_sale=True),
+                name='book_on_sale_rating_idx',
+            ),
+        ]
+
+    def get_content_hash(self):
+        # reservations aren't content changes, so hash has count that seller set
+        values = {field: getattr(self, field) for field in BOOK_CONTENT_FIELDS}
+        values['count'] = self.seller_count
+        return make_book_content_hash(values)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        book = super().from_db(db, field_names, values)
+        # count as it was loaded, seller's change of count is saved as difference from it (see save)
+        book._loaded_count = book.__dict__.get('count')
+        return book
+
+    def refresh_from_db(self, using=None, fields=None):
+        super().refresh_from_db(using, fields)
+        if fields is None or 'count' in fields:
+            self._loaded_count = self.__dict__.get('count')
+
+    def save(self, *args, **kwargs):
+        from books.stock import change_stock
+
+        update_fields = kwargs.get('update_fields')
+        loaded_count = getattr(self, '_loaded_count', None)
+        count_delta = 0
+        if update_fields is None and not self._state.adding:
+            # saving loaded book must not overwrite stock taken by concurrent reservations (see books.stock)
+            # and ratings written by concurrent reviews, so they are changed only by F() updates
+            excluded_fields = {*BOOK_RATING_FIELDS, *self.get_deferred_fields()}
+            if loaded_count is not None:
+                excluded_fields.add('count')
+                count_delta = self.count - loaded_count
+            update_fields = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in excluded_fields
+            ]
+        if self._state.adding:
+            self.seller_count = self.count
+        elif count_delta:
+            self.seller_count = max(self.seller_count + count_delta, 0)
+        with transaction.atomic():
+            if count_delta:
+                self.count = change_stock(self, count_delta)
+            self.content_hash = self.get_content_hash()
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'content_hash'}
+            super().save(*args, **kwargs)
+        self._loaded_count = self.count
+
+
+class StockShard(models.Model):
+    """
+        The model represents one of counters that hold stock of a hot book (see books.stock).
+        Reservations are spread over counters, so they don't wait for lock of one row.
+        Book.count is set to sum of counters shortly after they are changed.
+    """
+    book = models.ForeignKey(
+        Book,
+        on_delete=models.CASCADE,
+        related_name='shards',
+    )
+    number = models.PositiveSmallIntegerField()
+    count = models.PositiveIntegerField()
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['book', 'number'],
+                name='unique_stock_shard_book_number',
+            ),
+        ]
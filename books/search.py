@@ -0,0 +1,191 @@
+"""
+    Full-text search over book title, author and description.
+
+    Two engines are provided:
+        PostgresBookSearch - ranks books with tsvector/tsquery, served by GIN index
+            created in books/migrations/0005_book_search_index.py.
+        InvertedIndexBookSearch - in-process inverted index for other databases.
+            Index is built lazily from books on sale and kept up to date by books.signals.
+    Use get_book_search() to get engine for current database.
+"""
+import heapq
+import math
+import re
+import threading
+from collections import defaultdict
+from functools import lru_cache
+
+from django.db import connection
+from django.db.models import BooleanField, FloatField
+from django.db.models.expressions import RawSQL
+
+SEARCH_CONFIG = 'english'
+
+# Must stay equal to expression of book_search_idx (books/migrations/0005), otherwise postgres won't use the index.
+SEARCH_VECTOR_SQL = (
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(title, '')), 'A') || "
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(author, '')), 'B') || "
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(description, '')), 'C')"
+)
+SEARCH_QUERY_SQL = f"plainto_tsquery('{SEARCH_CONFIG}', %s)"
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+def tokenize(text):
+    """
+        Splits text into lowercase words.
+    """
+    if not text:
+        return []
+    return TOKEN_RE.findall(text.lower())
+
+
+class PostgresBookSearch:
+    """
+        Search engine backed by postgres full-text search.
+        Index is maintained by database itself, so index_book and remove_book do nothing.
+    """
+
+    def search(self, query, queryset, limit):
+        queryset = queryset.filter(
+            RawSQL(f'({SEARCH_VECTOR_SQL}) @@ {SEARCH_QUERY_SQL}', (query,), output_field=BooleanField())
+        ).annotate(
+            rank=RawSQL(f'ts_rank({SEARCH_VECTOR_SQL}, {SEARCH_QUERY_SQL})', (query,), output_field=FloatField())
+        )
+        return list(queryset.order_by('-rank', 'article_number')[:limit])
+
+    def index_book(self, book):
+        pass
+
+    def remove_book(self, book_id):
+        pass
+
+    def clear(self):
+        pass
+
+    def stats(self):
+        return {'engine': 'postgres'}
+
+
+class InvertedIndexBookSearch:
+    """
+        In-process inverted index: token -> {book id: weighted term frequency}.
+        Books are ranked by sum of tf-idf of query tokens, all tokens must match.
+        Only books on sale are indexed.
+    """
+    field_weights = {
+        'title': 3.0,
+        'author': 2.0,
+        'description': 1.0,
+    }
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._postings = defaultdict(dict)
+        self._documents = {}
+        self._built = False
+
+    def _build(self):
+        from books.models import Book
+
+        self._postings = defaultdict(dict)
+        self._documents = {}
+        books = Book.objects.filter(is_on_sale=True).values_list('id', *self.field_weights)
+        for book_id, *values in books.iterator(chunk_size=2000):
+            self._add(book_id, dict(zip(self.field_weights, values)))
+        self._built = True
+
+    def _ensure_built(self):
+        if not self._built:
+            with self._lock:
+                if not self._built:
+                    self._build()
+
+    def _add(self, book_id, fields):
+        frequencies = defaultdict(float)
+        for field, weight in self.field_weights.items():
+            for token in tokenize(fields[field]):
+                frequencies[token] += weight
+        for token, frequency in frequencies.items():
+            self._postings[token][book_id] = frequency
+        self._documents[book_id] = tuple(frequencies)
+
+    def _remove(self, book_id):
+        for token in self._documents.pop(book_id, ()):
+            postings = self._postings[token]
+            postings.pop(book_id, None)
+            if not postings:
+                del self._postings[token]
+
+    def index_book(self, book):
+        """
+            Adds or re-indexes book. If index is not built yet it will include the book when it is built.
+        """
+        if not self._built:
+            return
+        with self._lock:
+            self._remove(book.pk)
+            if book.is_on_sale:
+                self._add(book.pk, {field: getattr(book, field) for field in self.field_weights})
+
+    def remove_book(self, book_id):
+        if not self._built:
+            return
+        with self._lock:
+            self._remove(book_id)
+
+    def clear(self):
+        """
+            Drops index. It will be rebuilt from database on next search.
+        """
+        with self._lock:
+            self._postings = defaultdict(dict)
+            self._documents = {}
+            self._built = False
+
+    def rank(self, query, limit):
+        """
+            Returns list of book ids ordered by relevance.
+        """
+        tokens = set(tokenize(query))
+        if not tokens:
+            return []
+        self._ensure_built()
+        with self._lock:
+            postings = [self._postings.get(token) for token in tokens]
+            if not all(postings):
+                return []
+            postings.sort(key=len)
+            documents_count = len(self._documents)
+            scores = {}
+            for book_id in postings[0]:
+                if all(book_id in other for other in postings[1:]):
+                    scores[book_id] = sum(
+                        posting[book_id] * math.log(1 + documents_count / len(posting))
+                        for posting in postings
+                    )
+        return heapq.nlargest(limit, scores, key=lambda book_id: (scores[book_id], -book_id))
+
+    def search(self, query, queryset, limit):
+        ranked_ids = self.rank(query, limit)
+        books = queryset.in_bulk(ranked_ids)
+        return [books[book_id] for book_id in ranked_ids if book_id in books]
+
+    def stats(self):
+        return {
+            'engine': 'inverted_index',
+            'built': self._built,
+            'books': len(self._documents),
+            'tokens': len(self._postings),
+        }
+
+
+@lru_cache(maxsize=None)
+def get_book_search():
+    """
+        Returns search engine for default database.
+    """
+    if connection.vendor == 'postgresql':
+        return PostgresBookSearch()
+    return InvertedIndexBookSearch()
@@ -0,0 +1,50 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+
+from books.autocomplete import book_autocomplete
+from books.cache import book_cache
+from books.models import Book
+from books.search import get_book_search
+
+# Sent after books are created or updated in bulk, bypassing post_save. Provides 'books' argument.
+books_bulk_saved = Signal()
+
+
+@receiver(post_save, sender=Book)
+def index_saved_book(sender, instance, **kwargs):
+    # indexes and cache are changed after commit: before it concurrent request could cache the old book,
+    # and rolled back write would stay in the indexes
+    def index():
+        get_book_search().index_book(instance)
+        book_autocomplete.index_book(instance)
+        book_cache.invalidate_book(instance.article_number)
+
+    transaction.on_commit(index)
+
+
+@receiver(post_delete, sender=Book)
+def remove_deleted_book(sender, instance, **kwargs):
+    # primary key of deleted instance is reset before commit
+    book_id, article_number = instance.pk, instance.article_number
+
+    def remove():
+        get_book_search().remove_book(book_id)
+        book_autocomplete.remove_book(book_id)
+        book_cache.invalidate_book(article_number)
+
+    transaction.on_commit(remove)
+
+
+@receiver(books_bulk_saved)
+def index_bulk_saved_books(sender, books, **kwargs):
+    search = get_book_search()
+    if any(book.pk is None for book in books):
+        # database hasn't returned primary keys, indexes will be rebuilt on next query
+        search.clear()
+        book_autocomplete.clear()
+    else:
+        for book in books:
+            search.index_book(book)
+        book_autocomplete.index_books(books)
+    book_cache.invalidate_books([book.article_number for book in books])
@@ -0,0 +1,257 @@
+"""
+    Stock of books (Book.count).
+
+    Stock is changed by one conditional UPDATE with F() expression, so concurrent reservations
+    never work with stale count and never take more books than are in stock.
+    Reservations don't change Book.seller_count, which content hash is made of,
+    so re-import of unchanged file doesn't return reserved books to stock.
+
+    Stock of a hot book can be split into StockShard counters (see shard_stock).
+    Then reservation takes books from a random counter, so concurrent buyers lock different rows.
+    Book.count stays the stock for readers: books whose counters were changed are collected
+    by sharded_count_sync, and their counts are set to sums of counters by one UPDATE at most once
+    per SHARDED_STOCK_SYNC_INTERVAL seconds, so the hot book row isn't written on every reservation.
+"""
+import logging
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from books.cache import book_cache
+from books.models import Book, StockShard
+
+logger = logging.getLogger(__name__)
+
+
+def invalidate_stock(book):
+    """
+        Drops cached detail of the book and catalogue pages that show stock after the transaction
+        that changed its stock is committed, otherwise concurrent request could cache the book
+        as it was before the change for the whole timeout.
+    """
+    article_number = book.article_number
+    transaction.on_commit(lambda: book_cache.invalidate_book_stock(article_number))
+
+
+def reserve_stock(book, quantity):
+    """
+        Takes 'quantity' books from stock if the book is on sale and enough books remain.
+        Returns True if books are reserved.
+    """
+    if book.stock_shards:
+        reserved = book.is_on_sale and reserve_sharded_stock(book, quantity)
+    else:
+        reserved = bool(Book.objects.filter(
+            pk=book.pk, stock_shards=0, is_on_sale=True, count__gte=quantity,
+        ).update(
+            count=F('count') - quantity,
+            updated_at=timezone.now(),
+        ))
+        if reserved:
+            invalidate_stock(book)
+    if not reserved and refresh_stock_shards(book):
+        return reserve_stock(book, quantity)
+    return reserved
+
+
+def release_stock(book, quantity):
+    """
+        Returns 'quantity' books to stock.
+    """
+    if book.stock_shards:
+        released = StockShard.objects.filter(book_id=book.pk, number=random.randrange(book.stock_shards)).update(
+            count=F('count') + quantity,
+        )
+        if released:
+            sharded_count_sync.add_on_commit(book)
+    else:
+        released = Book.objects.filter(pk=book.pk, stock_shards=0).update(
+            count=F('count') + quantity,
+            updated_at=timezone.now(),
+        )
+        if released:
+            invalidate_stock(book)
+    if not released and refresh_stock_shards(book):
+        release_stock(book, quantity)
+
+
+def refresh_stock_shards(book):
+    """
+        Re-reads number of counters of the book, which could be changed by shard_stock after the book was loaded.
+        Returns True if it was changed, then stock of the book must be changed again.
+    """
+    stock_shards = Book.objects.filter(pk=book.pk).values_list('stock_shards', flat=True).first()
+    if stock_shards is None or stock_shards == book.stock_shards:
+        return False
+    book.stock_shards = stock_shards
+    return True
+
+
+def change_stock(book, delta):
+    """
+        Adds 'delta' books to stock (takes them if 'delta' is negative) when seller changes count of the book.
+        Books reserved since the seller loaded the book stay reserved, stock never becomes negative.
+        Called by Book.save, which invalidates cache of the book. Returns new stock.
+    """
+    if book.stock_shards:
+        return change_sharded_stock(book, delta)
+    Book.objects.filter(pk=book.pk).update(count=Greatest(F('count') + delta, 0))
+    return Book.objects.filter(pk=book.pk).values_list('count', flat=True).get()
+
+
+def change_sharded_stock(book, delta):
+    """
+        Adds 'delta' books to counters of sharded book, locked in order of their numbers as in reserve_sharded_stock.
+        Added books are spread evenly over counters, taken books are taken from counters in order.
+        Sets Book.count to new sum of counters and returns it.
+    """
+    with transaction.atomic():
+        shards = list(StockShard.objects.select_for_update().filter(book_id=book.pk).order_by('number'))
+        remaining = -delta
+        for number, shard in enumerate(shards):
+            if delta >= 0:
+                change = delta // len(shards) + (number < delta % len(shards))
+            else:
+                change = -min(shard.count, remaining)
+                remaining += change
+            if change:
+                StockShard.objects.filter(pk=shard.pk).update(count=F('count') + change)
+                shard.count += change
+        count = sum(shard.count for shard in shards)
+        Book.objects.filter(pk=book.pk).update(count=count)
+    return count
+
+
+def reserve_sharded_stock(book, quantity):
+    """
+        Takes books from the first counter that has enough of them, trying counters in random order.
+        If no counter has enough, takes books from several counters locked in order of their numbers.
+    """
+    numbers = list(range(book.stock_shards))
+    random.shuffle(numbers)
+    reserved = False
+    for number in numbers:
+        if StockShard.objects.filter(book_id=book.pk, number=number, count__gte=quantity).update(
+            count=F('count') - quantity,
+        ):
+            reserved = True
+            break
+    else:
+        with transaction.atomic():
+            shards = list(StockShard.objects.select_for_update().filter(book_id=book.pk).order_by('number'))
+            if sum(shard.count for shard in shards) >= quantity:
+                remaining = quantity
+                for shard in shards:
+                    taken = min(shard.count, remaining)
+                    if taken:
+                        StockShard.objects.filter(pk=shard.pk).update(count=F('count') - taken)
+                        remaining -= taken
+                reserved = True
+    if reserved:
+        sharded_count_sync.add_on_commit(book)
+    return reserved
+
+
+DEFAULT_SYNC_INTERVAL = 1  # seconds
+
+
+class ShardedCountSync:
+    """
+        Collects sharded books whose counters were changed and sets their Book.count to sums of counters
+        by one UPDATE, when the oldest collected book waits longer than SHARDED_STOCK_SYNC_INTERVAL.
+        Collected books are checked after every response is sent (request_finished signal)
+        and synced on interpreter shutdown.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}  # book id: article number
+        self._oldest_pending_at = None
+
+    def get_interval(self):
+        return getattr(settings, 'SHARDED_STOCK_SYNC_INTERVAL', DEFAULT_SYNC_INTERVAL)
+
+    def add_on_commit(self, book):
+        """
+            Collects the book after the transaction that changed its counters is committed.
+        """
+        book_id, article_number = book.pk, book.article_number
+        transaction.on_commit(lambda: self.add(book_id, article_number))
+
+    def add(self, book_id, article_number):
+        with self._lock:
+            self._pending[book_id] = article_number
+            if self._oldest_pending_at is None:
+                self._oldest_pending_at = time.monotonic()
+        self.flush_if_due()
+
+    def is_flush_due(self):
+        with self._lock:
+            return bool(self._pending) and time.monotonic() - self._oldest_pending_at >= self.get_interval()
+
+    def flush(self):
+        """
+            Sets Book.count of collected books to sums of their counters. Returns number of synced books.
+        """
+        with self._lock:
+            books, self._pending = self._pending, {}
+            self._oldest_pending_at = None
+        if not books:
+            return 0
+        total = StockShard.objects.filter(book=OuterRef('pk')).values('book').annotate(total=Sum('count')).values('total')
+        try:
+            Book.objects.filter(pk__in=books, stock_shards__gt=0).update(
+                count=Coalesce(Subquery(total), 0),
+                        updated_at=timezone.now(),
+            )
+        except DatabaseError:
+            logger.exception('Failed to sync stock of %d sharded books', len(books))
+            with self._lock:
+                for book_id, article_number in books.items():
+                    self._pending.setdefault(book_id, article_number)
+                if self._oldest_pending_at is None:
+                    self._oldest_pending_at = time.monotonic()
+            return 0
+        book_cache.invalidate_books_stock(list(books.values()))
+        return len(books)
+
+    def flush_if_due(self, **kwargs):
+        """
+            request_finished receiver.
+        """
+        if self.is_flush_due():
+            self.flush()
+
+
+sharded_count_sync = ShardedCountSync()
+
+
+def distribute_stock(book_id, count, shards):
+    StockShard.objects.filter(book_id=book_id).delete()
+    StockShard.objects.bulk_create([
+        StockShard(book_id=book_id, number=number, count=count // shards + (number < count % shards))
+        for number in range(shards)
+    ])
+
+
+def shard_stock(book, shards):
+    """
+        Splits stock of the book into 'shards' counters, or merges it back into Book.count if 'shards' is 0.
+    """
+    with transaction.atomic():
+        book = Book.objects.select_for_update().get(pk=book.pk)
+        count = book.count
+        if book.stock_shards:
+            # counters are locked as in change_sharded_stock, so no reservation changes them meanwhile
+            count = sum(StockShard.objects.select_for_update().filter(book=book).values_list('count', flat=True))
+        if shards:
+            distribute_stock(book.pk, count, shards)
+        else:
+            StockShard.objects.filter(book=book).delete()
+        Book.objects.filter(pk=book.pk).update(stock_shards=shards, count=count, updated_at=timezone.now())
+    invalidate_stock(book)
@@ -1,3 +1,255 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
 
-# Create your tests here.
+from books.autocomplete import BookAutocompleteIndex
+from books.models import Book, StockShard
+from books.search import InvertedIndexBookSearch
+from books.stock import release_stock, reserve_stock, shard_stock, sharded_count_sync
+from users.models import BookStoreUser
+
+
+class BookTestDataMixin:
+    """
+        Provides seller and books for books app tests.
+    """
+
+    @classmethod
+    def create_seller(cls):
+        user = BookStoreUser.objects.create_user(
+            username='test_seller',
+            email='test_seller@test.com',
+            password='some_password',
+            is_seller=True,
+        )
+        return user.seller
+
+    @classmethod
+    def create_book(cls, seller, article_number, **fields):
+        book_data = {
+            'seller': seller,
+            'title': 'Test title',
+            'author': 'Test author',
+            'publisher': 'Test publisher',
+            'genre': 'Test genre',
+            'cost': 10,
+            'article_number': article_number,
+            'isbn': 1111111111111,
+            'pages': 100,
+            'language': 'Test language',
+            'description': 'Test description',
+            'count': 10,
+        }
+        book_data.update(fields)
+        return Book.objects.create(**book_data)
+
+
+class InvertedIndexBookSearchTests(TestCase, BookTestDataMixin):
+    """
+        Checks in-process search index ranking and incremental updates.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = cls.create_seller()
+        cls.title_match = cls.create_book(cls.seller, 1, title='Dune')
+        cls.description_match = cls.create_book(cls.seller, 2, description='Sequel of Dune')
+
+    def setUp(self):
+        self.search = InvertedIndexBookSearch()
+
+    def test_title_match_ranked_higher_than_description_match(self):
+        self.assertEqual(self.search.rank('dune', 10), [self.title_match.pk, self.description_match.pk])
+
+    def test_all_query_tokens_must_match(self):
+        self.assertEqual(self.search.rank('dune sequel', 10), [self.description_match.pk])
+
+    def test_book_is_reindexed_after_edit(self):
+        self.search.rank('dune', 10)  # build index
+        self.title_match.title = 'Solaris'
+        self.search.index_book(self.title_match)
+        self.assertEqual(self.search.rank('solaris', 10), [self.title_match.pk])
+        self.assertEqual(self.search.rank('dune', 10), [self.description_match.pk])
+
+    def test_book_not_on_sale_is_removed(self):
+        self.search.rank('dune', 10)  # build index
+        self.title_match.is_on_sale = False
+        self.search.index_book(self.title_match)
+        self.assertEqual(self.search.rank('dune', 10), [self.description_match.pk])
+
+
+class BookAutocompleteIndexTests(TestCase, BookTestDataMixin):
+    """
+        Checks prefix suggestions and incremental updates of autocomplete index.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = cls.create_seller()
+        cls.book = cls.create_book(cls.seller, 1, title='The Lord of the Rings', author='John Tolkien')
+        cls.other_book = cls.create_book(cls.seller, 2, title='The Hobbit', author='John Tolkien')
+
+    def setUp(self):
+        self.index = BookAutocompleteIndex()
+
+    def test_suggests_title_by_any_word_prefix(self):
+        self.assertEqual(
+            self.index.suggest('ring'),
+            [{'type': 'title', 'value': 'The Lord of the Rings', 'article_number': 1}]
+        )
+
+    def test_author_suggested_once(self):
+        self.assertEqual(self.index.suggest('tolk'), [{'type': 'author', 'value': 'John Tolkien'}])
+
+    def test_book_is_reindexed_after_edit(self):
+        self.index.suggest('ring')  # build index
+        self.book.title = 'Silmarillion'
+        self.index.index_book(self.book)
+        self.assertEqual(self.index.suggest('ring'), [])
+        self.assertEqual(self.index.suggest('silm')[0]['value'], 'Silmarillion')
+
+    def test_deleted_book_is_removed(self):
+        self.index.suggest('hob')  # build index
+        self.index.remove_book(self.other_book.pk)
+        self.assertEqual(self.index.suggest('hob'), [])
+        self.assertEqual(self.index.stats()['books'], 1)
+
+    def test_books_are_indexed_in_bulk(self):
+        self.index.suggest('ring')  # build index
+        self.book.title = 'Silmarillion'
+        new_book = Book(pk=100, article_number=3, title='Farmer Giles of Ham', author='John Tolkien', is_on_sale=True)
+        self.index.index_books([self.book, new_book])
+        self.assertEqual(self.index.suggest('ring'), [])
+        self.assertEqual(self.index.suggest('silm')[0]['value'], 'Silmarillion')
+        self.assertEqual(self.index.suggest('giles')[0]['article_number'], 3)
+        self.assertEqual(self.index._entries, sorted(self.index._entries))
+        self.assertEqual(self.index.stats()['books'], 3)
+
+
+class SellerStockChangeTests(TestCase, BookTestDataMixin):
+    """
+        Checks that saving a book loaded before reservations doesn't give reserved books back to stock.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = cls.create_seller()
+        cls.book = cls.create_book(cls.seller, 1, count=10)
+
+    def setUp(self):
+        self.loaded_book = Book.objects.get(pk=self.book.pk)
+        reserve_stock(self.book, 3)
+
+    def test_save_keeps_reserved_stock(self):
+        self.loaded_book.title = 'Edited title'
+        self.loaded_book.save()
+        self.assertEqual(Book.objects.get(pk=self.book.pk).count, 7)
+
+    def test_count_change_is_saved_as_difference(self):
+        self.loaded_book.count = 15
+        self.loaded_book.save()
+        self.assertEqual(self.loaded_book.count, 12)
+        self.assertEqual(Book.objects.get(pk=self.book.pk).count, 12)
+
+    def test_stock_is_not_negative(self):
+        self.loaded_book.count = 1
+        self.loaded_book.save()
+        self.assertEqual(Book.objects.get(pk=self.book.pk).count, 0)
+
+
+class ShardedStockTests(TestCase, BookTestDataMixin):
+    """
+        Checks that sharded stock is never oversold and Book.count stays equal to sum of counters.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = cls.create_seller()
+
+    def setUp(self):
+        self.addCleanup(sharded_count_sync.flush)
+        self.book = self.create_book(self.seller, 1, count=10)
+        shard_stock(self.book, 4)
+        self.book.refresh_from_db()
+
+    def shard_counts(self):
+        return list(StockShard.objects.filter(book=self.book).order_by('number').values_list('count', flat=True))
+
+    def reserve(self, quantity):
+        with self.captureOnCommitCallbacks(execute=True):
+            return reserve_stock(self.book, quantity)
+
+    def test_stock_is_split_into_shards(self):
+        self.assertEqual(self.shard_counts(), [3, 3, 2, 2])
+        self.assertEqual((self.book.count, self.book.stock_shards), (10, 4))
+
+    def test_reservation_updates_book_count_on_sync(self):
+        self.assertTrue(self.reserve(2))
+        self.assertEqual(sum(self.shard_counts()), 8)
+        self.assertEqual(Book.objects.get(pk=self.book.pk).count, 10)
+        self.assertEqual(sharded_count_sync.flush(), 1)
+        self.assertEqual(Book.objects.get(pk=self.book.pk).count, 8)
+
+    @override_settings(SHARDED_STOCK_SYNC_INTERVAL=0)
+    def test_reservations_are_synced_when_due(self):
+        self.assertTrue(self.reserve(2))
+        self.assertEqual(Book.objects.get(pk=self.book.pk).count, 8)
+
+    def test_reservation_takes_books_from_several_shards(self):
+        self.assertTrue(self.reserve(7))
+        self.assertEqual(sum(self.shard_counts()), 3)
+        self.assertFalse(self.reserve(4))
+        self.assertTrue(self.reserve(3))
+        sharded_count_sync.flush()
+        self.assertEqual(Book.objects.get(pk=self.book.pk).count, 0)
+
+    def test_release_returns_books(self):
+        self.reserve(5)
+        with self.captureOnCommitCallbacks(execute=True):
+            release_stock(self.book, 2)
+        sharded_count_sync.flush()
+        self.assertEqual(Book.objects.get(pk=self.book.pk).count, 7)
+
+    def test_books_added_by_seller_are_spread_over_shards(self):
+        self.book.count = 20
+        self.book.save()
+        self.assertEqual(self.shard_counts(), [6, 6, 4, 4])
+        self.assertEqual(Book.objects.get(pk=self.book.pk).count, 20)
+
+    def test_books_taken_by_seller_are_taken_from_shards_in_order(self):
+        self.book.count = 5
+        self.book.save()
+        self.assertEqual(self.shard_counts(), [0, 1, 2, 2])
+        self.assertEqual(Book.objects.get(pk=self.book.pk).count, 5)
+
+    def test_saving_book_keeps_reservations(self):
+        self.reserve(4)
+        self.book.title = 'Changed'
+        self.book.save()
+        self.assertEqual(sum(self.shard_counts()), 6)
+        self.book.count = 12
+        self.book.save()
+        self.assertEqual(sum(self.shard_counts()), 8)
+        self.assertEqual(self.book.count, 8)
+
+    def test_book_loaded_before_sharding_takes_sharded_path(self):
+        book = Book.objects.get(pk=self.book.pk)
+        book.stock_shards = 0  # as it was before shard_stock
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(reserve_stock(book, 3))
+            release_stock(Book.objects.get(pk=self.book.pk), 1)
+        self.assertEqual(sum(self.shard_counts()), 8)
+        sharded_count_sync.flush()
+        self.assertEqual(Book.objects.get(pk=self.book.pk).count, 8)
+
+    def test_book_loaded_before_merging_takes_plain_path(self):
+        shard_stock(self.book, 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(reserve_stock(self.book, 3))
+        self.assertEqual(Book.objects.get(pk=self.book.pk).count, 7)
+        self.assertEqual(self.book.stock_shards, 0)
+
+    def test_stock_is_merged_back(self):
+        self.reserve(3)
+        shard_stock(self.book, 0)
+        self.book.refresh_from_db()
+        self.assertEqual((self.book.count, self.book.stock_shards), (7, 0))
+        self.assertFalse(StockShard.objects.filter(book=self.book).exists())
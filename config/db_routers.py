@@ -0,0 +1,106 @@
+"""
+    Routing of database queries between primary database and read replicas.
+
+    Reads go to a healthy replica only inside safe (read-only) requests that are not pinned
+    to primary by PrimaryPinningMiddleware. Management commands, signals and unsafe requests read
+    from primary. Reads inside transaction on primary also stay on primary to see its writes.
+    Writes always go to primary.
+    Settings are in REPLICA_ROUTING (see config/settings.py).
+"""
+import contextvars
+import logging
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SETTINGS = {
+    'REPLICAS': [],
+    'PIN_SECONDS': 5,
+    'HEALTH_CHECK_INTERVAL': 10,
+}
+
+# whether reads of current request (or thread) go to primary database
+_use_primary = contextvars.ContextVar('use_primary', default=True)
+
+
+def get_routing_setting(name):
+    return getattr(settings, 'REPLICA_ROUTING', {}).get(name, DEFAULT_SETTINGS[name])
+
+
+def use_primary(value=True):
+    """
+        Sets whether reads go to primary database. Returns token to restore previous value by reset_use_primary.
+    """
+    return _use_primary.set(value)
+
+
+def reset_use_primary(token):
+    _use_primary.reset(token)
+
+
+class ReplicaHealth:
+    """
+        Caches result of connecting to replicas for HEALTH_CHECK_INTERVAL seconds,
+        so unavailable replica is checked once per interval, not on every query.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._checked = {}  # alias -> (is healthy, checked at)
+
+    def is_healthy(self, alias):
+        checked = self._checked.get(alias)
+        if checked is not None and time.monotonic() - checked[1] < get_routing_setting('HEALTH_CHECK_INTERVAL'):
+            return checked[0]
+        return self.check(alias)
+
+    def check(self, alias):
+        try:
+            with connections[alias].cursor() as cursor:
+                cursor.execute('SELECT 1')
+            healthy = True
+        except DatabaseError:
+            logger.warning('Replica %s is unavailable', alias, exc_info=True)
+            healthy = False
+        self.record(alias, healthy)
+        return healthy
+
+    def record(self, alias, healthy):
+        with self._lock:
+            self._checked[alias] = (healthy, time.monotonic())
+
+    def clear(self):
+        with self._lock:
+            self._checked.clear()
+
+    def stats(self):
+        with self._lock:
+            return {alias: healthy for alias, (healthy, _) in self._checked.items()}
+
+
+replica_health = ReplicaHealth()
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _use_primary.get() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        replicas = [alias for alias in get_routing_setting('REPLICAS') if replica_health.is_healthy(alias)]
+        return random.choice(replicas) if replicas else DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *get_routing_setting('REPLICAS')}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # replicas receive schema by replication
+        return db not in get_routing_setting('REPLICAS')
@@ -0,0 +1,48 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.http.request import HttpRequest
+
+from config.db_routers import get_routing_setting, reset_use_primary, use_primary
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class PrimaryPinningMiddleware:
+    """
+        Lets safe requests read from replicas and keeps other requests on primary database.
+        After unsafe request client is pinned to primary for PIN_SECONDS by cookie,
+        so his next reads see his writes even if replicas lag behind.
+        Works both under WSGI and ASGI without switching async views to thread.
+    """
+    sync_capable = True
+    async_capable = True
+    cookie_name = 'bs_use_primary'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request: HttpRequest):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = use_primary(request.method not in SAFE_METHODS or self.cookie_name in request.COOKIES)
+        try:
+            response = self.get_response(request)
+        finally:
+            reset_use_primary(token)
+        return self.pin(request, response)
+
+    async def __acall__(self, request: HttpRequest):
+        token = use_primary(request.method not in SAFE_METHODS or self.cookie_name in request.COOKIES)
+        try:
+            response = await self.get_response(request)
+        finally:
+            reset_use_primary(token)
+        return self.pin(request, response)
+
+    def pin(self, request, response):
+        if request.method not in SAFE_METHODS:
+            response.set_cookie(
+                self.cookie_name, '1', max_age=get_routing_setting('PIN_SECONDS'), httponly=True, samesite='Lax',
+            )
+        return response
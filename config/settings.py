@@ -56,6 +56,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'config.middleware.PrimaryPinningMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -95,9 +96,74 @@ DATABASES = {
         'PASSWORD': os.environ.get("PASSWORD"),
         'HOST': os.environ.get("HOST"),
         'PORT': os.environ.get("PORT"),
+        'CONN_MAX_AGE': int(os.environ.get("CONN_MAX_AGE", 0)),  # seconds, 0 closes connection after request
+        'CONN_HEALTH_CHECKS': os.environ.get("CONN_HEALTH_CHECKS", "False") == "True",
     }
 }
 
+# Read replicas are listed in DB_REPLICAS as comma separated hosts (or file names for SQLite)
+# and named replica_1, replica_2, ... Other parameters are taken from default database.
+for number, location in enumerate(filter(None, os.environ.get("DB_REPLICAS", "").split(',')), start=1):
+    DATABASES[f'replica_{number}'] = {
+        **DATABASES['default'],
+        ('NAME' if 'sqlite3' in (DATABASES['default']['ENGINE'] or '') else 'HOST'): location.strip(),
+        'CONN_MAX_AGE': int(os.environ.get("REPLICA_CONN_MAX_AGE", DATABASES['default']['CONN_MAX_AGE'])),
+        'CONN_HEALTH_CHECKS': os.environ.get(
+            "REPLICA_CONN_HEALTH_CHECKS", str(DATABASES['default']['CONN_HEALTH_CHECKS'])
+        ) == "True",
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['config.db_routers.ReplicaRouter']
+
+# Routing of reads of safe requests to replicas (see config.db_routers)
+REPLICA_ROUTING = {
+    'REPLICAS': [alias for alias in DATABASES if alias != 'default'],
+    'PIN_SECONDS': int(os.environ.get("REPLICA_PIN_SECONDS", 5)),  # primary is used after write
+    'HEALTH_CHECK_INTERVAL': int(os.environ.get("REPLICA_HEALTH_CHECK_INTERVAL", 10)),  # seconds
+}
+
+# Cache
+# https://docs.djangoproject.com/en/4.1/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get("CACHE_BACKEND", 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get("CACHE_LOCATION", 'bookstore'),
+    }
+}
+
+# Seconds to keep serialized book detail and catalogue pages (see books.cache.BookCache)
+BOOKS_CACHE_TIMEOUT = int(os.environ.get("BOOKS_CACHE_TIMEOUT", 300))
+
+# Seconds between updates of Book.count of books with sharded stock (see books.stock.ShardedCountSync)
+SHARDED_STOCK_SYNC_INTERVAL = float(os.environ.get("SHARDED_STOCK_SYNC_INTERVAL", 1))
+
+# Write-behind buffer of viewed books (see users.history.HistoryRecorder)
+HISTORY_RECORDER = {
+    'ENABLED': os.environ.get("HISTORY_RECORDER_ENABLED", "True") == "True",
+    'BATCH_SIZE': int(os.environ.get("HISTORY_RECORDER_BATCH_SIZE", 100)),
+    'FLUSH_INTERVAL': int(os.environ.get("HISTORY_RECORDER_FLUSH_INTERVAL", 5)),  # seconds
+    'MAX_PENDING': int(os.environ.get("HISTORY_RECORDER_MAX_PENDING", 10000)),
+}
+
+# In-process cache of users of API tokens (see users.authentication.TokenUserCache)
+TOKEN_AUTH_CACHE = {
+    'ENABLED': os.environ.get("TOKEN_AUTH_CACHE_ENABLED", "True") == "True",
+    'MAX_SIZE': int(os.environ.get("TOKEN_AUTH_CACHE_MAX_SIZE", 10000)),
+    'TIMEOUT': int(os.environ.get("TOKEN_AUTH_CACHE_TIMEOUT", 60)),  # seconds
+}
+
+# Stateless signed access and refresh tokens issued on login (see users.tokens)
+BOOKSTORE_JWT = {
+    'ENABLED': os.environ.get("JWT_ENABLED", "False") == "True",
+    'ALGORITHM': 'HS256',
+    'SIGNING_KEY': os.environ.get("JWT_SIGNING_KEY"),  # SECRET_KEY if not set
+    'ACCESS_LIFETIME': int(os.environ.get("JWT_ACCESS_LIFETIME", 300)),  # seconds
+    'REFRESH_LIFETIME': int(os.environ.get("JWT_REFRESH_LIFETIME", 86400)),  # seconds
+    'REVOCATION_REFRESH': int(os.environ.get("JWT_REVOCATION_REFRESH", 30)),  # seconds
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
 
@@ -139,16 +205,29 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'users.BookStoreUser'
 
+# Loads seller of the user in the same query as the user.
+# ModelBackend stays listed because sessions store path of the backend that logged user in,
+# and sessions made before BookStoreUserBackend was added would be rejected without it.
+AUTHENTICATION_BACKENDS = [
+    'users.backends.BookStoreUserBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+
 SITE_ID = 1
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.SessionAuthentication',
-        'rest_framework.authentication.TokenAuthentication',
+        'users.authentication.CachedTokenAuthentication',
+        'users.authentication.JWTAuthentication',
     ],
 
 }
 
+# Book catalogue pagination (see api.pagination.BookCursorPagination)
+BOOKS_PAGE_SIZE = int(os.environ.get("BOOKS_PAGE_SIZE", 50))
+BOOKS_MAX_PAGE_SIZE = int(os.environ.get("BOOKS_MAX_PAGE_SIZE", 500))
+
 EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
 
 
@@ -1,6 +1,16 @@
+import atexit
+
 from django.apps import AppConfig
+from django.core.signals import request_finished
 
 
 class UsersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'users'
+
+    def ready(self):
+        from users import signals  # noqa: F401
+        from users.history import history_recorder
+
+        request_finished.connect(history_recorder.flush_if_due, dispatch_uid='flush_history_views')
+        atexit.register(history_recorder.flush)
@@ -0,0 +1,175 @@
+"""
+    Token authentication of API requests.
+
+    CachedTokenAuthentication keeps token key -> user entries in bounded in-process LRU,
+    so repeat requests with the same token don't query token and user tables.
+    Entries expire after timeout and are dropped when the token is deleted (logout)
+    or the user is saved (password change, is_active flip), see users.signals.
+    Invalidation happens in the process where the change is made, other workers see it after timeout.
+    Settings are in TOKEN_AUTH_CACHE (see config/settings.py).
+"""
+import copy
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+import jwt
+from rest_framework import exceptions
+from rest_framework.authentication import BaseAuthentication, TokenAuthentication, get_authorization_header
+from rest_framework.permissions import SAFE_METHODS
+
+from users.models import BookStoreUser
+from users.tokens import ACCESS, decode_token, get_jwt_setting, get_user_from_claims
+
+DEFAULT_SETTINGS = {
+    'ENABLED': True,
+    'MAX_SIZE': 10000,
+    'TIMEOUT': 60,
+}
+
+
+class TokenUserCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # token key -> (expires at, user, token)
+        self._counters = Counter()
+
+    def get_setting(self, name):
+        return getattr(settings, 'TOKEN_AUTH_CACHE', {}).get(name, DEFAULT_SETTINGS[name])
+
+    @property
+    def enabled(self):
+        return self.get_setting('ENABLED')
+
+    def get(self, key):
+        """
+            Returns copies of cached user and token, so request can't change cached objects.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= time.monotonic():
+                del self._entries[key]
+                self._counters['expired'] += 1
+                entry = None
+            if entry is None:
+                self._counters['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counters['hits'] += 1
+        _, user, token = entry
+        user, token = copy.copy(user), copy.copy(token)
+        token.user = user
+        return user, token
+
+    def set(self, key, user, token):
+        expires_at = time.monotonic() + self.get_setting('TIMEOUT')
+        with self._lock:
+            self._entries[key] = (expires_at, user, token)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.get_setting('MAX_SIZE'):
+                self._entries.popitem(last=False)
+                self._counters['evictions'] += 1
+
+    def invalidate_key(self, key):
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self._counters['invalidations'] += 1
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            keys = [key for key, (_, user, _) in self._entries.items() if user.pk == user_id]
+            for key in keys:
+                del self._entries[key]
+            self._counters['invalidations'] += len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._counters.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = {
+                key: self._counters[key]
+                for key in ('hits', 'misses', 'expired', 'evictions', 'invalidations')
+            }
+            stats['size'] = len(self._entries)
+        return stats
+
+
+token_user_cache = TokenUserCache()
+
+
+class BookStoreTokenAuthentication(TokenAuthentication):
+    """
+        Token authentication that loads user together with his seller in one query.
+    """
+    def authenticate_credentials(self, key):
+        model = self.get_model()
+        try:
+            token = model.objects.select_related('user__seller').get(key=key)
+        except model.DoesNotExist:
+            raise exceptions.AuthenticationFailed('Invalid token.')
+
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed('User inactive or deleted.')
+
+        return (token.user, token)
+
+
+class CachedTokenAuthentication(BookStoreTokenAuthentication):
+    """
+        Token authentication that takes user of the token from token_user_cache.
+    """
+    def authenticate_credentials(self, key):
+        if not token_user_cache.enabled:
+            return super().authenticate_credentials(key)
+        cached = token_user_cache.get(key)
+        if cached is not None:
+            return cached
+        user, token = super().authenticate_credentials(key)
+        token_user_cache.set(key, user, token)
+        return user, token
+
+
+class JWTAuthentication(BaseAuthentication):
+    """
+        Authentication by signed access token passed as 'Authorization: Bearer <token>' if BOOKSTORE_JWT is enabled.
+        For safe methods user is built from token claims without database queries.
+        For other methods user is loaded from database, because views may save him.
+        Claims of the token are set to request.auth.
+    """
+    keyword = 'Bearer'
+
+    def authenticate(self, request):
+        if not get_jwt_setting('ENABLED'):
+            return None
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed('Invalid token header.')
+        try:
+            token = auth[1].decode()
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed('Invalid token header.')
+        return self.authenticate_credentials(token, request.method in SAFE_METHODS)
+
+    def authenticate_credentials(self, token, from_claims=True):
+        try:
+            claims = decode_token(token, ACCESS)
+        except jwt.ExpiredSignatureError:
+            raise exceptions.AuthenticationFailed('Token has expired.')
+        except jwt.InvalidTokenError:
+            raise exceptions.AuthenticationFailed('Invalid token.')
+
+        if from_claims:
+            return (get_user_from_claims(claims), claims)
+        user = BookStoreUser.objects.select_related('seller').filter(pk=claims['user_id'], is_active=True).first()
+        if user is None:
+            raise exceptions.AuthenticationFailed('User inactive or deleted.')
+        return (user, claims)
+
+    def authenticate_header(self, request):
+        return self.keyword
@@ -0,0 +1,17 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+UserModel = get_user_model()
+
+
+class BookStoreUserBackend(ModelBackend):
+    """
+        Authentication backend that loads session user together with his seller in one query,
+        so permission checks and views don't look up seller separately.
+    """
+    def get_user(self, user_id):
+        try:
+            user = UserModel._default_manager.select_related('seller').get(pk=user_id)
+        except UserModel.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
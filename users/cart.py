@@ -0,0 +1,129 @@
+"""
+    Shopping cart of buyer. Books in cart are reserved in stock (see books.stock).
+
+    Every operation locks cart lines before books, so concurrent operations
+    on the same lines can't deadlock. Checkout locks books in article_number order.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from books.models import Book
+from books.stock import release_stock, reserve_stock
+from users.models import Order, OrderLine, ShoppingCart
+
+
+class NotEnoughStock(Exception):
+    pass
+
+
+class EmptyCart(Exception):
+    pass
+
+
+class BooksNotOnSale(Exception):
+    def __init__(self, article_numbers):
+        super().__init__(article_numbers)
+        self.article_numbers = article_numbers
+
+
+def add_book_to_cart(user, book, book_type, quantity):
+    """
+        Reserves 'quantity' books and adds them to user's cart line of 'book_type'.
+        Raises NotEnoughStock if less books remain. Returns the cart line.
+    """
+    with transaction.atomic():
+        line, _ = ShoppingCart.objects.get_or_create(
+            user=user,
+            book=book,
+            type=book_type,
+            defaults={'book_count': 0},
+        )
+        ShoppingCart.objects.filter(pk=line.pk).update(book_count=F('book_count') + quantity)
+        if not reserve_stock(book, quantity):
+            raise NotEnoughStock
+    line.refresh_from_db(fields=['book_count'])
+    return line
+
+
+def update_cart_line(user, book, book_type, quantity):
+    """
+        Sets count of books in user's cart line, reserving or releasing the difference.
+        Line is deleted if 'quantity' is 0. Raises ShoppingCart.DoesNotExist if there is no line
+        and NotEnoughStock if less books remain. Returns the cart line.
+    """
+    with transaction.atomic():
+        line = ShoppingCart.objects.select_for_update().get(user=user, book=book, type=book_type)
+        line.book = book
+        difference = quantity - line.book_count
+        if difference > 0 and not reserve_stock(book, difference):
+            raise NotEnoughStock
+        if difference < 0:
+            release_stock(book, -difference)
+        line.book_count = quantity
+        if quantity:
+            line.save(update_fields=['book_count'])
+        else:
+            line.delete()
+    return line
+
+
+def remove_book_from_cart(user, book, book_type):
+    """
+        Deletes user's cart line and returns its books to stock.
+        Raises ShoppingCart.DoesNotExist if there is no line.
+    """
+    with transaction.atomic():
+        line = ShoppingCart.objects.select_for_update().get(user=user, book=book, type=book_type)
+        line.delete()
+        if line.book_count:
+            release_stock(book, line.book_count)
+
+
+def checkout(user, idempotency_key=None):
+    """
+        Turns user's cart into order in one transaction. Books are already reserved by the cart,
+        so their stock isn't changed, the books are only locked to take their current cost.
+        Order with the same idempotency_key is returned instead of making a new one.
+        Returns order and whether it was made.
+        Raises EmptyCart if cart is empty and BooksNotOnSale if some books are withdrawn from sale.
+    """
+    if idempotency_key is not None:
+        order = Order.objects.filter(user=user, idempotency_key=idempotency_key).first()
+        if order is not None:
+            return order, False
+    with transaction.atomic():
+        try:
+            # the order takes idempotency key first, concurrent request with the same key waits for it.
+            # Only this insert is in savepoint, so other integrity errors aren't taken for a retried request.
+            with transaction.atomic():
+                order = Order.objects.create(user=user, idempotency_key=idempotency_key)
+        except IntegrityError:
+            if idempotency_key is None:
+                raise
+            return Order.objects.get(user=user, idempotency_key=idempotency_key), False
+        lines = list(ShoppingCart.objects.select_for_update().filter(user=user, book_count__gt=0).order_by('id'))
+        if not lines:
+            raise EmptyCart
+        # all books are locked by one query in deterministic order
+        books = {
+            book.pk: book for book in Book.objects.select_for_update().filter(
+                pk__in={line.book_id for line in lines},
+            ).order_by('article_number')
+        }
+        not_on_sale = sorted(book.article_number for book in books.values() if not book.is_on_sale)
+        if not_on_sale:
+            raise BooksNotOnSale(not_on_sale)
+        order_lines = OrderLine.objects.bulk_create([
+            OrderLine(
+                order=order,
+                book=books[line.book_id],
+                type=line.type,
+                book_count=line.book_count,
+                cost=books[line.book_id].cost,
+            )
+            for line in lines
+        ])
+        order.total_cost = sum(line.cost * line.book_count for line in order_lines)
+        order.save(update_fields=['total_cost'])
+        ShoppingCart.objects.filter(pk__in=[line.pk for line in lines]).delete()
+    return order, True
@@ -0,0 +1,132 @@
+"""
+    Write-behind recording of viewed books.
+
+    Views are queued in memory of the worker and written with one bulk INSERT
+    when batch is full or the oldest queued view is older than flush interval.
+    Queue is checked after every response is sent (request_finished signal)
+    and flushed on interpreter shutdown, so requests never wait for the insert.
+    Settings are in HISTORY_RECORDER (see config/settings.py).
+"""
+import datetime
+import logging
+import threading
+import time
+from collections import Counter
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DatabaseError, connection
+
+from users.models import History
+from users.shortcuts import record_user_history
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SETTINGS = {
+    'ENABLED': True,
+    'BATCH_SIZE': 100,
+    'FLUSH_INTERVAL': 5,
+    'MAX_PENDING': 10000,
+}
+
+
+class HistoryRecorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = set()  # (user id, book id, date of view)
+        self._oldest_pending_at = None
+        self._counters = Counter()
+
+    def get_setting(self, name):
+        return getattr(settings, 'HISTORY_RECORDER', {}).get(name, DEFAULT_SETTINGS[name])
+
+    def record(self, user, book_id):
+        """
+            Records view of the book by user.
+            Writes immediately if recorder is disabled or caller is inside transaction,
+            because queued view would outlive rollback of that transaction.
+        """
+        if not self.get_setting('ENABLED') or connection.in_atomic_block:
+            record_user_history(user, book_id)
+            return
+        self.enqueue(user.pk, book_id)
+
+    async def arecord(self, user, book_id):
+        """
+            Version of record for async views. Only immediate write is run in thread.
+        """
+        if not self.get_setting('ENABLED') or connection.in_atomic_block:
+            await sync_to_async(record_user_history)(user, book_id)
+            return
+        self.enqueue(user.pk, book_id)
+
+    def enqueue(self, user_id, book_id):
+        view = (user_id, book_id, datetime.date.today())
+        with self._lock:
+            if view in self._pending:
+                self._counters['deduplicated'] += 1
+                return
+            if len(self._pending) >= self.get_setting('MAX_PENDING'):
+                self._counters['dropped'] += 1
+                return
+            self._pending.add(view)
+            self._counters['queued'] += 1
+            if self._oldest_pending_at is None:
+                self._oldest_pending_at = time.monotonic()
+
+    def is_flush_due(self):
+        with self._lock:
+            if not self._pending:
+                return False
+            return (
+                len(self._pending) >= self.get_setting('BATCH_SIZE')
+                or time.monotonic() - self._oldest_pending_at >= self.get_setting('FLUSH_INTERVAL')
+            )
+
+    def flush(self):
+        """
+            Writes all queued views. Views that are already in history are skipped by unique constraint.
+            Returns number of written views.
+        """
+        with self._lock:
+            views, self._pending = self._pending, set()
+            self._oldest_pending_at = None
+        if not views:
+            return 0
+        try:
+            History.objects.bulk_create(
+                [
+                    History(user_id=user_id, book_id=book_id, date_of_view=date_of_view)
+                    for user_id, book_id, date_of_view in views
+                ],
+                batch_size=self.get_setting('BATCH_SIZE'),
+                ignore_conflicts=True,
+            )
+        except DatabaseError:
+            logger.exception('Failed to flush %d history views', len(views))
+            with self._lock:
+                self._counters['dropped'] += len(views)
+            return 0
+        with self._lock:
+            self._counters['flushed'] += len(views)
+            self._counters['flushes'] += 1
+        return len(views)
+
+    def flush_if_due(self, **kwargs):
+        """
+            request_finished receiver.
+        """
+        if self.is_flush_due():
+            self.flush()
+
+    def stats(self):
+        with self._lock:
+            stats = {
+                key: self._counters[key]
+                for key in ('queued', 'deduplicated', 'flushed', 'flushes', 'dropped')
+            }
+            stats['pending'] = len(self._pending)
+            return stats
+
+
+history_recorder = HistoryRecorder()
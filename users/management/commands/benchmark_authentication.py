@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+
+from users.authentication import BookStoreTokenAuthentication, CachedTokenAuthentication, JWTAuthentication
+from users.authentication import token_user_cache
+from users.models import BookStoreUser
+from users.tokens import ACCESS, issue_tokens
+
+
+class Command(BaseCommand):
+    help = 'Compares authentication by database token, cached token and signed access token (JWT).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=10000, help='Number of authentications per method.')
+
+    def handle(self, *args, **options):
+        # the user and his token are rolled back after benchmark
+        with transaction.atomic():
+            user = BookStoreUser.objects.create_user(
+                email='benchmark@bookstore.com', username='benchmark', password='benchmark-1234', is_seller=True,
+            )
+            key = Token.objects.create(user=user).key
+            access_token = issue_tokens(BookStoreUser.objects.select_related('seller').get(pk=user.pk))[ACCESS]
+            token_user_cache.clear()
+
+            self.stdout.write(f'{"method":>14} {"us/request":>12} {"queries/request":>16}')
+            self.benchmark('token', lambda: BookStoreTokenAuthentication().authenticate_credentials(key), options)
+            self.benchmark('cached token', lambda: CachedTokenAuthentication().authenticate_credentials(key), options)
+            self.benchmark('jwt', lambda: JWTAuthentication().authenticate_credentials(access_token), options)
+            transaction.set_rollback(True)
+
+    def benchmark(self, name, authenticate, options):
+        authenticate()  # warm up caches
+        with CaptureQueriesContext(connection) as queries:
+            started_at = time.perf_counter()
+            for _ in range(options['requests']):
+                authenticate()
+            seconds = time.perf_counter() - started_at
+        self.stdout.write(
+            f'{name:>14} {seconds / options["requests"] * 1e6:>12.1f} '
+            f'{len(queries) / options["requests"]:>16.2f}'
+        )
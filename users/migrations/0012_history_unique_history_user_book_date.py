@@ -0,0 +1,32 @@
+# Generated by Django 4.1.3 on 2026-10-18 03:10
+
+from django.db import migrations, models
+
+
+def remove_duplicate_history(apps, schema_editor):
+    History = apps.get_model('users', 'History')
+    duplicates = History.objects.values('user', 'book', 'date_of_view').annotate(
+        first_id=models.Min('id'),
+        views=models.Count('id'),
+    ).filter(views__gt=1)
+    for duplicate in duplicates:
+        History.objects.filter(
+            user=duplicate['user'],
+            book=duplicate['book'],
+            date_of_view=duplicate['date_of_view'],
+        ).exclude(id=duplicate['first_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0011_bookstoreuser_groups_bookstoreuser_is_superuser_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_history, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='history',
+            constraint=models.UniqueConstraint(fields=('user', 'book', 'date_of_view'), name='unique_history_user_book_date'),
+        ),
+    ]
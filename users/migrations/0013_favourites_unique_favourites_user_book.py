@@ -0,0 +1,31 @@
+# Generated by Django 4.1.3 on 2026-10-18 03:45
+
+from django.db import migrations, models
+
+
+def remove_duplicate_favourites(apps, schema_editor):
+    Favourites = apps.get_model('users', 'Favourites')
+    duplicates = Favourites.objects.values('user', 'book').annotate(
+        first_id=models.Min('id'),
+        added=models.Count('id'),
+    ).filter(added__gt=1)
+    for duplicate in duplicates:
+        Favourites.objects.filter(
+            user=duplicate['user'],
+            book=duplicate['book'],
+        ).exclude(id=duplicate['first_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0012_history_unique_history_user_book_date'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_favourites, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='favourites',
+            constraint=models.UniqueConstraint(fields=('user', 'book'), name='unique_favourites_user_book'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.1.3 on 2026-10-18 04:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0013_favourites_unique_favourites_user_book'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='favourites',
+            index=models.Index(fields=['user', 'id'], name='favourites_user_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='history',
+            index=models.Index(fields=['user', 'id'], name='history_user_id_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.1.3 on 2026-10-18 06:05
+
+from django.db import migrations, models
+
+
+def merge_duplicate_cart_lines(apps, schema_editor):
+    ShoppingCart = apps.get_model('users', 'ShoppingCart')
+    duplicates = ShoppingCart.objects.values('user', 'book', 'type').annotate(
+        first_id=models.Min('id'),
+        book_count_sum=models.Sum('book_count'),
+        lines=models.Count('id'),
+    ).filter(lines__gt=1)
+    for duplicate in duplicates:
+        ShoppingCart.objects.filter(id=duplicate['first_id']).update(book_count=duplicate['book_count_sum'])
+        ShoppingCart.objects.filter(
+            user=duplicate['user'],
+            book=duplicate['book'],
+            type=duplicate['type'],
+        ).exclude(id=duplicate['first_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0015_revokedtoken'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_cart_lines, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='shoppingcart',
+            constraint=models.UniqueConstraint(fields=('user', 'book', 'type'), name='unique_shopping_cart_user_book_type'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.1.3 on 2026-10-18 09:00
+
+import datetime
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0018_review'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='history',
+            name='date_of_view',
+            field=models.DateField(default=datetime.date.today, editable=False),
+        ),
+    ]
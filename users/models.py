@@ -7,6 +7,7 @@ from django.contrib.auth.base_user import (
     AbstractBaseUser,
     BaseUserManager,
 )
+from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
 
 
@@ -84,18 +85,20 @@ class BookStoreUser(AbstractBaseUser, PermissionsMixin):
     @property
     def buyer_history(self):
         """
-            Returns queryset of books in buyer history.
+            Returns queryset of books in buyer history, recently viewed first.
         """
         if self.is_buyer:
-            return [history.book for history in self.history_set.all()]
+            from books.models import Book
+            return Book.objects.filter(history__user=self).order_by('-history__id')
 
     @property
     def buyer_favourites(self):
         """
-            Returns queryset of buyer favourite books.
+            Returns queryset of buyer favourite books, recently added first.
         """
         if self.is_buyer:
-            return [favourite.book for favourite in self.favourites_set.all()]
+            from books.models import Book
+            return Book.objects.filter(favourites__user=self).order_by('-favourites__id')
 
 
 class Seller(models.Model):
@@ -146,12 +149,33 @@ class ShoppingCart(UserCartAbstract):
         null=True,
     )
 
+    class Meta:
+        constraints = [
+            # books of the same type are counted in one cart line
+            models.UniqueConstraint(
+                fields=['user', 'book', 'type'],
+                name='unique_shopping_cart_user_book_type',
+            ),
+        ]
+
 
 class Favourites(UserCartAbstract):
     """
     The class provides user's favourites logic.
     Contains data about user Favourites books
     """
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'book'],
+                name='unique_favourites_user_book',
+            ),
+        ]
+        indexes = [
+            # serves pagination of user's favourites from recently added
+            models.Index(fields=['user', 'id'], name='favourites_user_id_idx'),
+        ]
+
     def __str__(self):
         return f'{self.book.title}'
 
@@ -161,10 +185,159 @@ class History(UserCartAbstract):
     The class provides user's history.
     Contains data about user's checked books.
     date_of_view: represents when book was list time viewed.
+        It is set by default, not by auto_now_add, so views buffered by users.history keep their own date.
     """
     date_of_view = models.DateField(
-        auto_now_add=True,
+        default=date.today,
+        editable=False,
     )
 
+    class Meta:
+        constraints = [
+            # book may be only once in user's history per day
+            models.UniqueConstraint(
+                fields=['user', 'book', 'date_of_view'],
+                name='unique_history_user_book_date',
+            ),
+        ]
+        indexes = [
+            # serves pagination of user's history from recently viewed
+            models.Index(fields=['user', 'id'], name='history_user_id_idx'),
+        ]
+
     def __str__(self):
         return f'{self.book.title} {self.date_of_view}'
+
+
+class Review(models.Model):
+    """
+    The class provides buyer's review of a book.
+    rating: represents rating from 1 to 5. Sum and count of ratings are kept in book (see users.reviews).
+    text: represents text of review, may be empty.
+    """
+    user = models.ForeignKey(
+        BookStoreUser,
+        on_delete=models.CASCADE,
+    )
+    book = models.ForeignKey(
+        'books.book',
+        on_delete=models.CASCADE,
+        related_name='reviews',
+    )
+    rating = models.PositiveSmallIntegerField(
+        validators=[
+            MinValueValidator(1),
+            MaxValueValidator(5),
+        ],
+    )
+    text = models.CharField(
+        max_length=1500,
+        blank=True,
+        default='',
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+    )
+
+    class Meta:
+        constraints = [
+            # buyer may review a book only once, then the review can be edited
+            models.UniqueConstraint(
+                fields=['user', 'book'],
+                name='unique_review_user_book',
+            ),
+        ]
+        indexes = [
+            # serves pagination of book reviews from recently written
+            models.Index(fields=['book', 'id'], name='review_book_id_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.book.title} {self.rating}'
+
+
+class Order(models.Model):
+    """
+    The class provides buyer's order made from shopping cart.
+    idempotency_key: represents key of checkout request. Retried request with the same key returns the same order.
+    total_cost: represents cost of all books in order at the moment of checkout.
+    """
+    user = models.ForeignKey(
+        BookStoreUser,
+        on_delete=models.CASCADE,
+    )
+    idempotency_key = models.CharField(
+        max_length=100,
+        null=True,
+    )
+    total_cost = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=0,
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'idempotency_key'],
+                name='unique_order_user_idempotency_key',
+            ),
+        ]
+        indexes = [
+            # serves pagination of user's orders from recently made
+            models.Index(fields=['user', 'id'], name='order_user_id_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.user.email} {self.created_at}'
+
+
+class OrderLine(models.Model):
+    """
+    The class provides books of one type in order.
+    cost: represents cost of one book at the moment of checkout.
+    """
+    order = models.ForeignKey(
+        Order,
+        on_delete=models.CASCADE,
+        related_name='lines',
+    )
+    book = models.ForeignKey(
+        'books.book',
+        on_delete=models.SET_NULL,
+        null=True,
+    )
+    type = models.CharField(
+        max_length=1,
+        choices=ShoppingCart.BOOK_TYPE_CHOICES,
+        null=True,
+    )
+    book_count = models.PositiveSmallIntegerField()
+    cost = models.DecimalField(
+        max_digits=8,
+        decimal_places=2,
+    )
+
+
+class RevokedToken(models.Model):
+    """
+    Signed token (see users.tokens) that was revoked before it expired.
+    jti: represents unique id of the token.
+    expires_at: represents when the token expires, after that the row isn't needed.
+    """
+    jti = models.CharField(
+        max_length=32,
+        unique=True,
+    )
+    expires_at = models.DateTimeField(
+        db_index=True,
+    )
+
+    def __str__(self):
+        return self.jti
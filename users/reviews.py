@@ -0,0 +1,76 @@
+"""
+    Reviews of books.
+
+    Book keeps sum and count of review ratings, and its rating is their ratio.
+    Every review write changes them by one UPDATE with F() expressions, so the average
+    is never recomputed over all reviews and concurrent writes never work with stale values.
+    Rating is a column of Book, so catalogue is filtered and sorted by it with book_on_sale_rating_idx.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import F, FloatField, Value
+from django.db.models.functions import Cast, Coalesce, NullIf
+from django.utils import timezone
+
+from books.cache import book_cache
+from books.models import Book
+from users.models import Review
+
+
+class ReviewExists(Exception):
+    pass
+
+
+def change_book_rating(book, rating_delta, count_delta):
+    """
+        Adds 'rating_delta' to sum and 'count_delta' to count of book ratings and sets rating to their ratio.
+        Expressions of UPDATE read values of the row before it is changed, so new ratio is computed from deltas.
+    """
+    rating_sum = F('rating_sum') + rating_delta
+    rating_count = F('rating_count') + count_delta
+    Book.objects.filter(pk=book.pk).update(
+        rating_sum=rating_sum,
+        rating_count=rating_count,
+        rating=Coalesce(Cast(rating_sum, FloatField()) / NullIf(rating_count, 0), Value(0.0)),
+        updated_at=timezone.now(),
+    )
+    # cache is dropped after commit, otherwise concurrent request could cache the book with old rating
+    article_number = book.article_number
+    transaction.on_commit(lambda: book_cache.invalidate_book(article_number))
+
+
+def add_review(user, book, rating, text=''):
+    """
+        Writes user's review of the book. Raises ReviewExists if user has already reviewed it.
+    """
+    try:
+        with transaction.atomic():
+            review = Review.objects.create(user=user, book=book, rating=rating, text=text)
+            change_book_rating(book, rating, 1)
+    except IntegrityError:
+        raise ReviewExists
+    return review
+
+
+def edit_review(user, book, rating, text=''):
+    """
+        Changes rating and text of user's review. Raises Review.DoesNotExist if there is no review.
+    """
+    with transaction.atomic():
+        review = Review.objects.select_for_update().get(user=user, book=book)
+        if rating != review.rating:
+            change_book_rating(book, rating - review.rating, 0)
+        review.rating = rating
+        review.text = text
+        review.save(update_fields=['rating', 'text', 'updated_at'])
+    return review
+
+
+def remove_review(user, book):
+    """
+        Deletes user's review. Raises Review.DoesNotExist if there is no review.
+        Rating of the book is changed by post_delete receiver (see users.signals).
+    """
+    with transaction.atomic():
+        review = Review.objects.select_for_update().get(user=user, book=book)
+        review.book = book
+        review.delete()
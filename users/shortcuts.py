@@ -1,13 +1,13 @@
 import datetime
 
-from users.models import BookStoreUser
+from users.models import BookStoreUser, History
 
 
 def get_user_books_history(user=None):
     if not isinstance(user, BookStoreUser):
         raise TypeError('user param must be BookStoreUser instance')
 
-    user_history = [history_instance.book for history_instance in user.history_set.all()]
+    user_history = [history_instance.book for history_instance in user.history_set.select_related('book')]
     return user_history
 
 
@@ -15,8 +15,19 @@ def get_user_today_history(user=None):
     if not isinstance(user, BookStoreUser):
         raise TypeError('user param must be BookStoreUser instance')
 
-    today_history = [history_obj.book for history_obj in user.history_set.filter(date_of_view=datetime.date.today())]
+    today_history = [
+        history_obj.book
+        for history_obj in user.history_set.filter(date_of_view=datetime.date.today()).select_related('book')
+    ]
     return today_history
 
 
+def record_user_history(user=None, book_id=None):
+    """
+        Adds book to user's today history with one INSERT.
+        Book that is already in today's history is skipped by unique constraint of History.
+    """
+    if not isinstance(user, BookStoreUser):
+        raise TypeError('user param must be BookStoreUser instance')
 
+    History.objects.bulk_create([History(user=user, book_id=book_id)], ignore_conflicts=True)
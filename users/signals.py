@@ -0,0 +1,36 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from books.models import Book
+from users.authentication import token_user_cache
+from users.models import BookStoreUser, Review, Seller
+from users.reviews import change_book_rating
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_token(sender, instance, **kwargs):
+    token_user_cache.invalidate_key(instance.key)
+
+
+@receiver(post_save, sender=BookStoreUser)
+@receiver(post_delete, sender=BookStoreUser)
+def invalidate_user_tokens(sender, instance, **kwargs):
+    token_user_cache.invalidate_user(instance.pk)
+
+
+@receiver(post_save, sender=Seller)
+@receiver(post_delete, sender=Seller)
+def invalidate_seller_tokens(sender, instance, **kwargs):
+    token_user_cache.invalidate_user(instance.user_id)
+
+
+@receiver(post_delete, sender=Review)
+def remove_review_rating(sender, instance, origin=None, **kwargs):
+    """
+        Takes rating of deleted review from the book, also when review is deleted by cascade or in bulk.
+    """
+    if isinstance(origin, Book) or getattr(origin, 'model', None) is Book:
+        # book is being deleted with its reviews
+        return
+    change_book_rating(instance.book, -instance.rating, -1)
@@ -1,6 +1,12 @@
-from django.test import TestCase
+import datetime
+from unittest import mock
 
-from users.models import BookStoreUser
+from django.test import TestCase, override_settings
+
+from books.models import Book
+from users.history import HistoryRecorder
+from users.models import BookStoreUser, History
+from users.shortcuts import record_user_history
 
 
 class CreateBookStoreUserTest(TestCase):
@@ -54,3 +60,105 @@ class BuyerBookStoreUserHasNotSellerAfterCreate(TestCase):
 
     def test_is_buyer_BookStoreUser_has_not_seller_profile(self):
         self.assertFalse(hasattr(self.test_user, 'seller'))
+
+
+class HistoryTestDataMixin:
+    """
+        Creates buyer and books to view.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.test_user = BookStoreUser.objects.create_user(
+            username='test_username',
+            email='test_email@gmail.com',
+            password='radma666',
+            is_seller=False
+        )
+        seller = BookStoreUser.objects.create_user(
+            username='test_seller',
+            email='test_seller@gmail.com',
+            password='radma666',
+            is_seller=True
+        ).seller
+        cls.books = [
+            Book.objects.create(
+                seller=seller,
+                title=f'Test title {number}',
+                author='Test author',
+                publisher='Test publisher',
+                genre='Test genre',
+                cost=10,
+                article_number=number,
+                isbn=1111111111111,
+                pages=100,
+                language='Test language',
+                description='Test description',
+                count=10,
+            )
+            for number in range(1, 6)
+        ]
+
+
+class RecordUserHistoryTest(HistoryTestDataMixin, TestCase):
+    """
+        This test checks out that book is recorded to today history only once
+        and recording costs one query however many books user has viewed.
+    """
+
+    def test_book_recorded_once_per_day(self):
+        record_user_history(self.test_user, self.books[0].pk)
+        record_user_history(self.test_user, self.books[0].pk)
+        self.assertEqual(History.objects.filter(user=self.test_user).count(), 1)
+
+    def test_recording_costs_one_query(self):
+        for book in self.books[1:]:
+            record_user_history(self.test_user, book.pk)
+        with self.assertNumQueries(1):
+            record_user_history(self.test_user, self.books[0].pk)
+
+
+class HistoryRecorderTest(HistoryTestDataMixin, TestCase):
+    """
+        This test checks out that queued views are deduplicated and written by one flush.
+    """
+    def setUp(self):
+        self.recorder = HistoryRecorder()
+
+    def test_queued_views_written_on_flush(self):
+        for book in self.books:
+            self.recorder.enqueue(self.test_user.pk, book.pk)
+        self.recorder.enqueue(self.test_user.pk, self.books[0].pk)
+        self.assertEqual(History.objects.filter(user=self.test_user).count(), 0)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.recorder.flush(), len(self.books))
+        self.assertEqual(History.objects.filter(user=self.test_user).count(), len(self.books))
+        self.assertEqual(self.recorder.stats()['deduplicated'], 1)
+        self.assertEqual(self.recorder.stats()['pending'], 0)
+
+    def test_view_keeps_date_it_was_queued(self):
+        yesterday = datetime.date.today() - datetime.timedelta(days=1)
+        with mock.patch('users.history.datetime.date') as date_mock:
+            date_mock.today.return_value = yesterday
+            self.recorder.enqueue(self.test_user.pk, self.books[0].pk)
+        self.recorder.flush()
+        self.assertEqual(History.objects.get(user=self.test_user).date_of_view, yesterday)
+
+    @override_settings(HISTORY_RECORDER={'BATCH_SIZE': 2, 'MAX_PENDING': 3})
+    def test_flush_due_when_batch_is_full(self):
+        self.recorder.enqueue(self.test_user.pk, self.books[0].pk)
+        self.assertFalse(self.recorder.is_flush_due())
+        self.recorder.enqueue(self.test_user.pk, self.books[1].pk)
+        self.assertTrue(self.recorder.is_flush_due())
+
+    @override_settings(HISTORY_RECORDER={'MAX_PENDING': 2})
+    def test_views_over_limit_are_dropped(self):
+        for book in self.books[:3]:
+            self.recorder.enqueue(self.test_user.pk, book.pk)
+        self.assertEqual(self.recorder.stats()['dropped'], 1)
+        self.assertEqual(self.recorder.flush(), 2)
+
+    def test_view_inside_transaction_written_immediately(self):
+        self.recorder.record(self.test_user, self.books[0].pk)
+        self.assertEqual(History.objects.filter(user=self.test_user).count(), 1)
+        self.assertEqual(self.recorder.stats()['pending'], 0)
@@ -0,0 +1,184 @@
+"""
+    Stateless signed tokens (JWT).
+
+    Login issues short-lived access token and long-lived refresh token.
+    Access token carries claims of the user, so request is authenticated without database queries
+    (see users.authentication.JWTAuthentication). Refresh token is exchanged for a new pair and revoked.
+    Revoked tokens are stored in RevokedToken until they expire. Every worker keeps ids of revoked tokens
+    in memory and reloads them every REVOCATION_REFRESH seconds.
+    Settings are in BOOKSTORE_JWT (see config/settings.py).
+"""
+import datetime
+import threading
+import time
+import uuid
+
+import jwt
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from users.models import BookStoreUser, RevokedToken, Seller
+
+DEFAULT_SETTINGS = {
+    'ENABLED': False,
+    'ALGORITHM': 'HS256',
+    'SIGNING_KEY': None,  # SECRET_KEY is used by default
+    'ACCESS_LIFETIME': 300,
+    'REFRESH_LIFETIME': 86400,
+    'REVOCATION_REFRESH': 30,
+}
+
+ACCESS = 'access'
+REFRESH = 'refresh'
+
+
+def get_jwt_setting(name):
+    return getattr(settings, 'BOOKSTORE_JWT', {}).get(name, DEFAULT_SETTINGS[name])
+
+
+def get_signing_key():
+    return get_jwt_setting('SIGNING_KEY') or settings.SECRET_KEY
+
+
+def encode_token(claims, token_type, lifetime):
+    now = timezone.now()
+    payload = {
+        **claims,
+        'token_type': token_type,
+        'jti': uuid.uuid4().hex,
+        'iat': now,
+        'exp': now + datetime.timedelta(seconds=lifetime),
+    }
+    return jwt.encode(payload, get_signing_key(), algorithm=get_jwt_setting('ALGORITHM'))
+
+
+def decode_token(token, token_type):
+    """
+        Returns claims of valid token of 'token_type'.
+        Raises jwt.InvalidTokenError if token is malformed, expired, revoked or of other type.
+    """
+    claims = jwt.decode(token, get_signing_key(), algorithms=[get_jwt_setting('ALGORITHM')])
+    if claims.get('token_type') != token_type:
+        raise jwt.InvalidTokenError('Wrong token type')
+    if claims['jti'] in revocation_list:
+        raise jwt.InvalidTokenError('Token is revoked')
+    return claims
+
+
+def get_user_claims(user):
+    seller = getattr(user, 'seller', None)
+    return {
+        'user_id': user.pk,
+        'email': user.email,
+        'username': user.username,
+        'is_seller': user.is_seller,
+        'is_staff': user.is_staff,
+        'is_superuser': user.is_superuser,
+        'seller_id': seller.pk if seller is not None else None,
+    }
+
+
+def get_user_from_claims(claims):
+    """
+        Builds user and his seller from claims of access token without database query.
+        The user must not be saved, it has no password and other fields.
+    """
+    user = BookStoreUser(
+        id=claims['user_id'],
+        email=claims['email'],
+        username=claims['username'],
+        is_seller=claims['is_seller'],
+        is_staff=claims['is_staff'],
+        is_superuser=claims['is_superuser'],
+    )
+    user._state.adding = False
+    if claims['seller_id'] is not None:
+        user.seller = Seller(id=claims['seller_id'], user=user)
+        user.seller._state.adding = False
+    else:
+        # remember that user has no seller, so accessing it doesn't query database
+        BookStoreUser.seller.related.set_cached_value(user, None)
+    return user
+
+
+def issue_tokens(user):
+    return {
+        ACCESS: encode_token(get_user_claims(user), ACCESS, get_jwt_setting('ACCESS_LIFETIME')),
+        REFRESH: encode_token({'user_id': user.pk}, REFRESH, get_jwt_setting('REFRESH_LIFETIME')),
+    }
+
+
+def refresh_tokens(refresh_token):
+    """
+        Exchanges refresh token for a new pair of tokens. Refresh token can be used only once.
+        Raises jwt.InvalidTokenError if token is invalid or its user is inactive or deleted.
+    """
+    claims = decode_token(refresh_token, REFRESH)
+    user = BookStoreUser.objects.select_related('seller').filter(pk=claims['user_id'], is_active=True).first()
+    if user is None:
+        raise jwt.InvalidTokenError('User inactive or deleted')
+    revocation_list.revoke_once(claims)
+    return issue_tokens(user)
+
+
+class RevocationList:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._jtis = frozenset()
+        self._loaded_at = None
+
+    def __contains__(self, jti):
+        if self._loaded_at is None or time.monotonic() - self._loaded_at >= get_jwt_setting('REVOCATION_REFRESH'):
+            self.load()
+        return jti in self._jtis
+
+    def load(self):
+        jtis = frozenset(RevokedToken.objects.filter(expires_at__gt=timezone.now()).values_list('jti', flat=True))
+        with self._lock:
+            self._jtis = jtis
+            self._loaded_at = time.monotonic()
+
+    @staticmethod
+    def make_revoked_token(claims):
+        return RevokedToken(
+            jti=claims['jti'],
+            expires_at=datetime.datetime.fromtimestamp(claims['exp'], tz=datetime.timezone.utc),
+        )
+
+    def add(self, jti):
+        with self._lock:
+            self._jtis = self._jtis | {jti}
+
+    def revoke(self, claims):
+        """
+            Revokes token with 'claims' and deletes rows of expired tokens.
+        """
+        RevokedToken.objects.filter(expires_at__lte=timezone.now()).delete()
+        RevokedToken.objects.bulk_create([self.make_revoked_token(claims)], ignore_conflicts=True)
+        self.add(claims['jti'])
+
+    def revoke_once(self, claims):
+        """
+            Revokes single-use token with 'claims'. Raises jwt.InvalidTokenError if it is already revoked,
+            so of concurrent requests that have passed revocation check with the same token only one succeeds.
+        """
+        RevokedToken.objects.filter(expires_at__lte=timezone.now()).delete()
+        try:
+            with transaction.atomic():
+                self.make_revoked_token(claims).save(force_insert=True)
+        except IntegrityError:
+            self.add(claims['jti'])
+            raise jwt.InvalidTokenError('Token already used')
+        self.add(claims['jti'])
+
+    def clear(self):
+        with self._lock:
+            self._jtis = frozenset()
+            self._loaded_at = None
+
+    def stats(self):
+        return {'revoked': len(self._jtis)}
+
+
+revocation_list = RevocationList()